@@ -0,0 +1,428 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''
+This module defines the `HashlifeBoard` class.
+
+See its documentation for more information.
+'''
+
+import random
+
+from .state import Board
+
+
+class _Node(object):
+    '''
+    A node in a Hashlife quadtree.
+    
+    A node of level `n` is a square of `2 ** n` by `2 ** n` cells, made of
+    four nodes of level `n - 1`. Nodes of level 0 are single cells, and there
+    are only two of them, `_dead` and `_alive`.
+    
+    Nodes are immutable, and they're canonicalized by `_make_node`, so two
+    nodes with the same cells are usually the same object. This lets us
+    memoize the future of each node.
+    '''
+    
+    __slots__ = ('level', 'nw', 'ne', 'sw', 'se', 'population')
+    
+    def __init__(self, level, nw, ne, sw, se, population):
+        self.level = level
+        self.nw, self.ne, self.sw, self.se = (nw, ne, sw, se)
+        self.population = population
+    
+    
+    def __reduce__(self):
+        # Unpickled nodes are canonicalized again.
+        if self.level == 0:
+            return (_get_cell_node, (self is _alive,))
+        return (_make_node, (self.nw, self.ne, self.sw, self.se))
+
+
+_dead = _Node(0, None, None, None, None, 0)
+_alive = _Node(0, None, None, None, None, 1)
+
+
+def _get_cell_node(alive):
+    '''Get the level 0 node of a dead or live cell.'''
+    return _alive if alive else _dead
+
+
+_nodes = {}
+'''Canonical nodes, by their quadrants.'''
+
+_results = {}
+'''Memoized futures of nodes. See `_advance`.'''
+
+_empty_nodes = [_dead]
+'''The empty node of each level.'''
+
+
+def _make_node(nw, ne, sw, se):
+    '''Get the canonical node made of the given quadrants.'''
+    key = (nw, ne, sw, se)
+    try:
+        return _nodes[key]
+    except KeyError:
+        pass
+    if len(_nodes) + len(_results) >= HashlifeBoard.max_cache_size:
+        # Nodes that are still used by boards will stop being canonical, so
+        # their futures may get computed again, but they'll still be right.
+        _nodes.clear()
+        _results.clear()
+    node = _nodes[key] = _Node(
+        nw.level + 1, nw, ne, sw, se,
+        nw.population + ne.population + sw.population + se.population
+    )
+    return node
+
+
+def _get_empty_node(level):
+    '''Get the node of the given level that has only dead cells.'''
+    while len(_empty_nodes) <= level:
+        empty_node = _empty_nodes[-1]
+        _empty_nodes.append(
+            _Node(empty_node.level + 1, empty_node, empty_node, empty_node,
+                  empty_node, 0)
+        )
+    return _empty_nodes[level]
+
+
+def _get_center(node):
+    '''Get the center quadrant of `node`, one level below it.'''
+    return _make_node(node.nw.se, node.ne.sw, node.sw.ne, node.se.nw)
+
+
+def _advance_base(node, rules):
+    '''
+    Get the center of a level 2 node after one turn.
+    
+    `rules` is a tuple `(birth, survival)` of sets of numbers of live
+    neighbors.
+    '''
+    (birth, survival) = rules
+    cells = {}
+    for (x, y, quadrant) in ((0, 0, node.nw), (2, 0, node.ne),
+                             (0, 2, node.sw), (2, 2, node.se)):
+        cells[x, y] = quadrant.nw is _alive
+        cells[x + 1, y] = quadrant.ne is _alive
+        cells[x, y + 1] = quadrant.sw is _alive
+        cells[x + 1, y + 1] = quadrant.se is _alive
+    new_cells = []
+    for (x, y) in ((1, 1), (2, 1), (1, 2), (2, 2)):
+        n = 0
+        for i in (-1, 0, 1):
+            for j in (-1, 0, 1):
+                if (i or j) and cells[x + i, y + j]:
+                    n += 1
+        if cells[x, y]:
+            new_cells.append(_get_cell_node(n in survival))
+        else: # cell is dead
+            new_cells.append(_get_cell_node(n in birth))
+    return _make_node(*new_cells)
+
+
+def _advance(node, generations_exponent, rules):
+    '''
+    Get the center of `node` after `2 ** generations_exponent` turns.
+    
+    The center is the quadrant one level below `node` that sits in its
+    middle. `generations_exponent` may be at most `node.level - 2`, because
+    that's as far as the center can go before it's affected by cells outside
+    of `node`. `rules` is a tuple `(birth, survival)` of sets of numbers of
+    live neighbors.
+    '''
+    assert 0 <= generations_exponent <= node.level - 2
+    (birth, survival) = rules
+    if node.population == 0 and 0 not in birth:
+        return _get_empty_node(node.level - 1)
+    key = (node, generations_exponent, rules)
+    try:
+        return _results[key]
+    except KeyError:
+        pass
+    
+    if node.level == 2:
+        result = _advance_base(node, rules)
+    else:
+        (nw, ne, sw, se) = (node.nw, node.ne, node.sw, node.se)
+        # The nine overlapping squares, one level below `node`:
+        squares = [
+            [nw, _make_node(nw.ne, ne.nw, nw.se, ne.sw), ne],
+            [_make_node(nw.sw, nw.se, sw.nw, sw.ne),
+             _make_node(nw.se, ne.sw, sw.ne, se.nw),
+             _make_node(ne.sw, ne.se, se.nw, se.ne)],
+            [sw, _make_node(sw.ne, se.nw, sw.se, se.sw), se],
+        ]
+        if generations_exponent == node.level - 2:
+            # Going as far as we can; We advance the squares half of the way
+            # and their combinations the other half.
+            sub_exponent = generations_exponent - 1
+            centers = [[_advance(square, sub_exponent, rules)
+                        for square in row] for row in squares]
+        else:
+            # The squares' combinations can advance all of the way by
+            # themselves.
+            sub_exponent = generations_exponent
+            centers = [[_get_center(square) for square in row]
+                       for row in squares]
+        quadrants = [
+            _advance(
+                _make_node(centers[y][x], centers[y][x + 1],
+                           centers[y + 1][x], centers[y + 1][x + 1]),
+                sub_exponent, rules
+            )
+            for (x, y) in ((0, 0), (1, 0), (0, 1), (1, 1))
+        ]
+        result = _make_node(*quadrants)
+    
+    _results[key] = result
+    return result
+
+
+def _get_subnode(node, x, y, level):
+    '''Get the node of the given level with its corner at `(x, y)`.'''
+    while node.level > level:
+        half = 2 ** (node.level - 1)
+        if x < half:
+            node = node.nw if y < half else node.sw
+        else:
+            node = node.ne if y < half else node.se
+        (x, y) = (x % half, y % half)
+    return node
+
+
+def _set_cell(node, x, y, value):
+    '''Get a copy of `node` with cell `(x, y)` set to `value`.'''
+    if node.level == 0:
+        return _get_cell_node(value)
+    half = 2 ** (node.level - 1)
+    (nw, ne, sw, se) = (node.nw, node.ne, node.sw, node.se)
+    if x < half and y < half:
+        nw = _set_cell(nw, x, y, value)
+    elif y < half:
+        ne = _set_cell(ne, x - half, y, value)
+    elif x < half:
+        sw = _set_cell(sw, x, y - half, value)
+    else:
+        se = _set_cell(se, x - half, y - half, value)
+    return _make_node(nw, ne, sw, se)
+
+
+def _crop(node, x, y, width, height):
+    '''
+    Kill the cells of `node` that are outside a `width` by `height` rectangle.
+    
+    The rectangle's corner is at `(0, 0)`, and `node`'s corner is at `(x, y)`.
+    '''
+    size = 2 ** node.level
+    if node.population == 0 or (x + size <= width and y + size <= height):
+        return node
+    if x >= width or y >= height:
+        return _get_empty_node(node.level)
+    half = size // 2
+    return _make_node(_crop(node.nw, x, y, width, height),
+                      _crop(node.ne, x + half, y, width, height),
+                      _crop(node.sw, x, y + half, width, height),
+                      _crop(node.se, x + half, y + half, width, height))
+
+
+def _iterate_live_cells(node, x, y):
+    '''Iterate over the coordinates of the live cells in `node`.'''
+    nodes_to_visit = [(node, x, y)]
+    while nodes_to_visit:
+        (node, x, y) = nodes_to_visit.pop()
+        if node.population == 0:
+            continue
+        if node.level == 0:
+            yield (x, y)
+            continue
+        half = 2 ** (node.level - 1)
+        nodes_to_visit += [(node.se, x + half, y + half),
+                           (node.sw, x, y + half),
+                           (node.ne, x + half, y),
+                           (node.nw, x, y)]
+
+
+def _are_equal(node, other_node):
+    '''Check whether two nodes have the same cells.'''
+    if node is other_node:
+        return True
+    if node.level != other_node.level or \
+       node.population != other_node.population or node.level == 0:
+        return False
+    if node.population == 0:
+        return True
+    return _are_equal(node.nw, other_node.nw) and \
+           _are_equal(node.ne, other_node.ne) and \
+           _are_equal(node.sw, other_node.sw) and \
+           _are_equal(node.se, other_node.se)
+
+
+class HashlifeBoard(Board):
+    '''
+    A Life board that uses Hashlife to skip many turns at once.
+    
+    The board keeps its cells in a quadtree whose nodes are shared and whose
+    futures are memoized, so patterns that repeat in space or in time are
+    computed only once. `leap` can then advance the board by
+    `2 ** generations_exponent` turns in one go, which is what
+    `State.leap_step` does. To use it, pass `board_class=HashlifeBoard` when
+    creating the root state, e.g.:
+        
+        State.create_diehard(1024, 1024, board_class=HashlifeBoard)
+    
+    and crunch it with the `State.leap_step` step function.
+    
+    The board wraps around at the edges like `Board`. Boards whose width and
+    height are the same power of 2 leap the fastest, because the wrapped
+    board tiles the quadtree exactly.
+    '''
+    
+    max_cache_size = 1000000
+    '''
+    The number of nodes and memoized futures to keep before starting over.
+    
+    This is shared by all Hashlife boards.
+    '''
+    
+    def __init__(self, width=None, height=None, fill='empty', parent=None,
+                 birth=[3], survival=[2, 3], randomness=0):
+        '''
+        Constructor.
+        
+        If `parent` is specified, makes a board which is descendent from the
+        parent.
+        '''
+        if parent:
+            assert width == height == None
+            self.width, self.height = (parent.width, parent.height)
+            self.__root = parent.__advance(
+                0, (frozenset(birth), frozenset(survival))
+            )
+            if randomness:
+                for x in range(self.width):
+                    for y in range(self.height):
+                        if random.random() <= randomness:
+                            self.set(x, y, random.choice([True, False]))
+            return
+        
+        assert fill in ['empty', 'full', 'random']
+        
+        self.width, self.height = (width, height)
+        level = max(1, (max(width, height) - 1).bit_length())
+        self.__root = _get_empty_node(level)
+        '''
+        The quadtree of the board.
+        
+        Its corner is at cell `(0, 0)`, and its cells that are beyond the
+        width or height of the board are kept dead.
+        '''
+        if fill != 'empty':
+            for x in range(width):
+                for y in range(height):
+                    if fill == 'full' or random.choice([True, False]):
+                        self.set(x, y, True)
+    
+    
+    def __get_tiled_node(self, level, x, y, tiled_nodes):
+        '''
+        Get a node of the board tiled all over the plane.
+        
+        The node is of the given level and its corner is at `(x, y)`.
+        `tiled_nodes` is a dict used for memoizing tiled nodes.
+        '''
+        key = (level, x, y)
+        try:
+            return tiled_nodes[key]
+        except KeyError:
+            pass
+        size = 2 ** level
+        if x + size <= self.width and y + size <= self.height and \
+           x % size == 0 and y % size == 0:
+            node = _get_subnode(self.__root, x, y, level)
+        else:
+            half = size // 2
+            (next_x, next_y) = ((x + half) % self.width,
+                                (y + half) % self.height)
+            node = _make_node(
+                self.__get_tiled_node(level - 1, x, y, tiled_nodes),
+                self.__get_tiled_node(level - 1, next_x, y, tiled_nodes),
+                self.__get_tiled_node(level - 1, x, next_y, tiled_nodes),
+                self.__get_tiled_node(level - 1, next_x, next_y, tiled_nodes)
+            )
+        tiled_nodes[key] = node
+        return node
+    
+    
+    def __advance(self, generations_exponent, rules):
+        '''
+        Get the quadtree of the board after `2 ** generations_exponent` turns.
+        
+        `rules` is a tuple `(birth, survival)` of sets of numbers of live
+        neighbors.
+        '''
+        root_level = self.__root.level
+        # We take a node of the tiled board that's big enough for its center
+        # to cover the board, and whose center's corner is at `(0, 0)`:
+        level = max(root_level + 1, generations_exponent + 2)
+        offset = 2 ** (level - 2)
+        node = self.__get_tiled_node(level, -offset % self.width,
+                                     -offset % self.height, {})
+        result = _advance(node, generations_exponent, rules)
+        return _crop(_get_subnode(result, 0, 0, root_level), 0, 0,
+                     self.width, self.height)
+    
+    
+    def leap(self, generations_exponent, birth=[3], survival=[2, 3]):
+        '''
+        Get the board that this board becomes after many turns.
+        
+        The board advances `2 ** generations_exponent` turns. See `State.step`
+        for the meaning of the other arguments.
+        '''
+        board = HashlifeBoard(self.width, self.height)
+        board.__root = self.__advance(
+            generations_exponent, (frozenset(birth), frozenset(survival))
+        )
+        return board
+    
+    
+    def get(self, x, y):
+        '''Get the value of cell `(x, y)` in the board.'''
+        return _get_subnode(self.__root, x % self.width, y % self.height,
+                            0) is _alive
+    
+    
+    def set(self, x, y, value):
+        '''
+        Set the value of cell `(x, y)` in the board to the specified value.
+        '''
+        self.__root = _set_cell(self.__root, x % self.width, y % self.height,
+                                bool(value))
+    
+    
+    def get_n_live_cells(self):
+        '''Return how many live cells there are in the board.'''
+        return self.__root.population
+    
+    
+    def __repr__(self):
+        '''Display the board, ASCII-art style.'''
+        rows = [[' '] * self.width for y in range(self.height)]
+        for (x, y) in _iterate_live_cells(self.__root, 0, 0):
+            rows[y][x] = '#'
+        return '\n'.join(''.join(row) for row in rows)
+    
+    
+    def __eq__(self, other):
+        return isinstance(other, HashlifeBoard) and \
+               (self.width, self.height) == (other.width, other.height) and \
+               _are_equal(self.__root, other.__root)
+    
+    
+    def __hash__(self):
+        # Defining __hash__ because there's __eq__ which makes the default
+        # __hash__ disappear on Python 3.
+        return id(self)
@@ -0,0 +1,168 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''
+This module defines the `IncrementalBoard` class.
+
+See its documentation for more information.
+'''
+
+import random
+import itertools
+
+from .state import Board
+
+
+_neighbor_offsets = [(i, j) for i in [-1, 0, 1] for j in [-1, 0, 1]
+                     if not i == j == 0]
+
+
+class IncrementalBoard(Board):
+    '''
+    A Life board that recomputes only the cells which may have changed.
+    
+    The board keeps the set of its live cells, and remembers which cells
+    changed since its parent board. A cell can only change in the next turn
+    if a cell in its neighborhood changed in this turn, so when stepping with
+    the same rules as before, only the neighborhoods of the changed cells are
+    recomputed. This makes stepping a sparse board, like the one made by
+    `create_diehard`, take time proportional to the activity on the board
+    rather than to its area. To use it, pass `board_class=IncrementalBoard`
+    when creating the root state, e.g.:
+        
+        State.create_diehard(1000, 1000, board_class=IncrementalBoard)
+    
+    When the rules change, or after a step with randomness, the board can't
+    tell which cells are stable, so it checks the neighborhoods of all the live
+    cells instead.
+    '''
+    
+    def __init__(self, width=None, height=None, fill='empty', parent=None,
+                 birth=[3], survival=[2, 3], randomness=0):
+        '''
+        Constructor.
+        
+        If `parent` is specified, makes a board which is descendent from the
+        parent.
+        '''
+        self.__rules = None
+        '''The `(birth, survival)` rules that made this board, if known.'''
+        
+        self.__changed_cells = None
+        '''
+        Set of the cells that changed since the parent board, if known.
+        
+        This is `None` when we can't tell which cells are stable, like for a
+        root board or after a step with randomness.
+        '''
+        
+        if parent:
+            assert width == height == None
+            self.width, self.height = (parent.width, parent.height)
+            rules = (frozenset(birth), frozenset(survival))
+            changed_cells = parent.__get_changing_cells(rules)
+            self.__live_cells = parent.__live_cells ^ changed_cells
+            if randomness:
+                for cell in self.__iterate_all_cells():
+                    if random.random() <= randomness:
+                        self.set(*cell, value=random.choice([True, False]))
+            else:
+                (self.__rules, self.__changed_cells) = (rules, changed_cells)
+            return
+        
+        assert fill in ['empty', 'full', 'random']
+        
+        self.width, self.height = (width, height)
+        if fill == 'empty':
+            self.__live_cells = set()
+        elif fill == 'full':
+            self.__live_cells = set(self.__iterate_all_cells())
+        elif fill == 'random':
+            self.__live_cells = set(
+                cell for cell in self.__iterate_all_cells()
+                if random.choice([True, False])
+            )
+    
+    
+    def __iterate_all_cells(self):
+        '''Iterate over the coordinates of all the cells in the board.'''
+        return itertools.product(range(self.width), range(self.height))
+    
+    
+    def __get_neighborhoods(self, cells):
+        '''Get the set of cells that are in or next to any of `cells`.'''
+        (width, height) = (self.width, self.height)
+        neighborhoods = set(cells)
+        for (x, y) in cells:
+            for (i, j) in _neighbor_offsets:
+                neighborhoods.add(((x + i) % width, (y + j) % height))
+        return neighborhoods
+    
+    
+    def __get_changing_cells(self, rules):
+        '''
+        Get the set of cells that will change in the next turn.
+        
+        `rules` is a tuple `(birth, survival)` of sets of numbers of live
+        neighbors. Randomness isn't taken into account.
+        '''
+        (birth, survival) = rules
+        if (self.__changed_cells is not None) and (self.__rules == rules):
+            cells_to_check = self.__get_neighborhoods(self.__changed_cells)
+        elif 0 in birth:
+            # Even cells with no live neighbors may come alive.
+            cells_to_check = self.__iterate_all_cells()
+        else:
+            cells_to_check = self.__get_neighborhoods(self.__live_cells)
+        
+        (width, height) = (self.width, self.height)
+        live_cells = self.__live_cells
+        changing_cells = set()
+        for cell in cells_to_check:
+            (x, y) = cell
+            n = 0
+            for (i, j) in _neighbor_offsets:
+                if ((x + i) % width, (y + j) % height) in live_cells:
+                    n += 1
+            if cell in live_cells:
+                if n not in survival:
+                    changing_cells.add(cell)
+            else: # cell not in live_cells
+                if n in birth:
+                    changing_cells.add(cell)
+        return changing_cells
+    
+    
+    def get(self, x, y):
+        '''Get the value of cell `(x, y)` in the board.'''
+        return (x % self.width, y % self.height) in self.__live_cells
+    
+    
+    def set(self, x, y, value):
+        '''
+        Set the value of cell `(x, y)` in the board to the specified value.
+        '''
+        cell = (x % self.width, y % self.height)
+        if value:
+            self.__live_cells.add(cell)
+        else:
+            self.__live_cells.discard(cell)
+        # We don't know which cells are stable anymore:
+        self.__changed_cells = None
+    
+    
+    def get_n_live_cells(self):
+        '''Return how many live cells there are in the board.'''
+        return len(self.__live_cells)
+    
+    
+    def __eq__(self, other):
+        return isinstance(other, IncrementalBoard) and \
+               (self.width, self.height) == (other.width, other.height) and \
+               self.__live_cells == other.__live_cells
+    
+    
+    def __hash__(self):
+        # Defining __hash__ because there's __eq__ which makes the default
+        # __hash__ disappear on Python 3.
+        return id(self)
@@ -0,0 +1,121 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''
+This module defines the `NumpyBoard` class.
+
+See its documentation for more information.
+'''
+
+import numpy
+
+from .state import Board
+
+
+class NumpyBoard(Board):
+    '''
+    A Life board that keeps its cells in a NumPy array.
+    
+    This behaves like `Board`, but computes the next generation for all the
+    cells at once with array operations, instead of one cell at a time in
+    Python. This makes stepping big boards much faster. To use it, pass
+    `board_class=NumpyBoard` when creating the root state, e.g.:
+        
+        State.create_root(1000, 1000, fill='random', board_class=NumpyBoard)
+    
+    Requires NumPy.
+    '''
+    
+    def __init__(self, width=None, height=None, fill='empty', parent=None,
+                 birth=[3], survival=[2, 3], randomness=0):
+        '''
+        Constructor.
+        
+        If `parent` is specified, makes a board which is descendent from the
+        parent.
+        '''
+        if parent:
+            assert width == height == None
+            self.width, self.height = (parent.width, parent.height)
+            self.__cells = parent._get_next_cells(birth=birth,
+                                                  survival=survival,
+                                                  randomness=randomness)
+            return
+        
+        assert fill in ['empty', 'full', 'random']
+        
+        self.width, self.height = (width, height)
+        if fill == 'random':
+            self.__cells = numpy.random.random((width, height)) < 0.5
+        else:
+            self.__cells = numpy.empty((width, height), dtype=bool)
+            self.__cells.fill(fill == 'full')
+    
+    
+    def get(self, x, y):
+        '''Get the value of cell `(x, y)` in the board.'''
+        return bool(self.__cells[x % self.width, y % self.height])
+    
+    
+    def set(self, x, y, value):
+        '''
+        Set the value of cell `(x, y)` in the board to the specified value.
+        '''
+        self.__cells[x % self.width, y % self.height] = value
+    
+    
+    def get_n_live_cells(self):
+        '''Return how many live cells there are in the board.'''
+        return int(numpy.count_nonzero(self.__cells))
+    
+    
+    def _get_next_cells(self, birth=[3], survival=[2, 3], randomness=0):
+        '''
+        Get the array of cells that this board will have in the next turn.
+        
+        See `State.step` for the meaning of the arguments.
+        '''
+        cells = self.__cells
+        
+        # Summing each cell's column of three, and then each row of three
+        # columns, gives the number of live cells in the 3x3 square around
+        # each cell. The board wraps around at the edges.
+        columns = cells.astype(numpy.uint8)
+        columns += numpy.roll(cells, 1, axis=1)
+        columns += numpy.roll(cells, -1, axis=1)
+        squares = columns.copy()
+        squares += numpy.roll(columns, 1, axis=0)
+        squares += numpy.roll(columns, -1, axis=0)
+        live_neighbors_counts = squares - cells
+        
+        # `rules[alive, n]` says what a cell becomes if it's `alive` and has
+        # `n` live neighbors:
+        rules = numpy.zeros((2, 9), dtype=bool)
+        rules[0, [n for n in birth if 0 <= n <= 8]] = True
+        rules[1, [n for n in survival if 0 <= n <= 8]] = True
+        next_cells = rules[cells.astype(numpy.intp), live_neighbors_counts]
+        
+        if randomness:
+            random_cells = numpy.random.random(cells.shape) <= randomness
+            next_cells[random_cells] = \
+                numpy.random.random(numpy.count_nonzero(random_cells)) < 0.5
+        
+        return next_cells
+    
+    
+    def __repr__(self):
+        '''Display the board, ASCII-art style.'''
+        rows = numpy.where(self.__cells.T, '#', ' ')
+        return '\n'.join(''.join(row) for row in rows)
+    
+    
+    def __eq__(self, other):
+        return isinstance(other, NumpyBoard) and \
+               self.__cells.shape == other.__cells.shape and \
+               bool((self.__cells == other.__cells).all())
+    
+    
+    def __hash__(self):
+        # Defining __hash__ because there's __eq__ which makes the default
+        # __hash__ disappear on Python 3.
+        return id(self)
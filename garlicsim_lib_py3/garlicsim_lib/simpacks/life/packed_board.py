@@ -0,0 +1,206 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''
+This module defines the `PackedBoard` class.
+
+See its documentation for more information.
+'''
+
+import random
+
+from garlicsim.general_misc import caching
+
+from .state import Board
+
+
+@caching.cache()
+def _get_masks(width, height):
+    '''
+    Get bit masks for a board of the given size.
+    
+    Returns `(first_row, last_row, all_cells)`.
+    '''
+    n_cells = width * height
+    all_cells = (1 << n_cells) - 1
+    # Cell `(x, y)` is bit number `x * height + y`, so the bits of the first
+    # row are spaced `height` apart:
+    first_row = all_cells // ((1 << height) - 1)
+    last_row = first_row << (height - 1)
+    return (first_row, last_row, all_cells)
+
+
+def _count_bits(number):
+    '''Count the bits that are set in a non-negative integer.'''
+    return bin(number).count('1')
+
+
+def _make_number(bit_indices, n_bits):
+    '''Make an integer with the given bits set.'''
+    bits = bytearray((n_bits + 7) // 8)
+    for i in bit_indices:
+        bits[i // 8] |= 1 << (i % 8)
+    return int.from_bytes(bytes(bits), 'little')
+
+
+class PackedBoard(Board):
+    '''
+    A Life board that keeps its cells as bits of a single integer.
+    
+    This takes one bit per cell instead of a list reference per cell, which
+    makes states much smaller to keep in the tree and to pickle, e.g. when
+    sending them from a `ProcessCruncher`. The next generation is computed
+    with bitwise operations on all the cells at once, and the live cells are
+    counted and compared with bit counts. To use it, pass
+    `board_class=PackedBoard` when creating the root state, e.g.:
+        
+        State.create_root(1000, 1000, fill='random', board_class=PackedBoard)
+        
+    '''
+    
+    def __init__(self, width=None, height=None, fill='empty', parent=None,
+                 birth=[3], survival=[2, 3], randomness=0):
+        '''
+        Constructor.
+        
+        If `parent` is specified, makes a board which is descendent from the
+        parent.
+        '''
+        if parent:
+            assert width == height == None
+            self.width, self.height = (parent.width, parent.height)
+            self.__cells = parent.__get_next_cells(birth, survival)
+            if randomness:
+                self.__randomize(randomness)
+            return
+        
+        assert fill in ['empty', 'full', 'random']
+        
+        self.width, self.height = (width, height)
+        if fill == 'empty':
+            self.__cells = 0
+        elif fill == 'full':
+            self.__cells = (1 << (width * height)) - 1
+        elif fill == 'random':
+            self.__cells = random.getrandbits(width * height)
+    
+    
+    def __get_next_cells(self, birth, survival):
+        '''
+        Get the cells that this board will have in the next turn.
+        
+        See `State.step` for the meaning of the arguments.
+        '''
+        (width, height) = (self.width, self.height)
+        (first_row, last_row, all_cells) = _get_masks(width, height)
+        n_cells = width * height
+        cells = self.__cells
+        
+        # Making a bit plane for each of the 8 neighbor directions, where a
+        # cell's bit is the value of its neighbor. The board wraps around.
+        up = ((cells << 1) & ~first_row & all_cells) | \
+             ((cells >> (height - 1)) & first_row)
+        down = ((cells >> 1) & ~last_row) | \
+               ((cells << (height - 1)) & last_row & all_cells)
+        neighbor_planes = [up, down]
+        for plane in [cells, up, down]:
+            neighbor_planes.append(
+                ((plane << height) & all_cells) | (plane >> (n_cells - height))
+            )
+            neighbor_planes.append(
+                (plane >> height) | ((plane << (n_cells - height)) & all_cells)
+            )
+        
+        # Adding up the planes into a 4-bit count of live neighbors for each
+        # cell, stored as 4 planes:
+        counts = [0, 0, 0, 0]
+        for plane in neighbor_planes:
+            carry = plane
+            for k in range(4):
+                (counts[k], carry) = (counts[k] ^ carry, counts[k] & carry)
+                if not carry:
+                    break
+        
+        def get_cells_with_count(n):
+            '''Get the cells that have exactly `n` live neighbors.'''
+            result = all_cells
+            for k in range(4):
+                result &= counts[k] if (n >> k) & 1 else ~counts[k]
+            return result
+        
+        born = survived = 0
+        for n in birth:
+            if 0 <= n <= 8:
+                born |= get_cells_with_count(n)
+        for n in survival:
+            if 0 <= n <= 8:
+                survived |= get_cells_with_count(n)
+        return (cells & survived) | (~cells & born)
+    
+    
+    def __randomize(self, randomness):
+        '''Put random values in cells, each with a chance of `randomness`.'''
+        n_cells = self.width * self.height
+        cells_to_kill = []
+        cells_to_revive = []
+        for i in range(n_cells):
+            if random.random() <= randomness:
+                if random.choice([True, False]):
+                    cells_to_revive.append(i)
+                else:
+                    cells_to_kill.append(i)
+        self.__cells = (self.__cells &
+                        ~_make_number(cells_to_kill, n_cells)) | \
+                       _make_number(cells_to_revive, n_cells)
+    
+    
+    def get(self, x, y):
+        '''Get the value of cell `(x, y)` in the board.'''
+        i = (x % self.width) * self.height + (y % self.height)
+        return bool((self.__cells >> i) & 1)
+    
+    
+    def set(self, x, y, value):
+        '''
+        Set the value of cell `(x, y)` in the board to the specified value.
+        '''
+        i = (x % self.width) * self.height + (y % self.height)
+        if value:
+            self.__cells |= 1 << i
+        else:
+            self.__cells &= ~(1 << i)
+    
+    
+    def get_n_live_cells(self):
+        '''Return how many live cells there are in the board.'''
+        return _count_bits(self.__cells)
+    
+    
+    def get_n_different_cells(self, other):
+        '''Return in how many cells this board differs from `other`.'''
+        if isinstance(other, PackedBoard):
+            return _count_bits(self.__cells ^ other.__cells)
+        return Board.get_n_different_cells(self, other)
+    
+    
+    def __repr__(self):
+        '''Display the board, ASCII-art style.'''
+        n_cells = self.width * self.height
+        # The characters of the cells by their bit numbers:
+        characters = bin(self.__cells)[2:].zfill(n_cells)[::-1].translate(
+            {ord('0'): ' ', ord('1'): '#'}
+        )
+        return '\n'.join(characters[y::self.height]
+                         for y in range(self.height))
+    
+    
+    def __eq__(self, other):
+        return isinstance(other, PackedBoard) and \
+               (self.width, self.height) == (other.width, other.height) and \
+               self.__cells == other.__cells
+    
+    
+    def __hash__(self):
+        # Defining __hash__ because there's __eq__ which makes the default
+        # __hash__ disappear on Python 3.
+        return id(self)
@@ -4,6 +4,8 @@
 '''Settings module for the `life` simpack'''
 
 
-from .state import determinism_function
+from .state import determinism_function, state_fingerprint_function
 
 DETERMINISM_FUNCTION = determinism_function
+
+STATE_FINGERPRINT_FUNCTION = state_fingerprint_function
@@ -17,7 +17,7 @@ class State(garlicsim.data_structures.State):
     '''World state. A frozen moment in time in the simulation world.'''
 
     @staticmethod
-    def create_diehard(width=45, height=25):
+    def create_diehard(width=45, height=25, board_class=None):
         '''
         Create the Diehard Metushelah.
         
@@ -26,29 +26,35 @@ class State(garlicsim.data_structures.State):
                    #
              ##
               #   ###
-
+        
+        `board_class` is the `Board` subclass to use, e.g. `NumpyBoard`.
+        States stepped from this one will use the same kind of board.
         '''
         state = State()
-        state.board = Board.create_diehard(width, height)
+        state.board = (board_class or Board).create_diehard(width, height)
         return state
 
     
     @staticmethod
-    def create_root(width=45, height=25, fill='empty'):
+    def create_root(width=45, height=25, fill='empty', board_class=None):
         '''
         Create a plain and featureless world state.
         
         `fill` may be either 'empty', 'full', or 'random'.
+        
+        `board_class` is the `Board` subclass to use, e.g. `NumpyBoard`.
+        States stepped from this one will use the same kind of board.
         '''
         state = State()
-        state.board = Board(width, height, fill)
+        state.board = (board_class or Board)(width, height, fill)
         return state
 
     
     @staticmethod
-    def create_messy_root(width=45, height=25):
+    def create_messy_root(width=45, height=25, board_class=None):
         '''Create a state with a random board.'''
-        return State.create_root(width, height, fill='random')
+        return State.create_root(width, height, fill='random',
+                                 board_class=board_class)
     
 
     def step_generator(self, birth=[3], survival=[2, 3], randomness=0):
@@ -87,19 +93,36 @@ class State(garlicsim.data_structures.State):
         respectively.
         '''
         old_board = self.board
-        new_board = Board(parent=old_board,
-                          birth=birth,
-                          survival=survival,
-                          randomness=randomness)
+        new_board = type(old_board)(parent=old_board,
+                                    birth=birth,
+                                    survival=survival,
+                                    randomness=randomness)
         new_state = State()
         new_state.board = new_board
         return new_state
     
     
+    def leap_step(self, generations_exponent=10, birth=[3], survival=[2, 3]):
+        '''
+        Return the state that comes `2 ** generations_exponent` turns later.
+        
+        This is meant for boards that can skip many turns at once, like
+        `HashlifeBoard`; Other boards just take all the turns one by one. See
+        `.step` for the meaning of the other arguments. There is no
+        randomness, because skipping turns relies on the rules being
+        deterministic.
+        '''
+        new_state = State()
+        new_state.board = self.board.leap(generations_exponent, birth=birth,
+                                          survival=survival)
+        new_state.clock = getattr(self, 'clock', 0) + 2 ** generations_exponent
+        return new_state
+    
+    
     @garlicsim.general_misc.caching.cache()
     def get_n_live_cells(self):
         '''Return how many live cells there are in the board.'''
-        return self.board._Board__list.count(True)
+        return self.board.get_n_live_cells()
 
 
     def __repr__(self):
@@ -117,12 +140,8 @@ class State(garlicsim.data_structures.State):
     
     def __sub__(self, other): # todo: experimental, test
         if isinstance(other, State):
-            return sum(
-                (x-y) for (x, y) in zip(
-                    self.board._Board__list,
-                    other.board._Board__list
-                )
-            )
+            # Summing the differences between the cells comes down to this:
+            return self.get_n_live_cells() - other.get_n_live_cells()
                 
         else:
             return NotImplemented
@@ -171,6 +190,19 @@ class Board(object):
             self.__list.append(make_cell())
         
     
+    def leap(self, generations_exponent, birth=[3], survival=[2, 3]):
+        '''
+        Get the board that this board becomes after many turns.
+        
+        The board advances `2 ** generations_exponent` turns. See `State.step`
+        for the meaning of the other arguments.
+        '''
+        board = self
+        for i in range(2 ** generations_exponent):
+            board = type(self)(parent=board, birth=birth, survival=survival)
+        return board
+    
+    
     def get(self, x, y):
         '''Get the value of cell `(x, y)` in the board.'''
         return self.__list[ (x % self.width) * self.height + (y%self.height) ]
@@ -183,6 +215,19 @@ class Board(object):
         self.__list[ (x%self.width) * self.height + (y%self.height) ] = value
 
         
+    def get_n_live_cells(self):
+        '''Return how many live cells there are in the board.'''
+        return self.__list.count(True)
+    
+    
+    def get_n_different_cells(self, other):
+        '''Return in how many cells this board differs from `other`.'''
+        return sum(
+            self.get(x, y) != other.get(x, y) for x in range(self.width)
+            for y in range(self.height)
+        )
+    
+    
     def get_live_neighbors_count(self, x, y):
         '''Get the number of live neighbors a cell has.'''
         result = 0
@@ -235,8 +280,8 @@ class Board(object):
         return not self.__eq__(other)
     
             
-    @staticmethod
-    def create_diehard(width=45, height=25):
+    @classmethod
+    def create_diehard(cls, width=45, height=25):
         '''
         Create the Diehard Metushelah.
         
@@ -247,7 +292,7 @@ class Board(object):
               #   ###
 
         '''
-        board = Board(width, height)
+        board = cls(width, height)
         (x, y) = (width//2, height//2)
         for (i, j) in [(6, 0), (0, 1), (1, 1), (1, 2), (5, 2), (6, 2), (7, 2)]:
             board.set(x + i, y + j, True)
@@ -258,12 +303,21 @@ class Board(object):
 
 def determinism_function(step_profile):
     '''Get determinism class of `step_profile`.'''
-    if step_profile['randomness']:
+    if step_profile.get('randomness'):
         return garlicsim.misc.settings_constants.UNDETERMINISTIC
     else:
         return garlicsim.misc.settings_constants.DETERMINISTIC
 
 
+def state_fingerprint_function(state):
+    '''
+    Get a fingerprint of `state` for noticing that the simulation repeats.
+    
+    The board itself will do, since boards are compared by their cells.
+    '''
+    return state.board
+
+
    
 
 """
@@ -17,12 +17,37 @@ class Event(object):
     event happens.
     '''
     
-    def __init__(self, time_left, action):
+    def __init__(self, event_set, time_left, action):
         assert time_left > 0
-        self.time_left = time_left
+        
+        self.event_set = event_set
+        '''The event set that this event belongs to.'''
+        
+        self.time = event_set.time + time_left
+        '''The time of the event set at which this event will happen.'''
+        
         self.action = action
         self.done = False
+        self.cancelled = False
 
         
     def _get_time_left(self):
-        return self.time_left
\ No newline at end of file
+        return self.time - self.event_set.time
+    
+    time_left = property(_get_time_left)
+    
+    
+    def cancel(self):
+        '''Cancel the event, so it will not happen.'''
+        assert not self.done
+        self.cancelled = True
+        
+        
+    def __setstate__(self, event_state):
+        if 'time_left' in event_state:
+            # This event was pickled before events knew their event set. Its
+            # event set starts counting time from zero when it's unpickled, and
+            # sets itself as the event's `.event_set`.
+            event_state['time'] = event_state.pop('time_left')
+        event_state.setdefault('cancelled', False)
+        self.__dict__.update(event_state)
\ No newline at end of file
@@ -7,15 +7,43 @@ This module defines the `EventSet` class.
 See its documentation for more information.
 '''
 
+import heapq
+
 from .event import Event
 
 
 class EventSet(object):
-    '''A set of events that happen in the same "world".'''
+    '''
+    A set of events that happen in the same "world".
+    
+    The pending events are kept in a heap ordered by the time at which they'll
+    happen, so creating an event and making the next one happen take
+    O(log n) time. Events that were created earlier happen first among events
+    that happen at the same time. Cancelled events are left in the heap, and
+    are thrown away when they reach its top.
+    '''
     
     def __init__(self):
-        self.events = []
-        '''Sorted list of all the events in the system.'''
+        self.time = 0
+        '''The amount of time that was passed in this event set.'''
+        
+        self._heap = []
+        '''
+        Heap of the pending events.
+        
+        It contains tuples `(time, serial_number, event)`; The serial numbers
+        break ties between events that happen at the same time.
+        '''
+        
+        self._n_created_events = 0
+        '''The number of events created so far, used for serial numbers.'''
+    
+    
+    @property
+    def events(self):
+        '''Sorted list of all the pending events in the system.'''
+        return [event for (time, serial_number, event) in sorted(self._heap)
+                if not event.cancelled]
     
         
     def create_event(self, time_left, action):
@@ -24,29 +52,52 @@ class EventSet(object):
 
         Returns the new event.
         '''
-        event = Event(time_left, action)
+        event = Event(self, time_left, action)
         
-        self.events.append(event)
-        self.events.sort(key=Event._get_time_left)
+        heapq.heappush(self._heap,
+                       (event.time, self._n_created_events, event))
+        self._n_created_events += 1
         
         return event
 
     
     def do_next_event(self):
         '''
-        Pass the time until the closest pending event(s), making them happen.
+        Pass the time until the closest pending event, making it happen.
         
         Return the amount of time that was passed.
         '''
-        if not self.events:
+        heap = self._heap
+        while heap and heap[0][2].cancelled:
+            heapq.heappop(heap)
+            
+        if not heap:
             raise Exception('No pending events.')
             
-        closest_event = self.events.pop(0)
+        (time, serial_number, closest_event) = heapq.heappop(heap)
+        time_passed = time - self.time
+        self.time = time
         
-        for event in self.events:
-            event.time_left -= closest_event.time_left
-            
+        closest_event.done = True
         closest_event.action()
         
-        return closest_event.time_left
+        return time_passed
+    
+    
+    def __setstate__(self, event_set_state):
+        if 'events' in event_set_state:
+            # This event set was pickled before the events were kept in a heap.
+            # Its events were already unpickled, with the time left to them as
+            # their time, so we start counting time from zero.
+            events = event_set_state.pop('events')
+            event_set_state.update(
+                time=0,
+                _heap=[(event.time, serial_number, event) for
+                       (serial_number, event) in enumerate(events)],
+                _n_created_events=len(events)
+            )
+            for event in events:
+                event.event_set = self
+            heapq.heapify(event_set_state['_heap'])
+        self.__dict__.update(event_set_state)
     
\ No newline at end of file
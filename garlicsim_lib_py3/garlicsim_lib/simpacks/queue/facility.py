@@ -7,6 +7,10 @@ This module defines the `Server` class.
 See its documentation for more information.
 '''
 
+import collections
+import heapq
+
+from garlicsim.general_misc import caching
 from garlicsim.general_misc import identities
 
 import garlicsim
@@ -16,7 +20,7 @@ from .server import Server
 class Facility(identities.HasIdentity):
     '''A facility in which there are servers serving clients.'''
     
-    def __init__(self, event_set, servers=[], clients=[]):
+    def __init__(self, event_set, servers=None, clients=()):
         identities.HasIdentity.__init__(self)
         
         self.event_set = event_set
@@ -24,16 +28,36 @@ class Facility(identities.HasIdentity):
         An event set for events such as servers finishing or clients arriving.
         '''
         
-        self.servers = servers
+        self.servers = servers if servers is not None else []
         '''List of all the servers in the facility.'''
         
-        self.clients = clients
+        self.clients = set(clients)
         '''
-        List of all the clients, both those getting served and those on queue.
+        Set of all the clients, both those getting served and those on queue.
         '''
         
-        self.waiting_clients = clients[:]
-        '''List of all the clients waiting in the queue.'''
+        self.waiting_clients = collections.deque(clients)
+        '''Queue of all the clients waiting to be served, first one first.'''
+        
+        self.idle_server_indices = self._get_idle_server_indices()
+        '''
+        Heap of the indices in `.servers` of the servers that are idle.
+        
+        New clients are served by the idle server that comes first in
+        `.servers`, which is the one at the top of this heap.
+        '''
+        
+        
+    def _get_idle_server_indices(self):
+        '''Get a heap of the indices of the servers that are idle.'''
+        return [i for (i, server) in enumerate(self.servers)
+                if not server.is_busy()]
+    
+    # Facilities pickled before we kept `.idle_server_indices` don't have it,
+    # and we can't build it when they're unpickled, because their servers might
+    # not be unpickled yet. So for them it's built when it's first used:
+    idle_server_indices = caching.CachedProperty(_get_idle_server_indices,
+                                                 name='idle_server_indices')
         
         
     def create_server(self, mean_service_time):
@@ -44,17 +68,18 @@ class Facility(identities.HasIdentity):
             mean_service_time=mean_service_time
         )
         self.servers.append(new_server)
+        heapq.heappush(self.idle_server_indices, len(self.servers) - 1)
         return new_server
 
     
     def add_client(self, client):
         '''Add a new client to this facility, to be served by a server.'''
-        self.clients.append(client)
+        self.clients.add(client)
         if not self.waiting_clients: # Queue is empty, no waiting clients
             # If there's an idle server, have it service the new client:
-            idle_servers = list(self.idle_servers_generator())
-            if idle_servers:
-                first_idle_server = idle_servers[0]
+            if self.idle_server_indices:
+                i = heapq.heappop(self.idle_server_indices)
+                first_idle_server = self.servers[i]
                 first_idle_server.service_client(client)
             else:
                 self.waiting_clients.append(client)
@@ -64,21 +89,24 @@ class Facility(identities.HasIdentity):
             
     def idle_servers_generator(self):
         '''Generator that yields servers in the facility that are idle.'''
-        for server in self.servers:
-            if not server.is_busy():
-                yield server
+        for i in sorted(self.idle_server_indices):
+            yield self.servers[i]
             
             
     def feed_client(self, server):
         '''
         Order a server to start servicing the first client in the queue.
         
-        The server must be idle.
+        The server must be idle. If there are no clients in the queue, the
+        server waits for one with the other idle servers.
         '''
         assert not server.is_busy()
         if self.waiting_clients:
-            client = self.waiting_clients.pop(0)
+            client = self.waiting_clients.popleft()
             server.service_client(client)
+        else:
+            heapq.heappush(self.idle_server_indices,
+                           self.servers.index(server))
         
     
     def finished_client_count(self):
@@ -86,6 +114,19 @@ class Facility(identities.HasIdentity):
         return sum((server.client_counter for server in self.servers))
         
     
+    def __setstate__(self, facility_state):
+        '''
+        Restore the facility from its pickled state.
+        
+        Facilities pickled before we kept the clients in a set and the waiting
+        clients in a deque have lists instead.
+        '''
+        facility_state['clients'] = set(facility_state['clients'])
+        facility_state['waiting_clients'] = \
+            collections.deque(facility_state['waiting_clients'])
+        self.__dict__.update(facility_state)
+        
+    
     def __repr__(self):
         return ('<facility with %s clients, %s of which stand in queue. %s '
                 'clients were served total.>' % \
@@ -48,7 +48,7 @@ def __bootstrap():
                 os.path.split(__file__)[0],
                 '..',
                 '..',
-                'garlicsim'
+                'garlicsim_py3'
             )
         )
         sys.path.append(garlicsim_candidate_path)
@@ -58,7 +58,7 @@ def __bootstrap():
                 os.path.split(__file__)[0],
                 '..',
                 '..',
-                'garlicsim_lib'
+                'garlicsim_lib_py3'
             )
         )
         sys.path.append(garlicsim_lib_candidate_path)
@@ -68,7 +68,7 @@ def __bootstrap():
                 os.path.split(__file__)[0],
                 '..',
                 '..',
-                'garlicsim_wx'
+                'garlicsim_wx_py3'
             )
         )
         sys.path.append(garlicsim_wx_candidate_path)
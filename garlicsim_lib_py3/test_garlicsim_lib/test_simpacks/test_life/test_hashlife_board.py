@@ -0,0 +1,84 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''Testing module for `garlicsim_lib.simpacks.life.hashlife_board`.'''
+
+import pickle
+
+import garlicsim
+from garlicsim_lib.simpacks import life
+from garlicsim_lib.simpacks.life.hashlife_board import HashlifeBoard
+from garlicsim_lib.simpacks.life.incremental_board import IncrementalBoard
+
+
+def _copy_state(state, board_class):
+    '''Copy `state` into a new state with a board of `board_class`.'''
+    (width, height) = (state.board.width, state.board.height)
+    new_state = life.State.create_root(width, height,
+                                       board_class=board_class)
+    for x in range(width):
+        for y in range(height):
+            new_state.board.set(x, y, state.board.get(x, y))
+    return new_state
+
+
+def test_same_as_board():
+    '''Test that `HashlifeBoard` steps the same way as `Board`.'''
+    rules_sequence = [{}] * 3 + [{'birth': [3, 6]}] * 2 + \
+                     [{'birth': [0, 3], 'survival': [1]}] * 2 + [{}]
+    for (width, height) in [(8, 8), (12, 9), (1, 1)]:
+        state = life.State.create_messy_root(width, height)
+        hashlife_state = _copy_state(state, HashlifeBoard)
+        for rules in rules_sequence:
+            state = state.step(**rules)
+            hashlife_state = hashlife_state.step(**rules)
+            assert isinstance(hashlife_state.board, HashlifeBoard)
+            assert repr(state) == repr(hashlife_state)
+            assert state.get_n_live_cells() == \
+                   hashlife_state.get_n_live_cells()
+
+
+def test_leap():
+    '''Test leaping many turns at once.'''
+    for (width, height) in [(16, 16), (13, 7)]:
+        state = life.State.create_messy_root(width, height,
+                                             board_class=IncrementalBoard)
+        hashlife_state = _copy_state(state, HashlifeBoard)
+        for generations_exponent in [0, 3, 5, 2]:
+            state = state.leap_step(generations_exponent)
+            hashlife_state = hashlife_state.leap_step(generations_exponent)
+            assert repr(state) == repr(hashlife_state)
+
+    # A glider moves one cell diagonally every 4 turns, so after 2 ** 20
+    # turns it's back where it started on a 64x64 board:
+    state = life.State.create_root(64, 64, board_class=HashlifeBoard)
+    for (x, y) in [(1, 0), (2, 1), (0, 2), (1, 2), (2, 2)]:
+        state.board.set(x, y, True)
+    assert state.leap_step(20) == state
+    assert state.leap_step(2) != state
+
+    project = garlicsim.Project(life)
+    root = project.root_this_state(state)
+    step_profile = project.build_step_profile(life.State.leap_step,
+                                              generations_exponent=16)
+    assert life.state.determinism_function(step_profile) == \
+           garlicsim.misc.settings_constants.DETERMINISTIC
+    leaf = project.simulate(root, 3, step_profile)
+    assert leaf.state.clock == 3 * 2 ** 16
+    assert leaf.state == state
+    assert pickle.loads(pickle.dumps(leaf.state)) == state
+
+
+def test_bounded_cache():
+    '''Test that leaping stays right when the cache keeps filling up.'''
+    state = life.State.create_diehard(32, 32, board_class=IncrementalBoard)
+    hashlife_state = _copy_state(state, HashlifeBoard)
+    old_max_cache_size = HashlifeBoard.max_cache_size
+    HashlifeBoard.max_cache_size = 100
+    try:
+        for i in range(3):
+            state = state.leap_step(5)
+            hashlife_state = hashlife_state.leap_step(5)
+            assert repr(state) == repr(hashlife_state)
+    finally:
+        HashlifeBoard.max_cache_size = old_max_cache_size
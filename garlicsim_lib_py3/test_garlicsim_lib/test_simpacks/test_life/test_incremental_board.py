@@ -0,0 +1,62 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''Testing module for `garlicsim_lib.simpacks.life.incremental_board`.'''
+
+import pickle
+
+import garlicsim
+from garlicsim_lib.simpacks import life
+from garlicsim_lib.simpacks.life.incremental_board import IncrementalBoard
+
+
+def test_same_as_board():
+    '''Test that `IncrementalBoard` steps the same way as `Board`.'''
+    rules_sequence = [{}] * 3 + [{'birth': [3, 6]}] * 3 + \
+                     [{'randomness': 0.2}] + [{}] * 2 + \
+                     [{'birth': [0, 3], 'survival': [1]}] * 2 + [{}] * 2
+    for (width, height) in [(12, 9), (2, 2)]:
+        state = life.State.create_messy_root(width, height)
+        incremental_state = life.State.create_root(
+            width, height, board_class=IncrementalBoard
+        )
+        for x in range(width):
+            for y in range(height):
+                incremental_state.board.set(x, y, state.board.get(x, y))
+        for rules in rules_sequence:
+            if rules.get('randomness'):
+                # The random cells won't be the same, so we sync the boards:
+                incremental_state = incremental_state.step(**rules)
+                state = life.State.create_root(width, height)
+                for x in range(width):
+                    for y in range(height):
+                        state.board.set(x, y,
+                                        incremental_state.board.get(x, y))
+            else:
+                state = state.step(**rules)
+                incremental_state = incremental_state.step(**rules)
+            assert isinstance(incremental_state.board, IncrementalBoard)
+            assert repr(state) == repr(incremental_state)
+            assert state.get_n_live_cells() == \
+                   incremental_state.get_n_live_cells()
+
+
+def test_dirty_region():
+    '''Test that only the cells around the changed cells are recomputed.'''
+    state = life.State.create_diehard(200, 200, board_class=IncrementalBoard)
+    states = garlicsim.list_simulate(state, 135)
+    # The Diehard dies out after 130 generations:
+    assert states[129].get_n_live_cells() > 0
+    assert states[130].get_n_live_cells() == 0
+    assert states[-1].board == states[-2].board
+    for state in states[1:]:
+        # Out of the 40000 cells, only a few dozen change every turn:
+        assert len(state.board._IncrementalBoard__changed_cells) < 50
+    assert not states[-1].board._IncrementalBoard__changed_cells
+
+    new_state = pickle.loads(pickle.dumps(states[60]))
+    assert new_state == states[60]
+    assert new_state.step() == states[61]
+    new_state.board.set(0, 0, True)
+    assert new_state.board._IncrementalBoard__changed_cells is None
+    assert new_state != states[60]
@@ -0,0 +1,65 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''Testing module for `garlicsim_lib.simpacks.life.numpy_board`.'''
+
+import pickle
+
+import nose
+
+import garlicsim
+from garlicsim_lib.simpacks import life
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _skip_without_numpy():
+    if numpy is None:
+        raise nose.SkipTest('NumPy is not installed.')
+
+
+def test_same_as_board():
+    '''Test that `NumpyBoard` steps the same way as the default `Board`.'''
+    _skip_without_numpy()
+    from garlicsim_lib.simpacks.life.numpy_board import NumpyBoard
+
+    state = life.State.create_messy_root(12, 9)
+    numpy_state = life.State.create_root(12, 9, board_class=NumpyBoard)
+    for x in range(12):
+        for y in range(9):
+            numpy_state.board.set(x, y, state.board.get(x, y))
+
+    for rules in ({}, {'birth': [3, 6], 'survival': [0, 2, 3, 8]}):
+        states = garlicsim.list_simulate(state, 6, **rules)
+        numpy_states = garlicsim.list_simulate(numpy_state, 6, **rules)
+        for (state_, numpy_state_) in zip(states, numpy_states):
+            assert isinstance(numpy_state_.board, NumpyBoard)
+            assert repr(state_) == repr(numpy_state_)
+            assert state_.get_n_live_cells() == \
+                   numpy_state_.get_n_live_cells()
+            assert numpy_state_.board.get(-1, 13) is \
+                   state_.board.get(11, 4)
+
+
+def test_board_api():
+    '''Test creating, comparing and pickling `NumpyBoard` states.'''
+    _skip_without_numpy()
+    from garlicsim_lib.simpacks.life.numpy_board import NumpyBoard
+
+    state = life.State.create_diehard(board_class=NumpyBoard)
+    assert state.get_n_live_cells() == 7
+    assert repr(state) == repr(life.State.create_diehard())
+    assert state == life.State.create_diehard(board_class=NumpyBoard)
+    assert state != life.State.create_diehard()
+    assert pickle.loads(pickle.dumps(state)) == state
+
+    full_state = life.State.create_root(5, 4, fill='full',
+                                        board_class=NumpyBoard)
+    assert full_state.get_n_live_cells() == 20
+    assert full_state.step().get_n_live_cells() == 0
+    assert life.State.create_root(5, 4, board_class=NumpyBoard).step(
+        randomness=1
+    ).board.width == 5
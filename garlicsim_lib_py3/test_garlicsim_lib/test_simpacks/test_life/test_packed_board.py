@@ -0,0 +1,56 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''Testing module for `garlicsim_lib.simpacks.life.packed_board`.'''
+
+import pickle
+
+from garlicsim_lib.simpacks import life
+from garlicsim_lib.simpacks.life.packed_board import PackedBoard
+
+
+def test_same_as_board():
+    '''Test that `PackedBoard` steps the same way as `Board`.'''
+    rules_sequence = [{}] * 3 + [{'birth': [3, 6]}] * 2 + \
+                     [{'birth': [0, 3], 'survival': [1, 8]}] * 2 + [{}]
+    for (width, height) in [(12, 9), (1, 4), (5, 1), (2, 2)]:
+        state = life.State.create_messy_root(width, height)
+        packed_state = life.State.create_root(width, height,
+                                              board_class=PackedBoard)
+        for x in range(width):
+            for y in range(height):
+                packed_state.board.set(x, y, state.board.get(x, y))
+        for rules in rules_sequence:
+            new_state = state.step(**rules)
+            new_packed_state = packed_state.step(**rules)
+            assert isinstance(new_packed_state.board, PackedBoard)
+            assert repr(new_state) == repr(new_packed_state)
+            assert new_state.get_n_live_cells() == \
+                   new_packed_state.get_n_live_cells()
+            assert new_state - state == new_packed_state - packed_state
+            assert new_state.board.get_n_different_cells(state.board) == \
+                   new_packed_state.board.get_n_different_cells(
+                       packed_state.board
+                   )
+            (state, packed_state) = (new_state, new_packed_state)
+
+
+def test_compact():
+    '''Test that `PackedBoard` states are compact and compare right.'''
+    state = life.State.create_diehard(board_class=PackedBoard)
+    assert repr(state) == repr(life.State.create_diehard())
+    assert state.get_n_live_cells() == 7
+    assert state == life.State.create_diehard(board_class=PackedBoard)
+    assert state != life.State.create_diehard()
+    assert pickle.loads(pickle.dumps(state)) == state
+
+    state = life.State.create_messy_root(100, 100, board_class=PackedBoard)
+    assert len(pickle.dumps(state)) < 100 * 100 // 8 + 500
+    random_state = state.step(randomness=1)
+    assert 0 < random_state.board.get_n_different_cells(
+        state.step().board
+    ) < 100 * 100
+    full_state = life.State.create_root(5, 4, fill='full',
+                                        board_class=PackedBoard)
+    assert full_state.get_n_live_cells() == 20
+    assert full_state.step().get_n_live_cells() == 0
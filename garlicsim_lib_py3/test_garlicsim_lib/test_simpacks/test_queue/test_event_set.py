@@ -0,0 +1,121 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''Testing module for `garlicsim_lib.simpacks.queue.events.EventSet`.'''
+
+import copy
+import functools
+import pickle
+
+import nose.tools
+
+from garlicsim_lib.simpacks.queue.events import EventSet
+
+
+# A pickle of `(event_set, names)` made before the events were kept in a heap.
+# Events appending 'c', 'a', 'b' and 'd' to `names` were created 3, 1, 2 and 5
+# time units ahead, and then the first of them happened:
+legacy_event_set_pickle = (
+    b'\x80\x02cgarlicsim_lib.simpacks.queue.events.event_set\nEventSet\nq'
+    b'\x00)\x81q\x01}q\x02X\x06\x00\x00\x00eventsq\x03]q\x04(cgarlicsim_l'
+    b'ib.simpacks.queue.events.event\nEvent\nq\x05)\x81q\x06}q\x07(X\t'
+    b'\x00\x00\x00time_leftq\x08K\x01X\x06\x00\x00\x00actionq\tcfunctools'
+    b'\npartial\nq\nc__builtin__\ngetattr\nq\x0b]q\x0cX\x01\x00\x00\x00aq'
+    b'\raX\x06\x00\x00\x00appendq\x0e\x86q\x0fRq\x10\x85q\x11Rq\x12(h\x10'
+    b'X\x01\x00\x00\x00bq\x13\x85q\x14}q\x15Ntq\x16bX\x04\x00\x00\x00done'
+    b'q\x17\x89ubh\x05)\x81q\x18}q\x19(h\x08K\x02h\th\nh\x0bh\x0cX\x06'
+    b'\x00\x00\x00appendq\x1a\x86q\x1bRq\x1c\x85q\x1dRq\x1e(h\x1cX\x01'
+    b'\x00\x00\x00cq\x1f\x85q }q!Ntq"bh\x17\x89ubh\x05)\x81q#}q$(h\x08K'
+    b"\x04h\th\nh\x0bh\x0cX\x06\x00\x00\x00appendq%\x86q&Rq'\x85q(Rq)(h'X"
+    b'\x01\x00\x00\x00dq*\x85q+}q,Ntq-bh\x17\x89ubesbh\x0c\x86q..'
+)
+
+
+class Recorder(object):
+    '''Records the names of the events that happened.'''
+    def __init__(self):
+        self.names = []
+    def record(self, name):
+        self.names.append(name)
+
+
+class Counter(object):
+    '''Counts the events that happened.'''
+    def __init__(self):
+        self.count = 0
+    def increment(self):
+        self.count += 1
+
+
+def _create_events(event_set, recorder, times_and_names):
+    '''Create events that record their names when they happen.'''
+    return dict(
+        (name, event_set.create_event(time, lambda name=name:
+                                      recorder.record(name)))
+        for (time, name) in times_and_names
+    )
+
+
+def test_order():
+    '''Test that events happen in order of time, and then of creation.'''
+    event_set = EventSet()
+    recorder = Recorder()
+    events = _create_events(event_set, recorder,
+                            [(5, 'e'), (2, 'b'), (2, 'c'), (1, 'a'), (7, 'f'),
+                             (3, 'd'), (2, 'x')])
+    assert [event.time_left for event in event_set.events] == \
+           [1, 2, 2, 2, 3, 5, 7]
+
+    assert event_set.do_next_event() == 1
+    assert events['e'].time_left == 4
+    events['x'].cancel()
+    assert len(event_set.events) == 5
+    _create_events(event_set, recorder, [(1, 'c2'), (6, 'g')])
+    while event_set.events:
+        event_set.do_next_event()
+    assert recorder.names == ['a', 'b', 'c', 'c2', 'd', 'e', 'f', 'g']
+    assert event_set.time == 7
+    assert events['f'].done and not events['x'].done
+    nose.tools.assert_raises(Exception, event_set.do_next_event)
+
+
+def test_copy():
+    '''Test that event sets can be deepcopied and pickled.'''
+    event_set = EventSet()
+    counter = Counter()
+    events = [event_set.create_event(time, counter.increment)
+              for time in [3, 1, 2, 1]]
+    events[1].cancel()
+    assert event_set.do_next_event() == 1
+
+    for (new_event_set, new_counter) in \
+        [copy.deepcopy((event_set, counter)),
+         pickle.loads(pickle.dumps((event_set, counter)))]:
+        assert [event.time_left for event in new_event_set.events] == [1, 2]
+        new_event_set.create_event(0.5, new_counter.increment)
+        assert new_event_set.do_next_event() == 0.5
+        assert new_event_set.do_next_event() == 0.5
+        assert new_event_set.do_next_event() == 1
+        assert new_counter.count == 4
+        assert not new_event_set.events
+
+    assert counter.count == 1
+    assert [event.time_left for event in event_set.events] == [1, 2]
+
+
+def test_legacy_pickle():
+    '''Test unpickling an event set pickled before events were in a heap.'''
+    (event_set, names) = pickle.loads(legacy_event_set_pickle)
+    assert names == ['a']
+    assert event_set.time == 0
+    assert [event.time_left for event in event_set.events] == [1, 2, 4]
+    assert all(event.event_set is event_set for event in event_set.events)
+
+    event_set.create_event(1.5, functools.partial(names.append, 'x'))
+    new_event_set = pickle.loads(pickle.dumps(event_set))
+    assert [event.time_left for event in new_event_set.events] == \
+           [1, 1.5, 2, 4]
+    while event_set.events:
+        event_set.do_next_event()
+    assert names == ['a', 'b', 'x', 'c', 'd']
+    assert event_set.time == 4
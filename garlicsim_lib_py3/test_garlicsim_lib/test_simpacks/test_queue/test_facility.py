@@ -0,0 +1,192 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''Testing module for `garlicsim_lib.simpacks.queue.facility.Facility`.'''
+
+import copy
+import pickle
+
+import garlicsim
+from garlicsim_lib.simpacks import queue
+from garlicsim_lib.simpacks.queue.events import EventSet
+from garlicsim_lib.simpacks.queue.facility import Facility
+from garlicsim_lib.simpacks.queue.client import Client
+
+
+# A pickle of `(event_set, facility)` made before the facility kept its clients
+# in a set and its waiting clients in a deque. The facility had 2 servers and
+# got 3 clients, so the third client was waiting in the queue:
+legacy_facility_pickle = (
+    b'\x80\x02cgarlicsim_lib.simpacks.queue.events.event_set\nEventSet\nq'
+    b'\x00)\x81q\x01}q\x02X\x06\x00\x00\x00eventsq\x03]q\x04(cgarlicsim_l'
+    b'ib.simpacks.queue.events.event\nEvent\nq\x05)\x81q\x06}q\x07(X\t'
+    b'\x00\x00\x00time_leftq\x08G?\xf6\xb2\xb4{\x92\xa7\x85X\x06\x00\x00'
+    b'\x00actionq\tc__builtin__\ngetattr\nq\ncgarlicsim_lib.simpacks.queu'
+    b'e.server\nServer\nq\x0b)\x81q\x0c}q\r(X\x16\x00\x00\x00_HasIdentity'
+    b'__identityq\x0ecgarlicsim.general_misc.persistent.cross_process_per'
+    b'sistent\nCrossProcessPersistent\nq\x0fcgarlicsim.general_misc.persi'
+    b'stent.cross_process_persistent\nUuidToken\nq\x10)\x81q\x11}q\x12X'
+    b'\x04\x00\x00\x00uuidq\x13cuuid\nUUID\nq\x14)\x81q\x15}q\x16X\x03'
+    b'\x00\x00\x00intq\x17\x8a\x10b)\x8c\xd2\xbc\x03\xea\x91\xd6M\xf1\xd6'
+    b'?G\x12@sbsb\x85q\x18\x81q\x19}q\x1abX\t\x00\x00\x00event_setq\x1bh'
+    b'\x01X\x08\x00\x00\x00facilityq\x1ccgarlicsim_lib.simpacks.queue.fac'
+    b'ility\nFacility\nq\x1d)\x81q\x1e}q\x1f(h\x0eh\x0fh\x10)\x81q }q!h'
+    b'\x13h\x14)\x81q"}q#h\x17\x8a\x116l\xbca\x12wR\xae\xeeK\x954\xc9\xf4'
+    b"B\xba\x00sbsb\x85q$\x81q%}q&bh\x1bh\x01X\x07\x00\x00\x00serversq']q"
+    b'((h\x0b)\x81q)}q*(h\x0eh\x0fh\x10)\x81q+}q,h\x13h\x14)\x81q-}q.h'
+    b'\x17\x8a\x11\xbf\xbf\xees~\xb88\xa1\xc2DlW}\xa5\xc5\xee\x00sbsb\x85'
+    b'q/\x81q0}q1bh\x1bh\x01h\x1ch\x1eX\x11\x00\x00\x00mean_service_timeq'
+    b'2K\x01X\x0e\x00\x00\x00current_clientq3cgarlicsim_lib.simpacks.queu'
+    b'e.client\nClient\nq4)\x81q5}q6h\x0eh\x0fh\x10)\x81q7}q8h\x13h\x14)'
+    b"\x81q9}q:h\x17\x8a\x108\xed\x92\x07\x80\xc5\xff\x86\xf9G)'\xa7\x12Z"
+    b'Qsbsb\x85q;\x81q<}q=bsbX\x14\x00\x00\x00finish_service_eventq>h\x05'
+    b')\x81q?}q@(h\x08G?\xfd\xc5\x0b\xf6K\xae\xcbh\th\nh)X\r\x00\x00\x00f'
+    b'inish_clientqA\x86qBRqCX\x04\x00\x00\x00doneqD\x89ubX\x0e\x00\x00'
+    b'\x00client_counterqEK\x00ubh\x0ceX\x07\x00\x00\x00clientsqF]qG(h5h4'
+    b')\x81qH}qIh\x0eh\x0fh\x10)\x81qJ}qKh\x13h\x14)\x81qL}qMh\x17\x8a'
+    b'\x11\x06JG\xe8\x05\xb2:\x9e\xd8F7\xc9\xd0\x1c\x11\xc3\x00sbsb\x85qN'
+    b'\x81qO}qPbsbh4)\x81qQ}qRh\x0eh\x0fh\x10)\x81qS}qTh\x13h\x14)\x81qU}'
+    b'qVh\x17\x8a\x10\xe75x\xb8\x82\xba\xa6\x8fpL"s\x85\x1e\x08isbsb\x85q'
+    b'W\x81qX}qYbsbeX\x0f\x00\x00\x00waiting_clientsqZ]q[hQaubh2K\x01h3hH'
+    b'h>h\x06hEK\x00ubhA\x86q\\Rq]hD\x89ubh?esbh\x1e\x86q^.'
+)
+
+
+def _check_facility(facility):
+    '''Check that a facility's servers, clients and queues are consistent.'''
+    busy_servers = [server for server in facility.servers
+                    if server.is_busy()]
+    idle_servers = list(facility.idle_servers_generator())
+    assert idle_servers == [server for server in facility.servers
+                            if server not in busy_servers]
+    assert len(facility.idle_server_indices) == len(idle_servers)
+    assert facility.clients == \
+           set(facility.waiting_clients) | \
+           set(server.current_client for server in busy_servers)
+    assert not (idle_servers and facility.waiting_clients)
+
+
+def test_serving():
+    '''Test that clients are served in order, by the first idle servers.'''
+    event_set = EventSet()
+    facility = Facility(event_set)
+    servers = [facility.create_server(mean_service_time=1) for i in range(2)]
+    clients = [Client() for i in range(4)]
+
+    for client in clients:
+        facility.add_client(client)
+        _check_facility(facility)
+    assert [server.current_client for server in servers] == clients[:2]
+    assert list(facility.waiting_clients) == clients[2:]
+    assert not facility.idle_server_indices
+
+    finishing_servers = []
+    while event_set.events:
+        next_event = event_set.events[0]
+        finishing_servers.append(next_event.action.__self__)
+        event_set.do_next_event()
+        _check_facility(facility)
+    assert len(finishing_servers) == 4
+    assert sum(server.client_counter for server in servers) == 4
+    assert list(facility.idle_servers_generator()) == servers
+    assert not facility.clients and not facility.waiting_clients
+
+    new_client = Client()
+    facility.add_client(new_client)
+    assert servers[0].current_client is new_client
+    assert list(facility.idle_servers_generator()) == servers[1:]
+
+
+def test_first_idle_server():
+    '''Test that a new client goes to the first idle server in the list.'''
+    event_set = EventSet()
+    facility = Facility(event_set)
+    servers = [facility.create_server(mean_service_time=1) for i in range(3)]
+    for i in range(3):
+        facility.add_client(Client())
+
+    # The third server becomes idle before the first one:
+    for server in (servers[2], servers[0]):
+        server.finish_service_event.cancel()
+        server.finish_client()
+        _check_facility(facility)
+    assert list(facility.idle_servers_generator()) == \
+           [servers[0], servers[2]]
+
+    new_clients = [Client() for i in range(2)]
+    for client in new_clients:
+        facility.add_client(client)
+    assert servers[0].current_client is new_clients[0]
+    assert servers[2].current_client is new_clients[1]
+    _check_facility(facility)
+
+
+def test_simulation():
+    '''Test that the facility stays consistent when simulating.'''
+    for n_servers in [1, 5, 50]:
+        state = queue.State.create_root(n_servers=n_servers,
+                                        mean_arrival_time=0.2)
+        assert len(state.facility.servers) == n_servers
+        for state in garlicsim.list_simulate(state, 100):
+            _check_facility(state.facility)
+
+
+def test_separate_facilities():
+    '''Test that facilities don't share their servers or clients.'''
+    first_facility = Facility(EventSet())
+    second_facility = Facility(EventSet())
+    first_facility.create_server(mean_service_time=1)
+    first_facility.add_client(Client())
+    first_facility.add_client(Client())
+    assert len(first_facility.servers) == 1
+    assert len(first_facility.clients) == 2
+    assert not second_facility.servers and not second_facility.clients
+    assert not second_facility.idle_server_indices
+    assert not second_facility.waiting_clients
+
+
+def test_copy():
+    '''Test that a deepcopied facility keeps serving its own clients.'''
+    event_set = EventSet()
+    facility = Facility(event_set)
+    for i in range(3):
+        facility.create_server(mean_service_time=1)
+    for i in range(5):
+        facility.add_client(Client())
+
+    (new_event_set, new_facility) = copy.deepcopy((event_set, facility))
+    _check_facility(new_facility)
+    assert len(new_facility.clients) == 5
+    assert not new_facility.clients & facility.clients
+    while new_event_set.events:
+        new_event_set.do_next_event()
+        _check_facility(new_facility)
+    assert not new_facility.clients
+    assert len(new_facility.idle_server_indices) == 3
+    assert len(facility.clients) == 5
+    assert len(facility.waiting_clients) == 2
+
+
+def test_legacy_pickle():
+    '''Test unpickling a facility pickled before it tracked idle servers.'''
+    (event_set, facility) = pickle.loads(legacy_facility_pickle)
+    assert len(facility.servers) == 2
+    assert len(facility.clients) == 3
+    assert len(facility.waiting_clients) == 1
+    _check_facility(facility)
+    assert not facility.idle_server_indices
+
+    while event_set.events:
+        event_set.do_next_event()
+        _check_facility(facility)
+    assert facility.finished_client_count() == 3
+    assert not facility.clients and not facility.waiting_clients
+    assert list(facility.idle_servers_generator()) == facility.servers
+
+    new_clients = [Client() for i in range(3)]
+    for client in new_clients:
+        facility.add_client(client)
+        _check_facility(facility)
+    assert [server.current_client for server in facility.servers] == \
+           new_clients[:2]
+    assert list(facility.waiting_clients) == new_clients[2:]
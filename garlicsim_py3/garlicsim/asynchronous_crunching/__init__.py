@@ -24,6 +24,9 @@ CRUNCHER_QUEUE_SIZE = 100
 '''
 The `max_size` given to the crunchers' work queues.
 
+`ProcessCruncher` puts batches of states in its queue rather than single
+states, so it divides this by its `batch_size`, unless its `queue_size` was set.
+
 This is needed for simpacks with very fast step functions, because without a
 `max_size` the cruncher might work so fast that the GUI will never catch up
 with it.
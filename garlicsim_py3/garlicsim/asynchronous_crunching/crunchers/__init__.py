@@ -49,6 +49,16 @@ cruncher_types_list.append(ProcessCruncher)
 ### Finished adding `ProcessCruncher`. ########################################
 
 
+### Adding `ProcessPoolCruncher`: #############################################
+#                                                                             #
+
+from .process_pool_cruncher import ProcessPoolCruncher
+cruncher_types_list.append(ProcessPoolCruncher)
+
+#                                                                             #
+### Finished adding `ProcessPoolCruncher`. ####################################
+
+
 ### Adding `PiCloudCruncher` dummy: ###########################################
 #                                                                             #
 
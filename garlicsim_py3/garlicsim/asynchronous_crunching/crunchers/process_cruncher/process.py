@@ -11,6 +11,7 @@ import multiprocessing
 import queue
 import sys
 import os
+import time
 
 try:
     import garlicsim.general_misc.process_priority
@@ -22,6 +23,12 @@ from garlicsim.asynchronous_crunching import \
      BaseCruncher, CrunchingProfile, ObsoleteCruncherError
 
 
+def discard_work(item):
+    '''Throw away an item of work, freeing its shared memory if it has any.'''
+    if isinstance(item, garlicsim.asynchronous_crunching.misc.StateBatch):
+        item.release()
+
+
 class Process(multiprocessing.Process):
     '''The actual system process used by `ProcessCruncher`.'''
     # One of the reasons that `Process` is a separate entity from
@@ -30,7 +37,10 @@ class Process(multiprocessing.Process):
     # prevent us from getting the crunching manager as an argument, since it's
     # not pickleable.
     
-    def __init__(self, step_iterator_getter, initial_state, crunching_profile):        
+    def __init__(self, step_iterator_getter, initial_state, crunching_profile,
+                 cycle_detector=None, queue_size=100, batch_size=1,
+                 batch_max_bytes=None, batch_max_latency=None,
+                 shared_memory_threshold=None):
         multiprocessing.Process.__init__(self)
         
         self.step_iterator_getter = step_iterator_getter
@@ -45,17 +55,64 @@ class Process(multiprocessing.Process):
         
         self.crunching_profile = crunching_profile
         
+        self.cycle_detector = cycle_detector
+        '''
+        Cycle detector for noticing the simulation repeat itself, if possible.
+        
+        This is `None` if the step profile isn't deterministic.
+        '''
+        
+        self.batch_size = batch_size
+        '''The maximal number of states in a batch.'''
+        
+        self.batch_max_bytes = batch_max_bytes
+        '''
+        The size in bytes of pickled states after which a batch is sent.
+        
+        `None` means no limit.
+        '''
+        
+        self.batch_max_latency = batch_max_latency
+        '''
+        The number of seconds after which a batch is sent.
+        
+        This is counted from when the previous batch was sent, so if the step
+        function is slow, every state is sent as soon as it's produced. `None`
+        means no limit.
+        '''
+        
+        self.shared_memory_threshold = shared_memory_threshold
+        '''
+        The size in bytes from which buffers in states go in shared memory.
+        
+        `None` means that shared memory isn't used. See `StateBatch` for more
+        details.
+        '''
+        
+        self.batch = None
+        '''The batch of states that's being collected, if any.'''
+        
+        self.last_batch_time = None
+        '''The time at which the last batch was sent.'''
+        
+        self.retired = False
+        '''
+        Flag saying whether we were retired, or replaced by another cruncher.
+        
+        Once we're retired, the crunching manager might not take our work
+        anymore, so we throw away our work instead of waiting for room in the
+        work queue.
+        '''
+        
         self.daemon = True
 
-        self.work_queue = multiprocessing.Queue(
-            garlicsim.asynchronous_crunching.CRUNCHER_QUEUE_SIZE
-        )
+        self.work_queue = multiprocessing.Queue(queue_size)
         '''
         Queue for putting completed work to be picked up by the main thread.
         
         In this queue the cruncher will put the states that it produces, in
-        chronological order. If the cruncher reaches a simulation ends, it will
-        put an `EndMarker` in this queue.
+        chronological order, packed in `StateBatch` objects. If the cruncher
+        reaches a simulation ends, it will put an `EndMarker` in this queue.
         '''
         
         self.order_queue = multiprocessing.Queue()
@@ -93,11 +150,18 @@ class Process(multiprocessing.Process):
         That exception means that the cruncher has been retired in the middle of
         its job, so it is propagated up to this level, where it causes the
         cruncher to terminate.
+        
+        If we were retired, the work that's left in the work queue is thrown
+        away before we terminate, so the shared memory that it uses is freed.
         '''
         try:
             self.main_loop()
         except ObsoleteCruncherError:
             return
+        finally:
+            self.send_batch()
+            if self.retired:
+                self.discard_queued_work()
 
         
     def main_loop(self):
@@ -118,9 +182,14 @@ class Process(multiprocessing.Process):
          3. We have reached a simulation end. (i.e. the step function raised
             `WorldEnded`.)
             
+        or
+        
+         4. The simulation started repeating itself. (Which we detect only
+            when the step profile is deterministic.)
+            
         or 
         
-         4. We have received a new crunching profile which has a different step
+         5. We have received a new crunching profile which has a different step
             profile than the one we started with. We can't change step profile
             on the fly, so we simply retire and let the crunching manager 
             recruit a new cruncher.
@@ -132,24 +201,109 @@ class Process(multiprocessing.Process):
         
         self.step_profile = self.crunching_profile.step_profile
         
+        if self.cycle_detector:
+            self.cycle_detector.check(self.initial_state)
+        
         self.iterator = self.step_iterator_getter(self.initial_state,
                                                   self.step_profile)
         
         order = None
         
+        self.last_batch_time = time.time()
+        
         try:
             for state in self.iterator:
-                self.work_queue.put(state)
+                self.add_to_batch(state)
+                if self.retired:
+                    raise ObsoleteCruncherError("Cruncher was retired while "
+                                                "waiting to send its work; "
+                                                "Shutting down.")
+                if self.cycle_detector and self.cycle_detector.check(state):
+                    self.send_batch()
+                    self.put_work(
+                        garlicsim.asynchronous_crunching.misc.CycleMarker(
+                            self.cycle_detector.period
+                        )
+                    )
+                    return
                 self.check_crunching_profile(state)
                 order = self.get_order()
                 if order:
                     self.process_order(order) 
         except garlicsim.misc.WorldEnded:
-            self.work_queue.put(
+            self.send_batch()
+            self.put_work(
                 garlicsim.asynchronous_crunching.misc.EndMarker()
             )
 
             
+    def add_to_batch(self, state):
+        '''
+        Add a state to the current batch, sending the batch if it's done.
+        
+        The batch is sent when it has `.batch_size` states, or when its states
+        take `.batch_max_bytes` bytes, or when `.batch_max_latency` seconds
+        have passed since the last batch was sent.
+        '''
+        if self.batch is None:
+            self.batch = garlicsim.asynchronous_crunching.misc.StateBatch(
+                self.shared_memory_threshold
+            )
+        batch = self.batch
+        batch.add_state(state)
+        if len(batch) >= self.batch_size or \
+           (self.batch_max_bytes is not None and
+            batch.n_bytes >= self.batch_max_bytes) or \
+           (self.batch_max_latency is not None and
+            time.time() - self.last_batch_time >= self.batch_max_latency):
+            self.send_batch()
+            
+            
+    def send_batch(self):
+        '''Put the current batch in the work queue, if there is one.'''
+        if self.batch is not None:
+            self.put_work(self.batch)
+            self.batch = None
+        self.last_batch_time = time.time()
+        
+    
+    def put_work(self, item):
+        '''
+        Put an item in the work queue, or throw it away if we're retired.
+        
+        While the work queue is full we keep reading orders, so we'll notice
+        if we're retired; In that case nobody might take the item from the
+        queue, and we'd wait forever.
+        '''
+        while not self.retired:
+            try:
+                self.work_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                order = self.get_order()
+                if order:
+                    try:
+                        self.process_order(order)
+                    except ObsoleteCruncherError:
+                        pass # `self.retired` was set.
+        discard_work(item)
+        
+    
+    def discard_queued_work(self):
+        '''
+        Throw away the work that's in the work queue.
+        
+        This frees the shared memory of the batches in the queue, which would
+        otherwise never be freed if the crunching manager doesn't take them.
+        '''
+        while True:
+            try:
+                item = self.work_queue.get(timeout=0.1)
+            except queue.Empty:
+                return
+            discard_work(item)
+        
+    
     def check_crunching_profile(self, state):
         '''
         Check if the cruncher crunched enough states. If so retire.
@@ -179,6 +333,7 @@ class Process(multiprocessing.Process):
         '''Process an order receieved from `.order_queue`.'''
         
         if order == 'retire':
+            self.retired = True
             raise ObsoleteCruncherError("Cruncher received a 'retire' order; "
                                         "Shutting down.")
         
@@ -190,6 +345,7 @@ class Process(multiprocessing.Process):
     def process_crunching_profile_order(self, order):
         '''Process an order to update the crunching profile.'''
         if self.crunching_profile.step_profile != order.step_profile:
+            self.retired = True
             raise ObsoleteCruncherError('Step profile changed; shutting down. '
                                         'Crunching manager should create a '
                                         'new cruncher.')
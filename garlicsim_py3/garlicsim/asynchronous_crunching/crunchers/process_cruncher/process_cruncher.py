@@ -15,6 +15,7 @@ from garlicsim.general_misc import import_tools
 
 import garlicsim
 from garlicsim.asynchronous_crunching import BaseCruncher
+from garlicsim.asynchronous_crunching.misc import SharedMemoryUnavailable
 
 
 multiprocessing_missing_text = (
@@ -54,6 +55,52 @@ class ProcessCruncher(BaseCruncher):
     )
     
     
+    batch_size = 20
+    '''
+    The maximal number of states that the process sends in one batch.
+    
+    Sending states in batches saves the overhead of going through the queue
+    for every state, which matters for simpacks with very fast step functions.
+    Set to 1 to send every state separately.
+    '''
+    
+    batch_max_bytes = 2 ** 20
+    '''
+    The size in bytes of pickled states after which a batch is sent.
+    
+    This keeps batches of big states from taking too much memory. `None` means
+    no limit.
+    '''
+    
+    batch_max_latency = 0.1
+    '''
+    The maximal number of seconds that a state may wait before it's sent.
+    
+    This keeps the main program from waiting too long for states when the step
+    function is slow. `None` means no limit.
+    '''
+    
+    shared_memory_threshold = None
+    '''
+    The size in bytes from which buffers in states are sent in shared memory.
+    
+    When this is set, big buffers in the states (like the data of NumPy arrays)
+    are put in shared memory segments rather than sent through the queue's
+    pipe, and the main process copies them out in one go. Requires Python 3.8
+    or above. `None` means that shared memory isn't used.
+    '''
+    
+    queue_size = None
+    '''
+    The maximal number of batches in the work queue.
+    
+    This is needed for simpacks with very fast step functions, because without
+    it the cruncher might work so fast that the GUI will never catch up with
+    it. If `None`, the queue is made to hold about
+    `garlicsim.asynchronous_crunching.CRUNCHER_QUEUE_SIZE` states.
+    '''
+    
+    
     def __init__(self, crunching_manager, initial_state, crunching_profile):
         
         BaseCruncher.__init__(self, crunching_manager, initial_state, 
@@ -62,12 +109,37 @@ class ProcessCruncher(BaseCruncher):
         if not import_tools.exists('multiprocessing'):
             raise Exception(multiprocessing_missing_text)
         
+        if self.shared_memory_threshold is not None and \
+           not garlicsim.asynchronous_crunching.misc.shared_memory_available:
+            raise SharedMemoryUnavailable(
+                "`ProcessCruncher` can't use shared memory because "
+                "`multiprocessing.shared_memory` isn't available. It requires "
+                "Python 3.8 or above."
+            )
+        
         from .process import Process
         
+        queue_size = self.queue_size
+        if queue_size is None:
+            queue_size = max(
+                garlicsim.asynchronous_crunching.CRUNCHER_QUEUE_SIZE //
+                self.batch_size,
+                1
+            )
+        
         self.process = Process(
             self.project.simpack_grokker.get_step_iterator,
             initial_state,
-            crunching_profile
+            crunching_profile,
+            garlicsim.misc.create_cycle_detector(
+                self.project.simpack_grokker,
+                crunching_profile.step_profile
+            ),
+            queue_size=queue_size,
+            batch_size=self.batch_size,
+            batch_max_bytes=self.batch_max_bytes,
+            batch_max_latency=self.batch_max_latency,
+            shared_memory_threshold=self.shared_memory_threshold
         )
         '''The actual process which does the crunching.'''
         
@@ -76,8 +148,8 @@ class ProcessCruncher(BaseCruncher):
         Queue for putting completed work to be picked up by the main thread.
         
         In this queue the cruncher will put the states that it produces, in
-        chronological order. If the cruncher reaches a simulation ends, it will
-        put an `EndMarker` in this queue.
+        chronological order, packed in `StateBatch` objects. If the cruncher
+        reaches a simulation ends, it will put an `EndMarker` in this queue.
         '''
         
         self.order_queue = self.process.order_queue
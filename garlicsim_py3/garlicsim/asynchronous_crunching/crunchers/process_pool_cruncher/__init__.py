@@ -0,0 +1,10 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''
+This package defines the `ProcessPoolCruncher` class.
+
+See its documentation for more information.
+'''
+
+from .process_pool_cruncher import ProcessPoolCruncher
@@ -0,0 +1,301 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''
+This module defines the `ProcessPoolCruncher` class.
+
+See its documentation for more information.
+'''
+
+import queue
+import time
+
+from garlicsim.general_misc.reasoned_bool import ReasonedBool
+from garlicsim.general_misc import string_tools
+from garlicsim.general_misc import import_tools
+
+import garlicsim
+from garlicsim.asynchronous_crunching.misc import SharedMemoryUnavailable
+from ..process_cruncher import ProcessCruncher
+
+
+multiprocessing_missing_text = (
+    "`ProcessPoolCruncher` can't be used because the "
+    "`multiprocessing` module isn't installed."
+)
+
+
+class WorkerPool(object):
+    '''
+    A pool of warm worker processes for crunching one simpack.
+    
+    Workers are never shut down; When a worker finishes a job it waits in the
+    pool until it's given another one. A new worker is started only when all
+    the workers in the pool are busy, and none of them is about to finish a
+    job that it was retired from.
+    '''
+    
+    def __init__(self, simpack_grokker):
+        
+        self.simpack_grokker = simpack_grokker
+        '''The simpack grokker of the simpack that the workers crunch.'''
+        
+        self.workers = []
+        '''The workers in the pool.'''
+        
+        self.retiring_worker_timeout = 1
+        '''
+        How many seconds to wait for a retiring worker before starting another.
+        
+        A worker that was just retired from a job, like when the step profile
+        was changed, usually becomes idle very soon, so it's better to wait
+        for it than to start a new process.
+        '''
+    
+    
+    def get_idle_worker(self, queue_size):
+        '''
+        Get a worker that's waiting for a job, starting a new one if needed.
+        
+        `queue_size` is the `max_size` of the work queue of a new worker.
+        '''
+        from .worker import Worker
+        deadline = time.time() + self.retiring_worker_timeout
+        while True:
+            self.workers = [worker for worker in self.workers
+                            if worker.is_alive()]
+            for worker in self.workers:
+                worker.discard_retired_work()
+                if worker.is_idle():
+                    return worker
+            if time.time() >= deadline or \
+               not any(worker.is_retiring() for worker in self.workers):
+                break
+            time.sleep(0.01)
+        worker = Worker(self.simpack_grokker.get_step_iterator, queue_size)
+        worker.start()
+        self.workers.append(worker)
+        return worker
+
+
+worker_pools = {}
+'''Dict mapping from simpack grokker to its `WorkerPool`.'''
+
+
+def get_worker_pool(simpack_grokker):
+    '''Get the `WorkerPool` for `simpack_grokker`, creating it if needed.'''
+    try:
+        return worker_pools[simpack_grokker]
+    except KeyError:
+        worker_pool = worker_pools[simpack_grokker] = \
+            WorkerPool(simpack_grokker)
+        return worker_pool
+
+
+class JobWorkQueue(object):
+    '''
+    The part of a worker's work queue that belongs to one job.
+    
+    This is what the crunching manager sees as the `.work_queue` of a
+    `ProcessPoolCruncher`. Items that the worker put in the work queue for
+    earlier jobs are dropped, and the `JobFinishedMarker` of the job itself is
+    taken out of the queue without being returned. Once that marker was
+    received, whether by us or by the worker pool, we don't read the work
+    queue anymore, because the rest of its items belong to later jobs.
+    '''
+    
+    def __init__(self, worker, job_number):
+        
+        self.worker = worker
+        '''The worker that's crunching the job.'''
+        
+        self.job_number = job_number
+        '''The number of the job in the worker.'''
+    
+    
+    @property
+    def finished(self):
+        '''Flag saying whether all of the job's items were taken.'''
+        return self.worker.n_received_finish_markers >= self.job_number
+    
+    
+    def qsize(self):
+        '''Get the approximate number of items in the queue.'''
+        return self.worker.work_queue.qsize()
+    
+    
+    def get(self, block=True, timeout=None):
+        '''
+        Get an item of the job from the queue.
+        
+        Raises `queue.Empty` if there are no more items for the job.
+        '''
+        from .worker import JobFinishedMarker
+        from ..process_cruncher.process import discard_work
+        while not self.finished:
+            item = self.worker.work_queue.get(block=block, timeout=timeout)
+            if isinstance(item, JobFinishedMarker):
+                self.worker.n_received_finish_markers = item.job_number
+            elif self.worker.n_received_finish_markers == \
+                 self.job_number - 1:
+                return item
+            else:
+                # The item is left over from an earlier job, so we drop it.
+                discard_work(item)
+        raise queue.Empty
+
+
+class ProcessPoolCruncher(ProcessCruncher):
+    '''
+    Cruncher that crunches from a warm process that's reused between jobs.
+    
+    This cruncher is like `ProcessCruncher`, except that instead of starting a
+    new process for every cruncher, it takes a worker process from a
+    persistent pool of workers, one pool for each simpack. When the cruncher is
+    retired, its worker goes back to the pool and waits for the next job.
+    
+    This saves the cost of starting a process every time a cruncher is
+    recruited, for example when the step profile is changed or when buffering
+    a new leaf, so a new cruncher is ready after a single message to its
+    worker.
+    
+    The tunables for batching states are inherited from `ProcessCruncher`,
+    except `queue_size`, which applies only to newly-started workers.
+    '''
+    
+    
+    gui_explanation = string_tools.docstring_trim(
+    '''
+    `ProcessPoolCruncher`:
+     
+     - Works from a pool of `multiprocessing.Process` workers that are kept
+       alive between jobs.
+     
+     - Like `ProcessCruncher`, able to use the full power of the processor, but
+       starts crunching faster.
+     '''
+    )
+    
+    
+    def __init__(self, crunching_manager, initial_state, crunching_profile):
+        
+        garlicsim.asynchronous_crunching.BaseCruncher.__init__(
+            self,
+            crunching_manager,
+            initial_state,
+            crunching_profile
+        )
+        
+        if not import_tools.exists('multiprocessing'):
+            raise Exception(multiprocessing_missing_text)
+        
+        if self.shared_memory_threshold is not None and \
+           not garlicsim.asynchronous_crunching.misc.shared_memory_available:
+            raise SharedMemoryUnavailable(
+                "`ProcessPoolCruncher` can't use shared memory because "
+                "`multiprocessing.shared_memory` isn't available. It requires "
+                "Python 3.8 or above."
+            )
+        
+        self.worker = None
+        '''
+        The worker process which does the crunching.
+        
+        It's taken from the pool when the cruncher is started.
+        '''
+        
+        self.job_number = None
+        '''The number of our job in the worker. Set when starting.'''
+        
+        self.work_queue = None
+        '''
+        Queue for putting completed work to be picked up by the main thread.
+        
+        In this queue the cruncher will put the states that it produces, in
+        chronological order, packed in `StateBatch` objects. If the cruncher
+        reaches a simulation ends, it will put an `EndMarker` in this queue.
+        
+        This is a `JobWorkQueue`, which shows only the part of the worker's
+        work queue that belongs to our job. Set when starting.
+        '''
+    
+    
+    @staticmethod
+    def can_be_used_with_simpack_grokker(simpack_grokker):
+        '''
+        Return whether the cruncher can be used with `simpack_grokker`.
+        
+        For `ProcessPoolCruncher` to be usable, the `multiprocessing` module
+        must be installed. Assuming it's installed, `ProcessPoolCruncher` can
+        be used if and only if the simpack is not history-dependent.
+        '''
+        
+        if not import_tools.exists('multiprocessing'):
+            return ReasonedBool(
+                False,
+                multiprocessing_missing_text
+            )
+        
+        elif simpack_grokker.history_dependent:
+            return ReasonedBool(
+                False,
+                "`ProcessPoolCruncher` can't be used in history-dependent "
+                "simulations because processes don't share memory."
+            )
+        
+        else:
+            return True
+    
+    
+    def start(self):
+        '''
+        Start the cruncher so it will start crunching and delivering states.
+        '''
+        from .worker import JobAssignment
+        
+        queue_size = self.queue_size
+        if queue_size is None:
+            queue_size = max(
+                garlicsim.asynchronous_crunching.CRUNCHER_QUEUE_SIZE //
+                self.batch_size,
+                1
+            )
+        self.worker = get_worker_pool(self.project.simpack_grokker).\
+            get_idle_worker(queue_size)
+        
+        job_assignment = JobAssignment(
+            self.initial_state,
+            self.crunching_profile,
+            garlicsim.misc.create_cycle_detector(
+                self.project.simpack_grokker,
+                self.crunching_profile.step_profile
+            ),
+            batch_size=self.batch_size,
+            batch_max_bytes=self.batch_max_bytes,
+            batch_max_latency=self.batch_max_latency,
+            shared_memory_threshold=self.shared_memory_threshold
+        )
+        self.job_number = self.worker.assign_job(job_assignment)
+        self.work_queue = JobWorkQueue(self.worker, self.job_number)
+    
+    
+    def retire(self):
+        '''
+        Retire the cruncher. Process-safe.
+        
+        Causes its worker to stop crunching as soon as it receives the order.
+        The worker then goes back to the pool.
+        '''
+        self.worker.retire_job(self.job_number)
+    
+    
+    def update_crunching_profile(self, profile):
+        '''Update the cruncher's crunching profile. Process-safe.'''
+        self.worker.order_queue.put((self.job_number, profile))
+    
+    
+    def is_alive(self):
+        '''Report whether the cruncher is alive and crunching.'''
+        return self.worker is not None and self.worker.is_alive() and \
+               not self.work_queue.finished
+
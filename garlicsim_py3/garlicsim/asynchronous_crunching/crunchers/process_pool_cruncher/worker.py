@@ -0,0 +1,243 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''
+This module defines the `Worker` class.
+
+See its documentation for more info.
+'''
+
+import multiprocessing
+import queue
+
+from garlicsim.asynchronous_crunching import ObsoleteCruncherError
+
+from ..process_cruncher.process import Process, discard_work
+
+
+class JobAssignment(object):
+    '''An order for a `Worker` to start crunching a new job.'''
+    
+    def __init__(self, initial_state, crunching_profile, cycle_detector,
+                 batch_size, batch_max_bytes, batch_max_latency,
+                 shared_memory_threshold):
+        self.initial_state = initial_state
+        self.crunching_profile = crunching_profile
+        self.cycle_detector = cycle_detector
+        self.batch_size = batch_size
+        self.batch_max_bytes = batch_max_bytes
+        self.batch_max_latency = batch_max_latency
+        self.shared_memory_threshold = shared_memory_threshold
+
+
+class JobFinishedMarker(object):
+    '''
+    A marker put by a `Worker` in its work queue after finishing a job.
+    
+    Everything that the worker put in the work queue before this marker
+    belongs to the job numbered `job_number`, or to earlier jobs.
+    '''
+    
+    def __init__(self, job_number):
+        self.job_number = job_number
+        '''The number of the job that was finished.'''
+
+
+class Worker(Process):
+    '''
+    A warm process that crunches jobs for `ProcessPoolCruncher`, one by one.
+    
+    The worker crunches just like the process of `ProcessCruncher`, except
+    that when a job is done it doesn't exit, but waits for the next job on its
+    order queue. Jobs are numbered; every order that the worker gets is a
+    `(job_number, order)` pair, and orders for jobs other than the current one
+    are ignored. When a job is done, for whatever reason, the worker puts a
+    `JobFinishedMarker` in its work queue.
+    
+    The worker is given a new job only after the main process got the
+    `JobFinishedMarker` of its last job, so the work queue never holds work of
+    two jobs at once. When the worker is retired from a job, nobody reads that
+    job's work anymore, so the worker throws away the work in the queue to
+    make room for the marker, and the main process throws away whatever is
+    left when it looks for an idle worker.
+    '''
+    
+    def __init__(self, step_iterator_getter, queue_size):
+        Process.__init__(self, step_iterator_getter, None, None,
+                         queue_size=queue_size)
+        
+        self.n_assigned_jobs = 0
+        '''
+        The number of jobs that were assigned to this worker.
+        
+        This is maintained in the main process.
+        '''
+        
+        self.n_finished_jobs = multiprocessing.Value('i', 0)
+        '''The number of jobs that the worker finished. Shared by processes.'''
+        
+        self.n_retired_jobs = 0
+        '''
+        The number of the last job that the worker was ordered to retire from.
+        
+        This is maintained in the main process.
+        '''
+        
+        self.n_received_finish_markers = 0
+        '''
+        The number of the last job whose `JobFinishedMarker` was received.
+        
+        This is maintained in the main process, by `JobWorkQueue`.
+        '''
+        
+        self.job_number = 0
+        '''
+        The number of the job that the worker is crunching.
+        
+        This is maintained in the worker process.
+        '''
+        
+        self.has_low_priority = False
+        '''Flag saying whether the worker already lowered its priority.'''
+    
+    
+    def is_idle(self):
+        '''
+        Report whether the worker is alive and free to take a new job.
+        
+        The worker must have finished its last job, and the main process must
+        have gotten all of that job's work, up to its `JobFinishedMarker`.
+        '''
+        return self.is_alive() and \
+               self.n_finished_jobs.value == self.n_assigned_jobs == \
+               self.n_received_finish_markers
+    
+    
+    def is_retiring(self):
+        '''Report whether the worker is busy with a job it was retired from.'''
+        return self.is_alive() and \
+               self.n_received_finish_markers < self.n_retired_jobs == \
+               self.n_assigned_jobs
+    
+    
+    def discard_retired_work(self):
+        '''
+        Throw away the work of the job that the worker was retired from.
+        
+        Called from the main process. Nobody takes the work of a retired job,
+        so we take it out of the work queue, without waiting, until we get the
+        job's `JobFinishedMarker`.
+        '''
+        while self.n_received_finish_markers < self.n_retired_jobs == \
+              self.n_assigned_jobs:
+            try:
+                item = self.work_queue.get(block=False)
+            except queue.Empty:
+                return
+            if isinstance(item, JobFinishedMarker):
+                self.n_received_finish_markers = item.job_number
+            else:
+                discard_work(item)
+    
+    
+    def assign_job(self, job_assignment):
+        '''
+        Assign a job to the worker. Called from the main process.
+        
+        Returns the number of the job.
+        '''
+        assert self.is_idle()
+        self.n_assigned_jobs += 1
+        self.order_queue.put((self.n_assigned_jobs, job_assignment))
+        return self.n_assigned_jobs
+    
+    
+    def retire_job(self, job_number):
+        '''Order the worker to retire from a job, from the main process.'''
+        self.order_queue.put((job_number, 'retire'))
+        self.n_retired_jobs = max(self.n_retired_jobs, job_number)
+    
+    
+    def set_low_priority(self):
+        '''Set a low priority for this process, if we didn't already.'''
+        if not self.has_low_priority:
+            Process.set_low_priority(self)
+            self.has_low_priority = True
+    
+    
+    def run(self):
+        '''
+        Internal method.
+        
+        This is called when the worker is started. It waits for jobs and
+        crunches each of them using the `main_loop` method.
+        '''
+        while True:
+            (job_number, order) = self.order_queue.get()
+            if not isinstance(order, JobAssignment):
+                # An order for a job that's already finished.
+                continue
+            self.start_job(job_number, order)
+            try:
+                self.main_loop()
+            except ObsoleteCruncherError:
+                pass
+            finally:
+                self.send_batch()
+                if self.retired:
+                    self.discard_queued_work()
+                self.put_finished_marker(job_number)
+                self.n_finished_jobs.value = job_number
+    
+    
+    def put_finished_marker(self, job_number):
+        '''
+        Put a `JobFinishedMarker` for the job in the work queue.
+        
+        While the work queue is full we keep reading orders, and if we're
+        retired, we throw away the work in the queue to make room.
+        '''
+        job_finished_marker = JobFinishedMarker(job_number)
+        while True:
+            try:
+                self.work_queue.put(job_finished_marker, timeout=0.1)
+                return
+            except queue.Full:
+                if self.retired:
+                    self.discard_queued_work()
+                    continue
+                order = self.get_order()
+                if order:
+                    try:
+                        self.process_order(order)
+                    except ObsoleteCruncherError:
+                        pass # `self.retired` was set.
+    
+    
+    def start_job(self, job_number, job_assignment):
+        '''Prepare for crunching the job given in `job_assignment`.'''
+        self.job_number = job_number
+        self.initial_state = job_assignment.initial_state
+        self.crunching_profile = job_assignment.crunching_profile
+        self.cycle_detector = job_assignment.cycle_detector
+        self.batch_size = job_assignment.batch_size
+        self.batch_max_bytes = job_assignment.batch_max_bytes
+        self.batch_max_latency = job_assignment.batch_max_latency
+        self.shared_memory_threshold = job_assignment.shared_memory_threshold
+        self.batch = None
+        self.retired = False
+    
+    
+    def get_order(self):
+        '''
+        Attempt to read an order for the current job from the `.order_queue`.
+        
+        Returns the order.
+        '''
+        while True:
+            try:
+                (job_number, order) = self.order_queue.get(block=False)
+            except queue.Empty:
+                return None
+            if job_number == self.job_number:
+                return order
@@ -136,9 +136,14 @@ class ThreadCruncher(threading.Thread, BaseCruncher):
          3. We have reached a simulation end. (i.e. the step function raised
             `WorldEnded`.)
             
+        or
+        
+         4. The simulation started repeating itself. (Which we detect only
+            when the step profile is deterministic.)
+            
         or 
         
-         4. We have received a new crunching profile which has a different step
+         5. We have received a new crunching profile which has a different step
             profile than the one we started with. We can't change step profile
             on the fly, so we simply retire and let the crunching manager 
             recruit a new cruncher.
@@ -147,6 +152,13 @@ class ThreadCruncher(threading.Thread, BaseCruncher):
         
         self.step_profile = self.crunching_profile.step_profile
         
+        self.cycle_detector = garlicsim.misc.create_cycle_detector(
+            self.project.simpack_grokker,
+            self.step_profile
+        )
+        if self.cycle_detector:
+            self.cycle_detector.check(self.initial_state)
+        
         if self.history_dependent:
             self.history_browser = HistoryBrowser(cruncher=self)
             thing = self.history_browser
@@ -160,6 +172,13 @@ class ThreadCruncher(threading.Thread, BaseCruncher):
         try:
             for state in self.iterator:
                 self.work_queue.put(state)
+                if self.cycle_detector and self.cycle_detector.check(state):
+                    self.work_queue.put(
+                        garlicsim.asynchronous_crunching.misc.CycleMarker(
+                            self.cycle_detector.period
+                        )
+                    )
+                    return
                 self.check_crunching_profile(state)
                 order = self.get_order()
                 if order:
@@ -7,6 +7,8 @@ This module defines the `CrunchingManager` class.
 See its documentation for more information.
 '''
 
+import collections
+import time
 
 from garlicsim.general_misc import queue_tools
 from garlicsim.general_misc import decorator_tools
@@ -23,7 +25,7 @@ from . import crunchers
 from .crunching_profile import CrunchingProfile
 from .base_cruncher import BaseCruncher
 from garlicsim.misc.step_profile import StepProfile
-from .misc import EndMarker
+from .misc import EndMarker, CycleMarker, StateBatch
 
 
 __all__ = ['CrunchingManager']
@@ -71,6 +73,14 @@ class CrunchingManager(object):
         self.crunchers = {}
         '''Dict that maps each job to the cruncher reponsible for doing it.'''
         
+        self.jobs_by_cruncher = {}
+        '''
+        Dict that maps each cruncher to the job it's doing.
+        
+        This is the reverse of `.crunchers`. It lets a cruncher's history
+        browser find its job without going over all the jobs.
+        '''
+        
         self.step_profiles = {}
         '''
         Dict that maps each cruncher to its step options profile.
@@ -111,39 +121,164 @@ class CrunchingManager(object):
         new type.
         '''
         
+        self.max_nodes_per_chunk = 100
+        '''
+        The number of nodes that are added to the tree in one go.
         
-    @with_tree_lock
-    def sync_crunchers(self):
+        When syncing the crunchers, we take work from them in turns, adding at
+        most this many nodes to the tree from one cruncher before moving on to
+        the next one. The tree lock is released between chunks, so threads that
+        read from the tree won't have to wait for long.
+        '''
+        
+        self.stopping_crunchers = set()
+        '''
+        The crunchers of terminated jobs that were told to stop crunching.
+        
+        We still take their work and put it in the tree, and retire them once
+        we took all of it.
+        '''
+        
+        self.stopping_cruncher_timeout = 5
+        '''
+        Seconds to wait for a stopping cruncher's queued work to come through.
+        
+        Work that's in a cruncher's work queue may still be on its way from
+        the cruncher's process. After this timeout we give up on it.
+        '''
+        
+        self.last_served_job = None
+        '''
+        The last job whose cruncher we took a chunk of work from.
+        
+        On each sync we start with the job after it, so when `.sync_crunchers`
+        is limited in nodes or in time, every job gets its turn to be first.
+        '''
+        
+        self.pending_work = {}
+        '''
+        Dict mapping each cruncher to work taken from it but not used yet.
+        
+        This is a deque of states and markers. It's used when a
+        `StateBatch` taken from the cruncher was only partly added to the
+        tree, because we reached the limit of nodes to add.
+        '''
+        
+        
+    def sync_crunchers(self, max_nodes=None, max_seconds=None):
         '''
         Take work from the crunchers, and give them new instructions if needed.
         
         Talks with all the crunchers, takes work from them for implementing
         into the tree, retiring crunchers or recruiting new crunchers as
         necessary.
+        
+        Work is taken from the crunchers in turns, in chunks of up to
+        `.max_nodes_per_chunk` nodes, and the tree lock is released between
+        chunks. You may limit the work taken in this call by specifying
+        `max_nodes` and/or `max_seconds`; any work that's left will be taken in
+        the next calls.
 
         Returns the total amount of nodes that were added to the tree in the
         process.
         '''
         # This is one of the most technical and sensitive functions in all of
         # GarlicSim-land. Be careful if you're trying to make changes.
-
+        
+        (total_added_nodes, drained_crunchers) = \
+            self.__take_work(max_nodes, max_seconds)
+        
+        self.__update_jobs(drained_crunchers)
+        
+        return total_added_nodes
+    
+    
+    def __take_work(self, max_nodes, max_seconds):
+        '''
+        Take work from the crunchers in turns, and put it into the tree.
+        
+        Crunchers whose jobs have been terminated are told to stop, and retired
+        and deleted from `.crunchers` once we took all of their work.
+        
+        Returns `(nodes_added, drained_crunchers)`, where `drained_crunchers` is
+        a set of the crunchers whose work we took entirely.
+        '''
+        
         total_added_nodes = garlicsim.misc.NodesAdded(0)
         '''int-oid in which we track the number of nodes added to the tree.'''
         
-        # The first thing we do is iterate over the crunchers whose jobs have
-        # been terminated. We take work from them, put it into the tree, and
-        # promptly retire them, deleting them from `self.crunchers`.
+        drained_crunchers = set()
         
-        for (job, cruncher) in list(self.crunchers.copy().items()):
-            if not (job in self.jobs):
-                (added_nodes, new_leaf) = \
-                    self.__add_work_to_tree(cruncher, job, retire=True)
+        if max_seconds is not None:
+            deadline = time.time() + max_seconds
+        
+        # The crunchers whose jobs have been terminated are told right away
+        # that they reached their clock target, so they'll stop crunching. We
+        # retire them only after we take their work and put it into the tree,
+        # because a retired cruncher may throw away the work that it didn't
+        # deliver yet.
+        
+        turns = list(self.crunchers.items())
+        for (job, cruncher) in turns:
+            if job not in self.jobs and \
+               cruncher not in self.stopping_crunchers:
+                cruncher.update_crunching_profile(
+                    CrunchingProfile(-infinity, self.step_profiles[cruncher])
+                )
+                self.stopping_crunchers.add(cruncher)
+        
+        # Starting with the job after the one that we served last time:
+        served_jobs = [job for (job, cruncher) in turns]
+        if self.last_served_job in served_jobs:
+            i_next_turn = served_jobs.index(self.last_served_job) + 1
+            turns = turns[i_next_turn:] + turns[:i_next_turn]
+        
+        while turns:
+            for (job, cruncher) in turns[:]:
+                
+                if max_nodes is None:
+                    chunk_size = self.max_nodes_per_chunk
+                else:
+                    chunk_size = min(self.max_nodes_per_chunk,
+                                     max_nodes - int(total_added_nodes))
+                if chunk_size <= 0 or \
+                   (max_seconds is not None and time.time() >= deadline):
+                    return (total_added_nodes, drained_crunchers)
+                
+                with self.project.tree.lock.write:
+                    (added_nodes, new_leaf, drained) = \
+                        self.__add_work_to_tree(cruncher, job, chunk_size)
                 total_added_nodes += added_nodes
-                del self.crunchers[job]
-
                 
+                job.node = new_leaf
+                self.last_served_job = job
+                
+                if drained:
+                    turns.remove((job, cruncher))
+                    drained_crunchers.add(cruncher)
+                    if job not in self.jobs:
+                        cruncher.retire()
+                        self.__forget_cruncher(job)
+                    
+        return (total_added_nodes, drained_crunchers)
+    
+    
+    @with_tree_lock
+    def __update_jobs(self, drained_crunchers):
+        '''
+        Give the crunchers new instructions if needed.
+        
+        Recruits crunchers for jobs that don't have them, replaces crunchers
+        that died or that need a different step profile, updates crunching
+        profiles, and deletes jobs that are done.
+        
+        `drained_crunchers` is the set of crunchers whose work was all taken.
+        A cruncher that died is not replaced until we've taken all of its work.
+        '''
+        
         # In this point all the crunchers in `.crunchers` have an active job
-        # associated with them.
+        # associated with them, except crunchers of terminated jobs whose work
+        # we didn't finish taking.
         #
         # Now we'll iterate over the active jobs.
         
@@ -165,25 +300,19 @@ class CrunchingManager(object):
 
             # job in self.crunchers
             #
-            # Okay, so it's an active job. We'll take work from the cruncher and
-            # put it in the tree, updating the job to point at `new_leaf`, which
-            # is the node (leaf) containing the most recent state produced by
-            # the cruncher.
+            # Okay, so it's an active job. We already took work from the
+            # cruncher and put it in the tree, updating the job to point at the
+            # node (leaf) containing the most recent state produced by the
+            # cruncher.
             #
             # The cruncher may either be active and crunching, or it may have
             # stopped, (because of a `WorldEnded` exception, or other reasons.)
             
             cruncher = self.crunchers[job]
             
-            (added_nodes, new_leaf) = self.__add_work_to_tree(cruncher,
-                                                              job)
-            total_added_nodes += added_nodes
-
-            job.node = new_leaf
-            
-            # We took work from the cruncher, now it's time to decide if we want
-            # the cruncher to keep running or not. We will also update its
-            # crunching profile, if that has been changed on the job.
+            # Now it's time to decide if we want the cruncher to keep running
+            # or not. We will also update its crunching profile, if that has
+            # been changed on the job.
             
             if not job.is_done():
                 
@@ -235,6 +364,14 @@ class CrunchingManager(object):
                     # `crunching_manager.cruncher_type` in the middle of
                     # simulating. In any case, this cruncher is done for.
                     
+                    if not cruncher.is_alive() and \
+                       cruncher not in drained_crunchers:
+                        # The cruncher died but it still has work that we
+                        # didn't take, (because we were limited in the amount
+                        # of work to take,) so we'll replace it only after we
+                        # take that work.
+                        continue
+                    
                     cruncher.retire() # In case it's not totally dead.
                     
                     self.__conditional_create_cruncher(job)
@@ -250,10 +387,7 @@ class CrunchingManager(object):
                 self.jobs.remove(job)
                 if cruncher.is_alive():
                     cruncher.retire()
-                del self.crunchers[job]
-
-            
-        return total_added_nodes
+                self.__forget_cruncher(job)
 
     
     
@@ -267,13 +401,25 @@ class CrunchingManager(object):
         if node.still_in_editing is False:
             cruncher = self.cruncher_type(self, node.state, crunching_profile)
             cruncher.start()
+            if job in self.crunchers:
+                # Replacing the job's old cruncher.
+                self.__forget_cruncher(job)
             self.crunchers[job] = cruncher
+            self.jobs_by_cruncher[cruncher] = job
             
             self.crunching_profiles_change_tracker.check_in(crunching_profile)
             self.step_profiles[cruncher] = \
                 crunching_profile.step_profile
             
     
+    def __forget_cruncher(self, job):
+        '''Forget about the cruncher that is assigned to `job`.'''
+        cruncher = self.crunchers.pop(job)
+        del self.jobs_by_cruncher[cruncher]
+        self.pending_work.pop(cruncher, None)
+        self.stopping_crunchers.discard(cruncher)
+        
+    
     def get_jobs_by_node(self, node):
         '''
         Get all the jobs that should be done on the specified node.
@@ -283,56 +429,107 @@ class CrunchingManager(object):
         return [job for job in self.jobs if (job.node is node)]
 
     
-    def __add_work_to_tree(self, cruncher, job, retire=False):
+    def __add_work_to_tree(self, cruncher, job, max_nodes=None):
         '''
         Take work from cruncher and add to tree at the specified job's node.
         
-        If `retire` is set to `True`, retires the cruncher. Keep in mind that
-        if the cruncher gives an `EndMarker`, it will be retired regardless of
-        the `retire` argument.
+        Keep in mind that if the cruncher gives an `EndMarker` or a
+        `CycleMarker`, it will be retired.
+        
+        If `max_nodes` is specified, stops after adding that many nodes; The
+        rest of the cruncher's work will be taken on the next call.
         
-        Returns `(number, leaf)`, where `number` is the number of nodes that
-        were added, and `leaf` is the last node that was added.
+        Returns `(number, leaf, drained)`, where `number` is the number of
+        nodes that were added, `leaf` is the last node that was added, and
+        `drained` says whether we took all the work from the cruncher.
         '''
         
         tree = self.project.tree
         node = job.node
+        step_profile = self.step_profiles[cruncher]
+        pending_work = self.pending_work.setdefault(cruncher,
+                                                    collections.deque())
         
         current_node = node
         counter = 0
+        drained = True
         
-        queue_iterator = queue_tools.iterate(
-            cruncher.work_queue,
-            limit_to_original_size=True,
-            _prefetch_if_no_qsize=True
-        )
+        # Consecutive states are collected here and added to the tree in bulk:
+        states = []
         
-        for thing in queue_iterator:
+        for thing in self.__iterate_work(cruncher, pending_work):
             
             if isinstance(thing, garlicsim.data_structures.State):
                 counter += 1
-                current_node = tree.add_state(
-                    thing,
-                    parent=current_node,
-                    step_profile=self.step_profiles[cruncher],            
-                )
-                # todo optimization: save step profile in variable, it's
-                # wasteful to do a dict lookup every state.
+                states.append(thing)
             
             elif isinstance(thing, EndMarker):
+                current_node = tree.add_states(states, parent=current_node,
+                                               step_profile=step_profile)
+                states = []
                 tree.make_end(node=current_node,
-                              step_profile=self.step_profiles[cruncher])
+                              step_profile=step_profile)
+                job.resulted_in_end = True
+                
+            elif isinstance(thing, CycleMarker):
+                current_node = tree.add_states(states, parent=current_node,
+                                               step_profile=step_profile)
+                states = []
+                tree.make_cycle(node=current_node,
+                                step_profile=step_profile,
+                                period=thing.period)
                 job.resulted_in_end = True
                 
             else:
                 raise TypeError('Unexpected object `%s` in work queue' % thing)
+            
+            if max_nodes is not None and counter >= max_nodes:
+                drained = False
+                break
+        
+        current_node = tree.add_states(states, parent=current_node,
+                                       step_profile=step_profile)
                         
-        if retire or job.resulted_in_end:
+        if job.resulted_in_end:
             cruncher.retire()
         
         nodes_added = garlicsim.misc.NodesAdded(counter)
 
-        return (nodes_added, current_node)
+        return (nodes_added, current_node, drained)
+    
+    
+    def __iterate_work(self, cruncher, pending_work):
+        '''
+        Iterate over the states and markers that the cruncher produced.
+        
+        Starts with `pending_work`, and then goes on to the cruncher's work
+        queue, unpacking `StateBatch` objects. When the iteration is stopped
+        midway, the remaining states of the current batch stay in
+        `pending_work`.
+        
+        For a cruncher that was told to stop, we wait for the items that are
+        already in its work queue to come through, because we retire it as soon
+        as we're done.
+        '''
+        while pending_work:
+            yield pending_work.popleft()
+        
+        stopping = cruncher in self.stopping_crunchers
+        queue_iterator = queue_tools.iterate(
+            cruncher.work_queue,
+            block=stopping,
+            timeout=self.stopping_cruncher_timeout,
+            limit_to_original_size=True,
+            _prefetch_if_no_qsize=True
+        )
+        
+        for thing in queue_iterator:
+            if isinstance(thing, StateBatch):
+                pending_work.extend(thing)
+                while pending_work:
+                    yield pending_work.popleft()
+            else:
+                yield thing
     
     
     def __repr__(self):
@@ -56,6 +56,23 @@ class HistoryBrowser(garlicsim.misc.BaseHistoryBrowser, ContextManager):
         self.project = cruncher.project
         self.tree = self.project.tree
         self.tree_lock = self.project.tree.lock
+        
+        self.history_window = \
+            self.project.simpack_grokker.settings.HISTORY_WINDOW
+        '''
+        The number of latest states that may be requested, or `None` for all.
+        
+        See documentation of the `HISTORY_WINDOW` simpack setting.
+        '''
+        
+        self.path = None
+        '''
+        A path that leads to our node.
+        
+        We keep using the same path as the cruncher's work gets added to the
+        tree, because the path knows how to extend itself cheaply when the
+        timeline grows. We only make a new one if our node isn't on it.
+        '''
     
         
     def manage_context(self):
@@ -78,6 +95,7 @@ class HistoryBrowser(garlicsim.misc.BaseHistoryBrowser, ContextManager):
     def __getitem__(self, index):
         '''Get a state by its position in the timeline.'''
         assert isinstance(index, int)
+        self._check_index_in_window(index)
         if index < 0:
             return self.__get_item_negative(index)
         else: # index >= 0
@@ -95,8 +113,7 @@ class HistoryBrowser(garlicsim.misc.BaseHistoryBrowser, ContextManager):
             # The requested state is in the tree
             queue_size = self.cruncher.work_queue.qsize()
             new_index = index + queue_size
-            our_node = self.__get_our_node()
-            path = our_node.make_containing_path()
+            (path, our_node) = self.__get_path_and_our_node()
             result_node = path.__getitem__(new_index, tail=our_node)
             return result_node.state
             
@@ -106,15 +123,13 @@ class HistoryBrowser(garlicsim.misc.BaseHistoryBrowser, ContextManager):
         '''
         Get a state by its position in the timeline. Positive indices only.
         '''
-        our_node = self.__get_our_node()
-        path = our_node.make_containing_path()
+        (path, our_node) = self.__get_path_and_our_node()
         try:
             result_node = path.__getitem__(index, tail=our_node)
             return result_node.state
         
         except IndexError:
             path_length = path.__len__(tail=our_node)
-            # todo: Probably inefficient: We're plowing through the path again.
             new_index = index - path_length
             try:
                 return self.__get_item_from_queue(new_index)
@@ -150,6 +165,7 @@ class HistoryBrowser(garlicsim.misc.BaseHistoryBrowser, ContextManager):
         '''
         
         assert issubclass(rounding, binary_search.Rounding)
+        self._check_value_in_window(function, value)
         
         tree_result = self.__get_both_states_by_monotonic_function_from_tree \
                       (function, value)
@@ -200,8 +216,7 @@ class HistoryBrowser(garlicsim.misc.BaseHistoryBrowser, ContextManager):
         
         This uses the `binary_search.BOTH` rounding. See its documentation.
         '''
-        our_node = self.__get_our_node()
-        path = our_node.make_containing_path()
+        (path, our_node) = self.__get_path_and_our_node()
         new_function = lambda node: function(node.state)
         
         result_in_nodes = path.get_node_by_monotonic_function \
@@ -245,8 +260,7 @@ class HistoryBrowser(garlicsim.misc.BaseHistoryBrowser, ContextManager):
         '''
         queue_length = self.cruncher.work_queue.qsize()
         
-        our_node = self.__get_our_node()
-        our_path = our_node.make_containing_path()
+        (our_path, our_node) = self.__get_path_and_our_node()
         path_length = our_path.__len__(tail=our_node)
         
         return queue_length + path_length
@@ -255,18 +269,24 @@ class HistoryBrowser(garlicsim.misc.BaseHistoryBrowser, ContextManager):
     @with_self
     def __get_our_node(self):
         '''Get the node that the current cruncher is assigned to work on.'''
-        jobs_to_crunchers = list(self.project.crunching_manager.crunchers.items())
-        
-        nodes_that_are_us = \
-            [job.node for (job, cruncher) in jobs_to_crunchers \
-             if cruncher == self.cruncher]
-        
-        num = len(nodes_that_are_us)
-        assert num <= 1
-        if num == 1:
-            our_node = nodes_that_are_us[0]
-        else: # num == 0
+        jobs_by_cruncher = self.project.crunching_manager.jobs_by_cruncher
+        try:
+            job = jobs_by_cruncher[self.cruncher]
+        except KeyError:
             raise ObsoleteCruncherError
-        return our_node
+        return job.node
+    
+    
+    @with_self
+    def __get_path_and_our_node(self):
+        '''
+        Get a path that leads to our node, and our node.
+        
+        Returns `(path, our_node)`.
+        '''
+        our_node = self.__get_our_node()
+        if (self.path is None) or (our_node not in self.path):
+            self.path = our_node.make_past_path()
+        return (self.path, our_node)
         
     
\ No newline at end of file
@@ -3,4 +3,7 @@
 
 '''Defines miscellanous objects.'''
 
-from .end_marker import EndMarker
\ No newline at end of file
+from .end_marker import EndMarker
+from .cycle_marker import CycleMarker
+from .state_batch import (StateBatch, shared_memory_available,
+                          SharedMemoryUnavailable)
\ No newline at end of file
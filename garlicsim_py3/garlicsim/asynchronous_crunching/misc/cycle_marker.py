@@ -0,0 +1,27 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''
+Defines the `CycleMarker` class.
+
+See its documentation for more info.
+'''
+
+
+class CycleMarker(object):
+    '''
+    A marker used by crunchers to say that the simulation repeats itself.
+    
+    This is used only with deterministic step profiles. When the cruncher
+    produces a state that's identical, apart from the clock, to one it produced
+    before, it will place a `CycleMarker` in the work queue and stop crunching,
+    since all the states after it would just repeat the previous ones.
+    
+    The crunching manager will recognize the `CycleMarker` and put a `Cycle` to
+    the timeline.
+    '''
+    
+    def __init__(self, period):
+        self.period = period
+        '''The number of steps after which the simulation repeats itself.'''
+        
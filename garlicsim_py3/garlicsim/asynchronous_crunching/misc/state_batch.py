@@ -0,0 +1,179 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''
+Defines the `StateBatch` class.
+
+See its documentation for more info.
+'''
+
+import pickle
+
+from garlicsim.misc import GarlicSimException
+
+try:
+    from multiprocessing import shared_memory
+    from multiprocessing import resource_tracker
+except ImportError:
+    shared_memory = None
+
+
+__all__ = ['StateBatch', 'shared_memory_available',
+           'SharedMemoryUnavailable']
+
+
+shared_memory_available = (shared_memory is not None) and \
+                          (pickle.HIGHEST_PROTOCOL >= 5)
+'''
+Whether states can be sent in shared memory on this Python version.
+
+This requires `multiprocessing.shared_memory` and pickle protocol 5, which were
+both added in Python 3.8.
+'''
+
+
+class SharedMemoryUnavailable(GarlicSimException):
+    '''Shared memory was asked for, but it isn't available in this Python.'''
+
+
+class StateBatch(object):
+    '''
+    A batch of consecutive states, put in a work queue as one item.
+    
+    Crunchers that work from a different process use this to avoid sending
+    each state through the queue separately. The states are pickled when they
+    are added to the batch, so the batch knows how big it is, and when the
+    batch itself goes through the queue its states don't get pickled again.
+    
+    If `shared_memory_threshold` is given, states are pickled with pickle
+    protocol 5, and every buffer in them of at least that many bytes (like the
+    data of a NumPy array) is put in its own shared memory segment instead of
+    in the pickle. Then these buffers don't go through the queue's pipe at
+    all; The receiving process copies each of them into its own memory in one
+    go, and frees the segment right away. (Keeping the segments for as long
+    as the states use them would take a file descriptor for each one, and a
+    big tree would run out of them.)
+    
+    The crunching manager will recognize the `StateBatch` and add all of its
+    states to the tree, in order.
+    '''
+    
+    def __init__(self, shared_memory_threshold=None):
+        
+        if shared_memory_threshold is not None and \
+           not shared_memory_available:
+            raise SharedMemoryUnavailable(
+                "Can't send states in shared memory because "
+                "`multiprocessing.shared_memory` isn't available. It requires "
+                "Python 3.8 or above."
+            )
+        
+        self.shared_memory_threshold = shared_memory_threshold
+        '''
+        The size in bytes from which buffers are sent in shared memory.
+        
+        `None` means that shared memory isn't used.
+        '''
+        
+        self.pickled_states = []
+        '''The pickled states in the batch, in chronological order.'''
+        
+        self.segment_names = []
+        '''
+        The names of the shared memory segments used by each state.
+        
+        This list is parallel to `.pickled_states`. Every item is a list of
+        `(name, size)` pairs, one for each of the state's out-of-band buffers.
+        '''
+        
+        self.n_bytes = 0
+        '''The total size of the pickled states, in bytes.'''
+    
+    
+    def add_state(self, state):
+        '''Add a state to the end of the batch.'''
+        if self.shared_memory_threshold is None:
+            pickled_state = pickle.dumps(state, pickle.HIGHEST_PROTOCOL)
+            segment_names = []
+        else:
+            segment_names = []
+            
+            def buffer_callback(pickle_buffer):
+                return self.__put_in_shared_memory(pickle_buffer,
+                                                   segment_names)
+            
+            pickled_state = pickle.dumps(state, 5,
+                                         buffer_callback=buffer_callback)
+        
+        self.pickled_states.append(pickled_state)
+        self.segment_names.append(segment_names)
+        self.n_bytes += len(pickled_state)
+    
+    
+    def __put_in_shared_memory(self, pickle_buffer, segment_names):
+        '''
+        Put a pickle buffer in a shared memory segment, if it's big enough.
+        
+        Returns whether the buffer should be pickled in-band after all.
+        '''
+        raw = pickle_buffer.raw()
+        size = raw.nbytes
+        if size < self.shared_memory_threshold:
+            return True
+        segment = shared_memory.SharedMemory(create=True, size=size)
+        segment.buf[:size] = raw
+        # The receiving process is the one who'll unlink the segment, so we
+        # don't want our resource tracker to unlink it when we exit:
+        resource_tracker.unregister(segment._name, 'shared_memory')
+        segment.close()
+        segment_names.append((segment.name, size))
+        self.n_bytes += size
+        return False
+    
+    
+    def __iter__(self):
+        '''
+        Iterate over the states in the batch.
+        
+        Can be done only once when using shared memory, because the shared
+        memory segments are unlinked when they're received.
+        '''
+        for pickled_state, segment_names in zip(self.pickled_states,
+                                                self.segment_names):
+            if not segment_names:
+                yield pickle.loads(pickled_state)
+                continue
+            buffers = []
+            for name, size in segment_names:
+                segment = shared_memory.SharedMemory(name=name)
+                try:
+                    buffers.append(bytearray(segment.buf[:size]))
+                finally:
+                    segment.unlink()
+                    segment.close()
+            yield pickle.loads(pickled_state, buffers=buffers)
+    
+    
+    def release(self):
+        '''
+        Free the shared memory of a batch that won't be unpacked.
+        
+        This is needed only for batches that use shared memory and are thrown
+        away without iterating over them; otherwise their segments would stay
+        in the system until it restarts.
+        '''
+        for segment_names in self.segment_names:
+            for name, size in segment_names:
+                try:
+                    segment = shared_memory.SharedMemory(name=name)
+                except FileNotFoundError:
+                    continue
+                segment.unlink()
+                segment.close()
+        self.segment_names = [[] for segment_names in self.segment_names]
+    
+    
+    def __len__(self):
+        '''Get the number of states in the batch.'''
+        return len(self.pickled_states)
+
@@ -133,16 +133,16 @@ class Project(object):
         the leaves of `node` will be crunched until there's a buffer of
         `clock_buffer` between `node` and each of the leaves.
         '''
-        leaves_dict = node.get_all_leaves(max_clock_distance=clock_buffer)
         new_clock_target = node.state.clock + clock_buffer
         
-        for leaf in leaves_dict.copy():
-            if leaf.ends: # todo: Not every end should count.
-                del leaves_dict[leaf]
+        # Leaves that are already at the clock target don't need a buffer, so
+        # we don't even look at the parts of the tree beyond it:
+        leaves = self.tree.get_leaves(node, max_clock=new_clock_target)
         
-        for item in list(leaves_dict.items()):
-
-            leaf = item[0]
+        for leaf in leaves:
+            
+            if leaf.ends: # todo: Not every end should count.
+                continue
             
             jobs_of_leaf = self.crunching_manager.get_jobs_by_node(leaf)
             
@@ -242,18 +242,23 @@ class Project(object):
         return job
     
 
-    def sync_crunchers(self):
+    def sync_crunchers(self, max_nodes=None, max_seconds=None):
         '''
         Take work from the crunchers, and give them new instructions if needed.
         
         Talks with all the crunchers, takes work from them for implementing
         into the tree, retiring crunchers or recruiting new crunchers as
         necessary.
+        
+        You may limit the work taken in this call by specifying `max_nodes`
+        and/or `max_seconds`; any work that's left will be taken in the next
+        calls.
 
         Returns the total amount of nodes that were added to the tree in the
         process.
         '''        
-        return self.crunching_manager.sync_crunchers()
+        return self.crunching_manager.sync_crunchers(max_nodes=max_nodes,
+                                                     max_seconds=max_seconds)
     
     
     @with_tree_lock
@@ -305,7 +310,8 @@ class Project(object):
         path = node.make_containing_path()
         history_browser = garlicsim.synchronous_crunching.HistoryBrowser(
             path,
-            tail_node=node
+            tail_node=node,
+            history_window=self.simpack_grokker.settings.HISTORY_WINDOW
         )
         
         iterator = self.simpack_grokker.get_step_iterator(history_browser,
@@ -363,14 +369,20 @@ class Project(object):
         iterator = self.simpack_grokker.get_step_iterator(state, step_profile)
         finite_iterator = cute_iter_tools.shorten(iterator, iterations)
         
-        current_node = node
+        world_ended = False
         
-        try:
-            for current_state in finite_iterator:
-                current_node = self.tree.add_state(current_state,
-                                                   parent=current_node,
-                                                   step_profile=step_profile)
-        except garlicsim.misc.WorldEnded:
+        def states_until_world_ends():
+            nonlocal world_ended
+            try:
+                for current_state in finite_iterator:
+                    yield current_state
+            except garlicsim.misc.WorldEnded:
+                world_ended = True
+        
+        current_node = self.tree.add_states(states_until_world_ends(),
+                                            parent=node,
+                                            step_profile=step_profile)
+        if world_ended:
             self.tree.make_end(current_node, step_profile)
             
         return current_node
@@ -422,7 +434,8 @@ class Project(object):
         path = node.make_containing_path()
         history_browser = garlicsim.synchronous_crunching.HistoryBrowser(
             path,
-            tail_node=node
+            tail_node=node,
+            history_window=self.simpack_grokker.settings.HISTORY_WINDOW
         )
         
         iterator = self.simpack_grokker.get_step_iterator(history_browser,
@@ -17,8 +17,10 @@ from .state import State
 from .tree_member import TreeMember
 
 from .node import Node, NodeError
+from .node_store import NodeStore
 from .block import Block, BlockError
 from .end import End
+from .cycle import Cycle
 
 from .node_range import NodeRange
 from .node_selection import NodeSelection
@@ -27,8 +29,16 @@ from .tree import Tree, TreeError
 
 from .path import Path, PathError, PathLookupError, PathOutOfRangeError
 
+from .state_eviction import (BaseStateEvictionPolicy, MaxStatesEvictionPolicy,
+                             EveryNthStateEvictionPolicy,
+                             CheckpointsEvictionPolicy,
+                             ForkPointsEvictionPolicy, DiskStateStore)
+
 
 __all__ = ['TreeMember', 'State', 'Tree', 'Path', 'Node', 'Block', 'End',
-           'NodeRange', 'NodeSelection'] + \
+           'Cycle', 'NodeRange', 'NodeSelection', 'BaseStateEvictionPolicy',
+           'MaxStatesEvictionPolicy', 'EveryNthStateEvictionPolicy',
+           'CheckpointsEvictionPolicy', 'ForkPointsEvictionPolicy',
+           'DiskStateStore', 'NodeStore'] + \
           ['BlockError', 'PathError', 'PathLookupError', 'PathOutOfRangeError',
             'TreeError', 'NodeError']
\ No newline at end of file
@@ -61,6 +61,17 @@ class Block(TreeMember):
         '''Step profile with which all the nodes in the block were crunched.'''
         
         self.__node_list = []
+        
+        self.__first_ordinal = 0
+        '''
+        The `._block_ordinal` of the first node in the block.
+        
+        Every node in the block keeps an ordinal number, and its index in the
+        block is its ordinal minus this offset. This way we can find a node's
+        index without scanning the node list, and we can prepend nodes to the
+        block without renumbering all the others.
+        '''
+        
         self.add_node_list(node_list)
 
         
@@ -84,6 +95,7 @@ class Block(TreeMember):
             # If the node list is `[]`, let's make it `[node]`.
             self.__node_list.append(node)
             node.block = self
+            node._block_ordinal = self.__first_ordinal = 0
             self.step_profile = node.step_profile
             return
         
@@ -98,6 +110,7 @@ class Block(TreeMember):
             # We're appending the node to the tail of the block.
             self.__node_list.append(node)
             node.block = self
+            node._block_ordinal = last_in_block._block_ordinal + 1
             return
         
         first_in_block = self.__node_list[0]
@@ -105,13 +118,15 @@ class Block(TreeMember):
             # We're appending the node to the head of the block.
             self.__node_list.insert(0, node)
             node.block = self
+            self.__first_ordinal -= 1
+            node._block_ordinal = self.__first_ordinal
             return
         
         raise BlockError('Tried to add a node which is not a direct '
                          'successor or a direct ancestor of the block.')
 
     
-    def add_node_list(self, node_list):
+    def add_node_list(self, node_list, validate=True):
         '''
         Add a list of nodes to the block.
         
@@ -124,6 +139,9 @@ class Block(TreeMember):
                
             2. The last node in the list is the parent of the first node in
                the block.
+        
+        If `validate=False` is given, these conditions aren't checked. This is
+        for callers that have just created the nodes and know they're fine.
         '''
         
         assert self.alive
@@ -135,15 +153,49 @@ class Block(TreeMember):
             self.append_node(node_list[0])
             return
         
+        sample_step_profile = node_list[0].step_profile
+        
+        if validate:
+            self.__validate_node_list(node_list)
+        
+        if not self.__node_list:
+            # If the node list is empty, our job is simple.
+            self.__node_list = list(node_list)
+            self.__first_ordinal = 0
+            for (ordinal, node) in enumerate(node_list):
+                node.block = self
+                node._block_ordinal = ordinal
+            self.step_profile = sample_step_profile
+            return
+        
+        if node_list[0].parent == self.__node_list[-1]:
+            first_new_ordinal = self.__node_list[-1]._block_ordinal + 1
+            self.__node_list.extend(node_list)
+        elif self.__node_list[0].parent == node_list[-1]:
+            first_new_ordinal = self.__first_ordinal - len(node_list)
+            self.__first_ordinal = first_new_ordinal
+            self.__node_list = node_list + self.__node_list
+        else:
+            raise BlockError('List of nodes is not adjacent to existing nodes.')
+
+        for (ordinal, node) in enumerate(node_list, first_new_ordinal):
+            node.block = self
+            node._block_ordinal = ordinal
+    
+    
+    def __validate_node_list(self, node_list):
+        '''
+        Check that `node_list` may be added to the block.
+        
+        Raises `BlockError` if it may not.
+        '''
         if not logic_tools.all_equal((node.step_profile for node
                                       in node_list)):
             raise BlockError("Tried to add node list that doesn't share the "
                              "same step profile.")
         
-        sample_step_profile = node_list[0].step_profile
-        
         if self.__node_list and \
-           sample_step_profile != self.step_profile:
+           node_list[0].step_profile != self.step_profile:
             raise BlockError('Tried to add node list which contains node that '
                              'has a different step profile.')
         
@@ -158,24 +210,6 @@ class Block(TreeMember):
                                  "the last node in the block.")
             if node_list[i].touched:
                 raise BlockError('Tried to add touched nodes to block.')
-        
-        if not self.__node_list:
-            # If the node list is empty, our job is simple.
-            self.__node_list = list(node_list)
-            for node in node_list:
-                node.block = self
-            self.step_profile = sample_step_profile
-            return
-        
-        if node_list[0].parent == self.__node_list[-1]:
-            self.__node_list = self.__node_list + node_list
-        elif self.__node_list[0].parent == node_list[-1]:
-            self.__node_list = node_list + self.__node_list
-        else:
-            raise BlockError('List of nodes is not adjacent to existing nodes.')
-
-        for node in node_list:
-            node.block = self
 
             
     def split(self, node):
@@ -185,17 +219,30 @@ class Block(TreeMember):
         `node` would be the last node of the first block of the two. If either
         of the new blocks will contain just one node, that block will get
         deleted and the single node will become blockless.
+        
+        The longer of the two parts stays in this block, so its nodes keep
+        their ordinals, and only the shorter part is moved to a new block.
         '''
         assert self.alive
         assert node in self
-        i = self.__node_list.index(node)
+        i = self.index(node)
+        first_list = self.__node_list[:i+1]
         second_list = self.__node_list[i+1:]
-        self.__node_list = self.__node_list[:i+1]
-        if len(second_list) >= 2:
-            Block(second_list)
+        if len(first_list) >= len(second_list):
+            self.__node_list = first_list
+            split_list = second_list
+        else:
+            self.__node_list = second_list
+            self.__first_ordinal += len(first_list)
+            split_list = first_list
+            
+        if len(split_list) >= 2:
+            # These nodes were already in a valid block, so there's no need to
+            # validate them again:
+            Block([]).add_node_list(split_list, validate=False)
         else:
-            for node in second_list:
-                node.block = None
+            for split_node in split_list:
+                split_node.block = None
         if len(self.__node_list) <= 1:
             self.delete()
 
@@ -230,6 +277,8 @@ class Block(TreeMember):
             if (i == 0) or (i == -1) or \
                (i == len(self) - 1) or (i == -len(self)):
                 self.__node_list[i].block = None
+                if (i == 0) or (i == -len(self)):
+                    self.__first_ordinal += 1
                 return self.__node_list.__delitem__(i)
             elif (-len(self) < i < len(self) - 1):
                     raise BlockError("Can't remove a node from the middle of "
@@ -248,13 +297,13 @@ class Block(TreeMember):
             
             head_node, tail_node = [self[index] for index in (i.start, i.stop)]
             
+            # Splitting may leave either part in this block, so after each
+            # split we find the part we want by the block of `head_node`.
+            
             self.split(tail_node)
-
-            if self.alive is False:                
-                return
             
-            if i.start >= 1:
-                self.split(head_node.parent)
+            if i.start >= 1 and head_node.block is not None:
+                head_node.block.split(head_node.parent)
                 
             if head_node.block is not None:
                 head_node.block.delete()
@@ -295,9 +344,16 @@ class Block(TreeMember):
 
     
     def index(self, node):
-        '''Get the index number of the specified node in the block.'''
+        '''
+        Get the index number of the specified node in the block.
+        
+        This takes constant time, because every node remembers its ordinal
+        number in its block.
+        '''
         assert self.alive
-        return self.__node_list.index(node)
+        if not (isinstance(node, Node) and node.block is self):
+            raise ValueError('%s is not in the block.' % node)
+        return node._block_ordinal - self.__first_ordinal
     
     
     def is_overlapping(self, tree_member):
@@ -342,6 +398,11 @@ class Block(TreeMember):
         return self[0].all_possible_paths()
     
     
+    def iterate_possible_paths(self):
+        '''Iterate over all possible paths that contain this block.'''
+        return self[0].iterate_possible_paths()
+    
+    
     
     def make_past_path(self):
         '''
@@ -421,5 +482,22 @@ class Block(TreeMember):
                    self.step_profile.__repr__(short_form=True),
                    hex(id(self))
                )
+    
+    
+    def __setstate__(self, block_state):
+        '''
+        Restore the block from its pickled state.
+        
+        Blocks pickled before nodes kept ordinal numbers don't have a
+        `.__first_ordinal`; For these we start counting from zero and number
+        the block's nodes by their place in the block.
+        '''
+        self.__dict__.update(block_state)
+        if '_Block__first_ordinal' not in block_state:
+            # This block was pickled before nodes had ordinal numbers, so we
+            # number them now.
+            self.__first_ordinal = 0
+            for (ordinal, node) in enumerate(self.__node_list):
+                node._block_ordinal = ordinal
         
 from .node import Node
\ No newline at end of file
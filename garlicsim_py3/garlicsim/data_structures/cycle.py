@@ -0,0 +1,56 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''
+Defines the `Cycle` class.
+
+See its documentation for more information.
+'''
+
+from garlicsim.general_misc import address_tools
+
+from .end import End
+
+
+class Cycle(End):
+    '''
+    A cycle in the simulation.
+    
+    A `Cycle` signifies that a deterministic simulation has reached a state
+    which is identical, apart from the clock, to a state it had before, so from
+    then on it would just repeat itself. Like an `End`, a `Cycle` is added to
+    the `.ends` list of the last node on the timeline, and no more crunching is
+    done after it.
+    '''
+    
+    def __init__(self, tree, parent, step_profile=None, period=None):
+        End.__init__(self, tree, parent, step_profile)
+        
+        self.period = period
+        '''
+        The number of steps after which the simulation repeats itself.
+        
+        The parent of the cycle has the same state, apart from the clock, as
+        its ancestor this many generations back.
+        '''
+        
+    
+    def __repr__(self):
+        '''
+        Get a string representation of the cycle.
+        
+        Example output:        
+        <garlicsim.data_structures.Cycle with period 2 from state with clock
+        6.5, crunched with life.State.step(<state>), at 0x1ffde70>
+        '''
+        
+        return '<%s with period %s from state with clock %s, crunched with ' \
+               '%s, at %s>' % \
+            (
+                address_tools.describe(type(self), shorten=True),
+                self.period,
+                self.parent.state.clock,
+                self.step_profile,
+                hex(id(self))
+            )
+        
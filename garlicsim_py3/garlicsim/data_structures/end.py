@@ -40,7 +40,7 @@ class End(TreeMember):
         list the end in its `.ends` attribute.
         '''
         
-        self.parent.ends.append(self)
+        self.parent.add_end(self)
         
         self.step_profile = step_profile
         '''The step options profile with which the end was reached.'''
@@ -90,6 +90,11 @@ class End(TreeMember):
         return self.parent.all_possible_paths()
     
     
+    def iterate_possible_paths(self):
+        '''Iterate over all possible paths that lead to this end.'''
+        return self.parent.iterate_possible_paths()
+    
+    
     def make_past_path(self):
         '''
         Create a path that leads to this end.
@@ -30,6 +30,27 @@ class NodeLookupError(NodeError, LookupError):
     '''A node-related lookup was requested but no result was found.'''
     
     
+class _NodeList(list):
+    '''
+    A list of a node's children, derived nodes or ends, that can't be changed.
+    
+    The node changes it with the methods of `list` itself, in methods like
+    `Node.add_child`. Nobody else may change it, because all the nodes that
+    have no children, no derived nodes or no ends share one empty instance,
+    so they won't need to allocate a list for each.
+    '''
+    
+    def _refuse_change(self, *args, **kwargs):
+        raise TypeError("A node's lists can't be changed directly. Use the "
+                        "node's methods, like `.add_child`, instead.")
+    
+    append = extend = insert = remove = pop = sort = reverse = clear = \
+        __setitem__ = __delitem__ = __iadd__ = __imul__ = _refuse_change
+    
+    
+_empty_node_list = _NodeList()
+    
+    
 class Node(TreeMember):
     '''
     Nodes are used to organize states in a tree.
@@ -43,6 +64,13 @@ class Node(TreeMember):
     '''
     # todo: Maybe node should not reference tree?
     
+    __slots__ = ('tree', '_state', 'parent', 'step_profile', 'touched',
+                 'block', '_block_ordinal', '_children', '_derived_nodes',
+                 'still_in_editing', '_ends', '_depth', '_jump',
+                 '__weakref__')
+    # A crunched tree may have millions of nodes, so we don't want each of
+    # them to have a `__dict__`, or lists that they don't use.
+    
     def __init__(self, tree, state, parent=None, step_profile=None,
                  touched=False):
         '''
@@ -59,8 +87,12 @@ class Node(TreeMember):
         self.tree = tree
         '''The tree in which this node resides.'''
         
-        self.state = state
-        '''The state contained in the node.'''
+        self._state = state
+        '''
+        The state contained in the node, or `None` if it was evicted.
+        
+        See the `.state` property.
+        '''
         
         self.parent = parent
         '''The parent node of this node.'''
@@ -82,21 +114,20 @@ class Node(TreeMember):
         A node may be a member of a block. See class `Block` for more details.
         '''
 
-        self.children = []
-        '''
-        A list of:
-            1. Nodes whose states were produced by simulation from this node.
-            2. Nodes who were "created by editing" from one of the nodes in the
-               aforementioned set.
+        self._block_ordinal = None
         '''
+        The ordinal number of this node in its block.
 
-        self.derived_nodes = []
-        '''
-        List of nodes who were created by editing from this node.
-        
-        These nodes should have the same parent as this node.
+        This is maintained by the block, which uses it to find the node's index
+        in constant time. It's meaningless when the node has no block.
         '''
 
+        self._children = _empty_node_list
+        '''The list of children of this node. See the `.children` property.'''
+
+        self._derived_nodes = _empty_node_list
+        '''The list of derived nodes. See the `.derived_nodes` property.'''
+
         self.still_in_editing = False
         '''
         A flag that is raised for a node which is "still in editing".
@@ -106,20 +137,178 @@ class Node(TreeMember):
         finalized.
         '''
         
-        self.ends = []
+        self._ends = _empty_node_list
+        '''The list of ends of this node. See the `.ends` property.'''
+        
+        self._depth = None
+        '''The number of ancestors this node has. See `._index_ancestry`.'''
+        
+        self._jump = None
+        '''An ancestor to jump to when looking up ancestors.'''
+        
+        self._index_ancestry()
+  
+        
+    def _index_ancestry(self):
         '''
-        The ends whose parent is this node.
+        Set the node's depth and jump pointer according to its parent.
         
-        This means, world ends that were arrived to on a timeline terminating
-        with this node.
+        Every node keeps its depth, and a pointer to one of its ancestors, to
+        which it can jump when looking up ancestors. The jump pointers are
+        chosen as in Myers' skew-binary scheme, so any ancestor can be found in
+        a logarithmic number of steps, while each node keeps only one pointer.
+        
+        The tree calls this whenever the node's parent is set. When the
+        ancestry of many nodes changes at once, the tree indexes them only
+        before they're used; See `Tree._index_changed_ancestry`.
         '''
+        parent = self.parent
+        if parent is None:
+            self._depth = 0
+            self._jump = self
+            return
+        self._depth = parent._depth + 1
+        jump = parent._jump
+        if parent._depth - jump._depth == jump._depth - jump._jump._depth:
+            self._jump = jump._jump
+        else:
+            self._jump = parent
   
         
+    def __get_children(self):
+        return self._children
+    
+    
+    def __set_children(self, children):
+        if children:
+            self._children = _NodeList(children)
+        else:
+            self._children = _empty_node_list
+    
+    
+    children = property(
+        __get_children,
+        __set_children,
+        doc='''
+        A list of:
+            1. Nodes whose states were produced by simulation from this node.
+            2. Nodes who were "created by editing" from one of the nodes in the
+               aforementioned set.
+        
+        This list can't be changed directly; Use `.add_child` and
+        `.remove_child` to change the children.
+        '''
+    )
+    
+    
+    def __get_derived_nodes(self):
+        return self._derived_nodes
+    
+    
+    def __set_derived_nodes(self, derived_nodes):
+        if derived_nodes:
+            self._derived_nodes = _NodeList(derived_nodes)
+        else:
+            self._derived_nodes = _empty_node_list
+    
+    
+    derived_nodes = property(
+        __get_derived_nodes,
+        __set_derived_nodes,
+        doc='''
+        List of nodes who were created by editing from this node.
+        
+        These nodes should have the same parent as this node. This list can't
+        be changed directly; Use `.add_derived_node` to add one.
+        '''
+    )
+    
+    
+    def __get_ends(self):
+        return self._ends
+    
+    
+    def __set_ends(self, ends):
+        if ends:
+            self._ends = _NodeList(ends)
+        else:
+            self._ends = _empty_node_list
+    
+    
+    ends = property(
+        __get_ends,
+        __set_ends,
+        doc='''
+        The ends whose parent is this node.
+        
+        This means, world ends that were arrived to on a timeline terminating
+        with this node. This list can't be changed directly; Use `.add_end` to
+        add one.
+        '''
+    )
+    
+    
+    def add_child(self, node):
+        '''Add a node to the end of this node's children.'''
+        if self._children is _empty_node_list:
+            self._children = _NodeList([node])
+        else:
+            list.append(self._children, node)
+    
+    
+    def remove_child(self, node):
+        '''Remove a node from this node's children.'''
+        list.remove(self._children, node)
+        if not self._children:
+            self._children = _empty_node_list
+    
+    
+    def add_derived_node(self, node):
+        '''Add a node that was created by editing from this node.'''
+        if self._derived_nodes is _empty_node_list:
+            self._derived_nodes = _NodeList([node])
+        else:
+            list.append(self._derived_nodes, node)
+    
+    
+    def add_end(self, end):
+        '''Add an end whose parent is this node.'''
+        if self._ends is _empty_node_list:
+            self._ends = _NodeList([end])
+        else:
+            list.append(self._ends, end)
+    
+    
     def __len__(self):
         '''Just return 1. This is useful because of blocks.'''
         return 1
 
     
+    def __get_state(self):
+        '''Get the node's state, loading it back if it was evicted.'''
+        state = self._state
+        if state is None:
+            return self.tree.state_eviction_policy.load_state(self)
+        return state
+    
+    
+    def __set_state(self, state):
+        '''Set the node's state.'''
+        self._state = state
+    
+    
+    state = property(
+        __get_state,
+        __set_state,
+        doc='''
+        The state contained in the node.
+        
+        If the tree's state eviction policy has evicted the state from memory,
+        it will be loaded back when accessing this.
+        '''
+    )
+
+    
     def finalize(self):
         '''
         Finalize the node, assuming it's in currectly in editing mode.
@@ -179,24 +368,40 @@ class Node(TreeMember):
         paths.
         '''
         #todo: possibly add `reversed` option
+        return list(self.iterate_possible_paths())
+    
+    
+    def iterate_possible_paths(self):
+        '''
+        Iterate over all possible paths that contain this node.
+        
+        This gives the same paths as `.all_possible_paths`, in the same order,
+        but lazily, making each path only when it's reached.
+        '''
         past_path = self.make_past_path()
-        paths = []
-        fork = None
-        for thing in past_path.iterate_blockwise(head=self):
-            real_thing = thing[-1] if isinstance(thing, Block) else thing
-            if len(real_thing.children):
-                fork = real_thing
-                break
-        
-        if fork:
-            for kid in fork.children:
-                paths += kid.all_possible_paths()
-            return paths
-        else: # fork is None and real_thing is the final node of the path
-            # In this case there are no forks after our node, we just return
-            # the past_path which we have driven to its last node. (Not that it
-            # has any forks to decide on anyway.)
-            return [past_path]
+        # Every item in the stack is a node to go forward from, and the
+        # decisions that lead to it, as a chain of `(fork, kid, rest_of_chain)`
+        # tuples so they don't have to be copied at every fork:
+        stack = [(self, None)]
+        while stack:
+            (node, decision_chain) = stack.pop()
+            while True:
+                if node.block is not None:
+                    node = node.block[-1]
+                children = node.children
+                if len(children) != 1:
+                    break
+                node = children[0]
+            
+            if children:
+                for kid in reversed(children):
+                    stack.append((kid, (node, kid, decision_chain)))
+            else: # `node` is a leaf
+                decisions = dict(past_path.decisions)
+                while decision_chain is not None:
+                    (fork, kid, decision_chain) = decision_chain
+                    decisions[fork] = kid
+                yield Path(self.tree, past_path.root, decisions)
 
         
     def make_past_path(self):
@@ -206,21 +411,12 @@ class Node(TreeMember):
         There may be multiple different paths that contain this node. This will
         return a path that doesn't specify any decisions after this node.
         '''
-        path = Path(self.tree)
-
-        current = self
-        while True:
-            if current.block is not None:
-                current = current.block[0]
-            parent = current.parent
-            if parent is None:
-                path.root = current
-                break
-            if len(parent.children) > 1:
-                path.decisions[parent] = current
-            current = parent
-
-        return path
+        (root, decision_chain) = self.tree._get_past_decisions(self)
+        decisions = {}
+        while decision_chain is not None:
+            (fork, kid, decision_chain) = decision_chain
+            decisions[fork] = kid
+        return Path(self.tree, root, decisions)
 
     
     def get_all_leaves(self, max_nodes_distance=None, max_clock_distance=None):
@@ -311,49 +507,34 @@ class Node(TreeMember):
         '''
 
         assert generations >= 0
-        if generations == 0:
-            return self
-        if generations == 1:
-            if self.parent:
-                return self.parent
-            else: # self.parent is None
-                if round:
-                    return self
-                else: # round is False
-                    raise NodeLookupError("You asked for the node's parent, "
-                                          "but it's a root.") 
-                
+        if generations == 1 and self.parent is None and not round:
+            raise NodeLookupError("You asked for the node's parent, but it's "
+                                  "a root.")
+        
         block = self.block
-        if block:
-            our_index = block.index(self)
-            wanted_index = our_index - generations
+        if block is not None:
+            wanted_index = block.index(self) - generations
             if wanted_index >= 0:
                 return block[wanted_index]
-            else: # wanted_index < 0
-                first_node = block[0]
-                parent_of_first = first_node.parent
-                if parent_of_first is None:
-                    if round:
-                        return first_node
-                    else: # round is False
-                        raise NodeLookupError(
-                            "You asked for too many generations back. This "
-                            "node's ancestry line doesn't go back that far."
-                        )
-                
-                return parent_of_first.get_ancestor(-wanted_index-1,
-                                                    round=round)
         
-        assert self.block is None
-        if self.parent:
-            return self.parent.get_ancestor(generations - 1, round)
-        else:
+        self.tree._index_changed_ancestry()
+        
+        wanted_depth = self._depth - generations
+        if wanted_depth < 0:
             if round:
-                return self
+                return self.get_root()
             else: # round is False
                 raise NodeLookupError("You asked for too many generations "
                                       "back. This node's ancestry line "
                                       "doesn't go back that far.")
+        
+        node = self
+        while node._depth > wanted_depth:
+            if node._jump._depth >= wanted_depth:
+                node = node._jump
+            else:
+                node = node.parent
+        return node
 
             
     def get_root(self):
@@ -363,12 +544,11 @@ class Node(TreeMember):
         This means the node which is the parent of the parent of the parent
         of... the parent of this node.
         '''
-        lowest = self.block[0] if self.block else self
-        while lowest.parent is not None:
-            lowest = lowest.parent
-            if lowest.block:
-                lowest = lowest.block[0]
-        return lowest
+        self.tree._index_changed_ancestry()
+        root = self
+        while root.parent is not None:
+            root = root._jump
+        return root
     
     
     def is_last_on_block(self):
@@ -419,6 +599,32 @@ class Node(TreeMember):
             hex(id(self))
         )
 
+    
+    def __getstate__(self):
+        # We pickle a dict like the one nodes had before they used
+        # `__slots__`, so old and new files look the same.
+        my_dict = dict(
+            (name, getattr(self, name)) for name in self.__slots__
+            if name != '__weakref__' and hasattr(self, name)
+        )
+        my_dict['_state'] = self.state
+        for name in ('children', 'derived_nodes', 'ends'):
+            my_dict[name] = list(my_dict.pop('_' + name))
+        return my_dict
+    
+    
+    def __setstate__(self, pickled_node_state):
+        if 'state' in pickled_node_state:
+            # This node was pickled before states could be evicted.
+            pickled_node_state['_state'] = pickled_node_state.pop('state')
+        for (name, value) in pickled_node_state.items():
+            setattr(self, name, value)
+        if not hasattr(self, '_block_ordinal'):
+            # This node was pickled before blocks kept ordinals; If it's in a
+            # block, the block will set it.
+            self._block_ordinal = None
+        
+        
 from .path import Path
 from .block import Block
 
@@ -99,11 +99,12 @@ class NodeRange(object):
         This returns every node which is (a) a child of a node in this node
         range and (b) not in this node range itself.
         '''
+        members = set(self)
         outside_children = []
         for thing in self.iterate_blockwise():
             candidate = thing if isinstance(thing, Node) else thing[-1]
             outside_children += [child for child in candidate.children if child
-                                 not in self]
+                                 not in members]
         return outside_children
 
     
@@ -0,0 +1,118 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''
+Defines the `NodeStore` class.
+
+See its documentation for more info.
+'''
+
+import itertools
+
+
+__all__ = ['NodeStore']
+
+
+class NodeStore(object):
+    '''
+    An insertion-ordered collection of nodes, used for `Tree.nodes`.
+    
+    This behaves like a list of nodes, except that checking whether a node is
+    in it and removing a node from it take O(1) time, which matters when
+    deleting big parts of a tree. Nodes are kept by identity, and a node may
+    appear in the store only once.
+    
+    Getting a node by its index and finding the index of a node take O(n)
+    time, like searching in a list.
+    '''
+    
+    def __init__(self, nodes=()):
+        
+        self.__nodes = {}
+        '''
+        Dict whose keys are the nodes, in the order in which they were added.
+        
+        Nodes are hashed by identity. We use a plain dict because it keeps the
+        order of its keys and takes about half the memory of an ordered dict.
+        The values are all `None`.
+        '''
+        
+        self.extend(nodes)
+    
+    
+    def append(self, node):
+        '''Add a node to the end of the store.'''
+        if node in self.__nodes:
+            raise ValueError('%s is already in the store.' % node)
+        self.__nodes[node] = None
+    
+    
+    def extend(self, nodes):
+        '''Add nodes to the end of the store.'''
+        for node in nodes:
+            self.append(node)
+    
+    
+    def remove(self, node):
+        '''Remove a node from the store. Raises `ValueError` if missing.'''
+        try:
+            del self.__nodes[node]
+        except KeyError:
+            raise ValueError('%s is not in the store.' % node)
+    
+    
+    def index(self, node):
+        '''Get the index number of a node in the store.'''
+        if node in self:
+            for (i, candidate) in enumerate(self):
+                if candidate is node:
+                    return i
+        raise ValueError('%s is not in the store.' % node)
+    
+    
+    def __getitem__(self, index):
+        '''Get a node, or a list of nodes, by index number or slice.'''
+        if isinstance(index, slice):
+            return list(self)[index]
+        length = len(self)
+        if not -length <= index < length:
+            raise IndexError('Node store index out of range.')
+        if index >= 0:
+            return next(itertools.islice(iter(self), index, None))
+        else:
+            return next(itertools.islice(reversed(self), -index - 1, None))
+    
+    
+    def __contains__(self, node):
+        return node in self.__nodes
+    
+    
+    def __iter__(self):
+        return iter(self.__nodes)
+    
+    
+    def __reversed__(self):
+        try:
+            return reversed(self.__nodes)
+        except TypeError:
+            # Dicts can be reversed only since Python 3.8.
+            return reversed(list(self.__nodes))
+    
+    
+    def __len__(self):
+        return len(self.__nodes)
+    
+    
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, list(self))
+    
+    
+    def __getstate__(self):
+        # We pickle just the nodes, in order. (In a tuple, because
+        # `__setstate__` isn't called for an empty state.)
+        return (list(self),)
+    
+    
+    def __setstate__(self, pickled_node_store_state):
+        (nodes,) = pickled_node_store_state
+        self.__init__(nodes)
@@ -9,6 +9,7 @@ See its documentation for more information.
 
 import copy as copy_module # Avoiding name clash.
 import builtins
+import bisect
 
 from garlicsim.general_misc import binary_search
 from garlicsim.general_misc.math_tools import cmp
@@ -57,6 +58,60 @@ class HeadNotReached(PathError):
 
 #                                                                             #
 ### Finished definining path-related exceptions. ##############################
+
+
+class _DecisionDict(dict):
+    '''
+    A decisions dict which keeps count of the modifications made to it.
+    
+    A path uses the count to know when the segments it has cached might no
+    longer be correct.
+    '''
+    
+    def __init__(self, *args, **kwargs):
+        self.version = 0
+        '''Number that gets increased every time the dict is modified.'''
+        dict.__init__(self, *args, **kwargs)
+
+        
+    def __setitem__(self, key, value):
+        self.version += 1
+        dict.__setitem__(self, key, value)
+
+        
+    def __delitem__(self, key):
+        self.version += 1
+        dict.__delitem__(self, key)
+
+        
+    def clear(self):
+        self.version += 1
+        dict.clear(self)
+
+        
+    def pop(self, *args):
+        self.version += 1
+        return dict.pop(self, *args)
+
+    
+    def popitem(self):
+        self.version += 1
+        return dict.popitem(self)
+
+    
+    def setdefault(self, key, default=None):
+        self.version += 1
+        return dict.setdefault(self, key, default)
+
+    
+    def update(self, *args, **kwargs):
+        self.version += 1
+        dict.update(self, *args, **kwargs)
+        
+        
+    def __reduce__(self):
+        return (type(self), (dict(self),))
+    
     
 
 class Path(object):
@@ -88,15 +143,183 @@ class Path(object):
         self.root = root
         '''The root node.'''
         
-        self.decisions = dict(decisions)
+        self._decisions = _DecisionDict(decisions)
+        '''The decisions dict. See the `.decisions` property.'''
+         # todo: Use shallow copy instead of dict.__init__. Will allow
+         # dictoids.
+        
+        self._decisions_shared = False
+        '''
+        Flag saying whether `._decisions` may be shared with other paths.
+        
+        Copies of a path share its decisions dict until one of them wants to
+        change it, and then that one copies it. Getting the `.decisions`
+        property counts as wanting to change it.
         '''
+        
+        self.__reset_segments()
+    
+    
+    def __get_decisions(self):
+        if self._decisions_shared:
+            self._decisions = _DecisionDict(self._decisions)
+            self._decisions_shared = False
+        return self._decisions
+    
+    
+    def __set_decisions(self, decisions):
+        self._decisions = decisions
+        self._decisions_shared = False
+    
+    
+    decisions = property(
+        __get_decisions,
+        __set_decisions,
+        doc='''
         The decisions dict says which fork of the road the path chooses.
+        
         It's of the form {node_which_forks: node_to_continue_to, ... }
         '''
-         # todo: Use shallow copy instead of dict.__init__. Will allow
-         # dictoids.
+    )
+
+        
+    def __reset_segments(self):
+        '''
+        Forget the cached segments of the path.
+        
+        The path caches the blocks and blockless nodes it goes through, called
+        "segments", together with the index in the path in which each segment
+        starts. This makes lookups in the path logarithmic in the number of
+        segments instead of linear. See `.__update_segments`.
+        '''
+        self._segments = []
+        '''The blocks and blockless nodes that the path goes through.'''
+        
+        self._segment_starts = []
+        '''The index number in the path of the first node of each segment.'''
+        
+        self._segment_indices = {}
+        '''Dict mapping each segment to its index in `._segments`.'''
+        
+        self._length = 0
+        '''The length of the path in nodes, according to the cached segments.'''
+        
+        self._segments_key = None
+        '''
+        The state of the tree and the path when the segments were cached.
+        
+        If any of these things change, the cached segments are thrown away.
+        '''
+
+        
+    def __update_segments(self):
+        '''
+        Make sure that the cached segments of the path are up to date.
+        
+        They are recalculated if the tree's structure has changed or if the
+        path's root or decisions have changed since they were cached. If only
+        new nodes were added after the end of the path, we just add them to the
+        cached segments.
+        '''
+        if not isinstance(self._decisions, _DecisionDict):
+            # Someone assigned a plain dict to `.decisions`.
+            self.decisions = _DecisionDict(self._decisions)
+        
+        segments = self._segments
+        segment_starts = self._segment_starts
+        segment_indices = self._segment_indices
+        
+        if self.__are_segments_current():
+            if not segments:
+                return
+            # The tree may have grown after the end of the path, in which case
+            # the last segment may have grown and new segments may follow it.
+            # We drop the last segment and continue iterating from there.
+            last_segment = segments.pop()
+            del segment_indices[last_segment]
+            start = segment_starts.pop()
+            head = last_segment if isinstance(last_segment, Node) else \
+                   last_segment[0]
+            
+        else: # The cached segments are obsolete
+            self.__reset_segments()
+            segments = self._segments
+            segment_starts = self._segment_starts
+            segment_indices = self._segment_indices
+            start = 0
+            head = self.root
+        
+        if head is not None:
+            for thing in self.iterate_blockwise(head=head):
+                segment_indices[thing] = len(segments)
+                segments.append(thing)
+                segment_starts.append(start)
+                start += len(thing)
+        self._length = start
+        
+        # Iterating may have added decisions for forks which we had no
+        # decision for, so we take the key only now:
+        self._segments_key = (self.tree._structure_version, self.root,
+                              self._decisions, self._decisions.version)
 
+        
+    def __are_segments_current(self):
+        '''
+        Return whether the cached segments are still valid.
+        
+        They are valid if neither the tree nor the path's root and decisions
+        have changed since they were cached.
+        '''
+        if self._segments_key is None:
+            return False
+        (structure_version, root, decisions, decisions_version) = \
+            self._segments_key
+        return (structure_version == self.tree._structure_version) and \
+               (root is self.root) and (decisions is self._decisions) and \
+               (decisions_version == self._decisions.version)
+
+        
          
+    def __get_position(self, thing, last=False):
+        '''
+        Get the index number in the path of a node or block.
+        
+        For a block, the index of its first node is returned, or of its last
+        node if `last=True`. If the node or block isn't on the path, returns
+        `None`.
+        
+        This assumes the cached segments are up to date.
+        '''
+        if isinstance(thing, Block):
+            thing = thing[-1] if last else thing[0]
+        segment_indices = self._segment_indices
+        if thing in segment_indices:
+            return self._segment_starts[segment_indices[thing]]
+        block = thing.block
+        if block is not None and block in segment_indices:
+            return self._segment_starts[segment_indices[block]] + \
+                   block.index(thing)
+        return None
+    
+    
+    def __get_node_by_position(self, position):
+        '''
+        Get the node in the given index number in the path.
+        
+        Only non-negative index numbers are accepted. This assumes the cached
+        segments are up to date.
+        '''
+        if not (0 <= position < self._length):
+            raise PathOutOfRangeError
+        segment_index = \
+            bisect.bisect_right(self._segment_starts, position) - 1
+        segment = self._segments[segment_index]
+        if isinstance(segment, Block):
+            return segment[position - self._segment_starts[segment_index]]
+        else: # isinstance(segment, Node)
+            return segment
+        
+        
     def __len__(self, head=None, tail=None):
         '''
         Get the length of the path in nodes.
@@ -106,7 +329,19 @@ class Path(object):
         '''
         if head is None and self.root is None:
             return 0
-            
+        
+        self.__update_segments()
+        
+        head_position = 0 if head is None else self.__get_position(head)
+        tail_position = (self._length - 1) if tail is None else \
+                        self.__get_position(tail, last=True)
+        
+        if head_position is not None and tail_position is not None and \
+           head_position <= tail_position:
+            return tail_position - head_position + 1
+        
+        # The head or the tail aren't on the path, so we iterate, and let
+        # `iterate_blockwise` complain if it needs to.
         return sum(len(thing) for thing in 
                    self.iterate_blockwise(head=head, tail=tail))
 
@@ -297,6 +532,24 @@ class Path(object):
         '''
         
         assert isinstance(thing, Node) or isinstance(thing, Block)
+        
+        if self.root is not None:
+            
+            self.__update_segments()
+            
+            if head is None and tail is None:
+                return self.__get_position(thing) is not None
+            
+            if isinstance(thing, Node):
+                positions = (
+                    self.__get_position(thing),
+                    0 if head is None else self.__get_position(head),
+                    (self._length - 1) if tail is None else
+                    self.__get_position(tail, last=True)
+                )
+                if None not in positions:
+                    (position, head_position, tail_position) = positions
+                    return head_position <= position <= tail_position
 
         for candidate in self.iterate_blockwise(head=head, tail=tail):
             if candidate is thing:
@@ -323,9 +576,10 @@ class Path(object):
         if len(kids) == 1:
             return kids[0]
         
-        if (thing in self.decisions) or (real_thing in self.decisions):
-            return self.decisions.get(thing, None) or \
-                   self.decisions.get(real_thing, None)
+        decisions = self._decisions
+        if (thing in decisions) or (real_thing in decisions):
+            return decisions.get(thing, None) or \
+                   decisions.get(real_thing, None)
         
         if len(kids) > 1:
             kid = kids[0]
@@ -347,13 +601,26 @@ class Path(object):
         You may optionally specify a `tail` node.
         '''
         #todo: allow slicing? make Path.states for this and for iterating?
-        #todo: generalize `tail` to blocks
         assert isinstance(index, int)
         
-        if index >= 0:
-            return self.__get_item_positive(index, tail=tail)
+        self.__update_segments()
+        
+        if tail is None:
+            tail_position = self._length - 1
         else:
-            return self.__get_item_negative(index, tail=tail)
+            tail_position = self.__get_position(tail, last=True)
+            
+        if tail_position is None:
+            # The tail isn't on the path, so we can't use our cached segments.
+            if index >= 0:
+                return self.__get_item_positive(index, tail=tail)
+            else:
+                return self.__get_item_negative(index, tail=tail)
+        
+        position = index if index >= 0 else (tail_position + 1 + index)
+        if not (0 <= position <= tail_position):
+            raise PathOutOfRangeError
+        return self.__get_node_by_position(position)
 
         
     def __get_item_negative(self, index, tail=None):
@@ -361,6 +628,8 @@ class Path(object):
         Get a node by its index number in the path. Negative indices only.
 
         You may optionally specify a `tail`.
+        
+        This iterates on the path, without using the cached segments.
         '''
         if tail is None:
             tail = self.get_last_node()
@@ -401,6 +670,8 @@ class Path(object):
         Get a node by its index number in the path. Positive indices only.
 
         You may optionally specify a `tail` node.
+        
+        This iterates on the path, without using the cached segments.
         '''
         # todo: supports blocks?
         my_index = -1
@@ -426,7 +697,12 @@ class Path(object):
         
         You may optionally specify `head`, which may be either a node or block.
         '''
-
+        
+        if self.root is not None:
+            self.__update_segments()
+            if head is None or self.__get_position(head) is not None:
+                return self.__get_node_by_position(self._length - 1)
+        
         # Setting to `None` before loop, so we know if loop was empty:
         thing = None 
         
@@ -528,76 +804,67 @@ class Path(object):
         # Now we've established that the first node in the path has a strictly
         # lower value than what we're looking for.
         
-        # A rule we will strictly obey in this function: `low` will always be a
-        # member whose value is lower than the desired value. (Strictly lower,
-        # meaning not lower-or-equal.)
+        self.__update_segments()
+        segments = self._segments
+        get_first = lambda segment: \
+                  segment if isinstance(segment, Node) else segment[0]
+        
+        # We do a binary search on the segments, looking for the last segment
+        # whose first node has a strictly lower value than the desired value.
+        # The first segment qualifies, because it starts with the root.
+        
+        low_index = 0
+        high_index = len(segments)
+        
+        while high_index - low_index >= 2:
+            middle_index = (low_index + high_index) // 2
+            if function(get_first(segments[middle_index])) < value:
+                low_index = middle_index
+            else:
+                high_index = middle_index
         
-        low = self.root
+        # The answer is either in the segment we found, or it's between its
+        # last node and the first node of the next segment.
         
-        for thing in self.iterate_blockwise():
+        segment = segments[low_index]
+        
+        if isinstance(segment, Block):
             
-            # Rule: Every time we inspect a new node/block, `low` will be the
-            # node that is its immediate parent. i.e. The highest node possible
-            # from those that we have previously examined.
+            block = segment
+            last = block[-1]
             
-            if isinstance(thing, Block):
-                
-                block = thing
-                
-                first = block[0]
-
-                cmp_first = cmp(function(first), value)
-                
-                if cmp_first == -1: # function(first) < value
-                    low = first
-                
-                elif cmp_first == 0: # function(first) == value
-                    return (first, first)
-                    
-                else: # cmp_first == 1 and function(first) > value
-                    return (low, first)
-                    
-                
-                # At this point we know that the first node in the block has a
-                # strictly lower value than the target value.
-                
-                last = block[-1]
-                
-                cmp_last = cmp(function(last), value)
-                
-                if cmp_last == -1: # function(last) < value
-                    low = last
-                    continue
-                
-                elif cmp_last == 0: # function(last) == value                
-                    return (last, last)
-                
-                else: # cmp_last == 1 and function(last) > value
-                    # The two final results are both in the block.
-                    return binary_search.binary_search(
-                        block, function, value, rounding=binary_search.BOTH
-                    )
-                    
-                
-            else: # thing is a Node
-                
-                node = thing
-                
-                cmp_node = cmp(function(node), value)
-                                
-                if cmp_node == -1: # function(node) < value
-                    low = node
-                    continue
-                elif cmp_node == 0: # function(node) == value
-                    return (node, node)
-                else: # function(node) > value
-                    return (low, node)
-        
-
-        # If the flow reached here, that means that even the last node in the
-        # path has lower value than the value we're looking for.
+            cmp_last = cmp(function(last), value)
+            
+            if cmp_last == 0: # function(last) == value                
+                return (last, last)
+            
+            elif cmp_last == 1: # function(last) > value
+                # The two final results are both in the block.
+                return binary_search.binary_search(
+                    block, function, value, rounding=binary_search.BOTH
+                )
+            
+            low = last
+            
+        else: # segment is a Node
+            low = segment
+            
+        # Now `low` is the last node of the segment and it has a strictly lower
+        # value than the desired value.
         
-        return (low, None)
+        try:
+            next_segment = segments[low_index + 1]
+        except IndexError:
+            # Even the last node in the path has lower value than the value
+            # we're looking for.
+            return (low, None)
+        
+        high = get_first(next_segment)
+        
+        if function(high) == value:
+            return (high, high)
+        else: # function(high) > value
+            return (low, high)
             
     
     def get_node_occupying_timepoint(self, timepoint):
@@ -648,7 +915,7 @@ class Path(object):
         '''
         new_path = node.make_past_path()
         self.root = new_path.root
-        self.decisions.update(new_path.decisions)
+        self.decisions.update(new_path._decisions)
     
     
     def states(self):
@@ -706,7 +973,9 @@ class Path(object):
                                   ('lowest' if _reverse else 'highest'))
         
         for node in my_iter(kids_to_try):
-            paths = node.all_possible_paths() # todo: make reversed argument
+            # todo: make reversed argument
+            paths = node.all_possible_paths() if _reverse else \
+                    node.iterate_possible_paths()
             for path in my_iter(paths):
                 assert isinstance(path, Path)
                 if path[-1].state.clock >= wanted_clock:
@@ -732,16 +1001,31 @@ class Path(object):
                )
     
     
+    def __getstate__(self):
+        path_state = dict(self.__dict__)
+        for key in ('_segments', '_segment_starts', '_segment_indices',
+                    '_length', '_segments_key'):
+            path_state.pop(key, None)
+        return path_state
+    
+    
+    def __setstate__(self, path_state):
+        if 'decisions' in path_state:
+            # This path was pickled before its decisions could be shared.
+            path_state['_decisions'] = path_state.pop('decisions')
+            path_state['_decisions_shared'] = False
+        self.__dict__.update(path_state)
+        self.__reset_segments()
+    
+    
     def copy(self):
         '''Make a shallow copy of the path.'''
         
-        # Most of these things don't need duplicating, but just for
-        # completeness' sake:
-        tree = self.tree
-        root = self.root
-        decisions = self.decisions.copy()
+        path = Path(tree=self.tree, root=self.root)
         
-        path = Path(tree=tree, root=root, decisions=decisions)
+        # The copy shares our decisions dict until one of us changes it:
+        path._decisions = self._decisions
+        path._decisions_shared = self._decisions_shared = True
         
         return path
     
@@ -0,0 +1,434 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''
+Defines state eviction policies, which let trees keep fewer states in memory.
+
+See documentation of `BaseStateEvictionPolicy` for more information.
+'''
+
+import abc
+import collections
+import pickle
+import tempfile
+import threading
+
+import garlicsim.misc
+
+
+__all__ = ['BaseStateEvictionPolicy', 'MaxStatesEvictionPolicy',
+           'EveryNthStateEvictionPolicy', 'CheckpointsEvictionPolicy',
+           'ForkPointsEvictionPolicy', 'DiskStateStore']
+
+
+class DiskStateStore(object):
+    '''
+    A store that keeps states of nodes in a temporary file on disk.
+    
+    It's used like a dict from nodes to states. Space taken by states that are
+    deleted from the store is not reclaimed until the store is garbage
+    collected.
+    '''
+    
+    def __init__(self, directory=None):
+        '''
+        Construct the store.
+        
+        The temporary file will be created in `directory`, or in the default
+        temporary directory if it's not specified.
+        '''
+        
+        self.file = tempfile.TemporaryFile(dir=directory)
+        '''The file in which the states are pickled.'''
+        
+        self.locations = {}
+        '''Dict mapping from node to the offset of its state in `.file`.'''
+    
+    
+    def __setitem__(self, node, state):
+        '''Store the state of `node`.'''
+        self.file.seek(0, 2)
+        self.locations[node] = self.file.tell()
+        pickle.dump(state, self.file, pickle.HIGHEST_PROTOCOL)
+    
+    
+    def __getitem__(self, node):
+        '''Load the stored state of `node`.'''
+        self.file.seek(self.locations[node])
+        return pickle.load(self.file)
+    
+    
+    def __delitem__(self, node):
+        '''Forget the stored state of `node`.'''
+        del self.locations[node]
+    
+    
+    def __contains__(self, node):
+        '''Return whether the state of `node` is in the store.'''
+        return node in self.locations
+    
+    
+    def __len__(self):
+        '''Get the number of states in the store.'''
+        return len(self.locations)
+
+
+class BaseStateEvictionPolicy(object, metaclass=abc.ABCMeta):
+    '''
+    A policy for evicting states of nodes from memory.
+    
+    Long simulations can produce more states than fit in memory. When a tree
+    has a state eviction policy, (see `Tree.set_state_eviction_policy`,) the
+    policy is notified about every node that's added to the tree, and it may
+    evict the states of some of the tree's nodes.
+    
+    If the policy has a `.state_store`, such as a `DiskStateStore`, evicted
+    states are put in it. If it doesn't, states are simply dropped; this is
+    done only for states that can be recomputed, i.e. untouched states that
+    were crunched with a deterministic, non-history-dependent step profile.
+    In both cases, accessing `node.state` of an evicted node loads the state
+    back transparently, either from the store or by stepping again from the
+    nearest ancestor that has its state.
+    
+    Leaves, and nodes that are still in editing, are never evicted.
+    
+    This is an abstract base class; subclasses decide which states to evict by
+    implementing `node_added`.
+    '''
+    
+    def __init__(self, state_store=None, n_reloaded_states=100):
+        '''
+        Construct the policy.
+        
+        `state_store` is an optional dict-like object in which evicted states
+        will be put. `n_reloaded_states` is the number of states that will be
+        kept in memory after being loaded back, before they're evicted again.
+        '''
+        
+        self.state_store = state_store
+        '''
+        Dict-like store for evicted states, or `None` to drop them instead.
+        '''
+        
+        self.n_reloaded_states = n_reloaded_states
+        '''Number of loaded-back states to keep in memory.'''
+        
+        self.reloaded_nodes = collections.OrderedDict()
+        '''Nodes whose states were loaded back, from oldest to newest.'''
+        
+        self.recomputable_step_profiles = {}
+        '''
+        Cache saying whether states made with a step profile can be recomputed.
+        
+        Keys are `(state_type, step_profile)`, values are bools. This saves us
+        from calling the simpack's `DETERMINISM_FUNCTION` for every node.
+        '''
+        
+        self.lock = threading.RLock()
+        '''
+        Lock that guards evicting and loading states.
+        
+        We need this because history browsers of different crunchers may load
+        states at the same time.
+        '''
+    
+    
+    @abc.abstractmethod
+    def node_added(self, node):
+        '''
+        Handle a node that was just added to the tree.
+        
+        This is where the policy evicts any states that it wants to evict.
+        '''
+    
+    
+    def state_loaded(self, node):
+        '''
+        Handle the evicted state of `node` being loaded back into memory.
+        
+        The default implementation keeps the last `.n_reloaded_states` loaded
+        states in memory and evicts the older ones again.
+        '''
+        self.reloaded_nodes[node] = None
+        while len(self.reloaded_nodes) > self.n_reloaded_states:
+            (old_node, _) = self.reloaded_nodes.popitem(last=False)
+            self.evict(old_node)
+    
+    
+    def node_removed(self, node):
+        '''Forget about a node that was removed from the tree.'''
+        with self.lock:
+            self.reloaded_nodes.pop(node, None)
+            if self.state_store is not None and node in self.state_store:
+                del self.state_store[node]
+    
+    
+    def can_evict(self, node):
+        '''Return whether the state of `node` may be evicted right now.'''
+        if node._state is None or node.still_in_editing or not node.children:
+            return False
+        if self.state_store is not None:
+            return True
+        return self.can_recompute(node)
+    
+    
+    def can_recompute(self, node):
+        '''
+        Return whether the state of `node` can be recomputed from its parent.
+        
+        This is true for untouched nodes that were crunched with a step
+        profile that's deterministic and not history-dependent.
+        '''
+        if node.parent is None or node.touched or node.step_profile is None:
+            return False
+        key = (type(node._state), node.step_profile)
+        try:
+            return self.recomputable_step_profiles[key]
+        except KeyError:
+            pass
+        simpack_grokker = \
+            garlicsim.misc.SimpackGrokker.create_from_state(node._state)
+        if simpack_grokker.history_dependent:
+            recomputable = False
+        else:
+            determinism = simpack_grokker.settings.DETERMINISM_FUNCTION(
+                node.step_profile
+            )
+            recomputable = determinism is not None and issubclass(
+                determinism,
+                garlicsim.misc.settings_constants.DETERMINISTIC
+            )
+        self.recomputable_step_profiles[key] = recomputable
+        return recomputable
+    
+    
+    def evict(self, node):
+        '''
+        Evict the state of `node`, if it may be evicted.
+        
+        Returns whether the state was evicted.
+        '''
+        with self.lock:
+            if not self.can_evict(node):
+                return False
+            if self.state_store is not None and node not in self.state_store:
+                self.state_store[node] = node._state
+            node._state = None
+            return True
+    
+    
+    def load_state(self, node):
+        '''
+        Load the evicted state of `node` back into memory, and return it.
+        
+        The state is taken from the state store, or recomputed by stepping from
+        the nearest ancestor which has its state.
+        '''
+        with self.lock:
+        
+            if node._state is not None:
+                # Another thread loaded it while we were waiting for the lock.
+                return node._state
+        
+            nodes_to_recompute = []
+            current_node = node
+            while current_node._state is None:
+                if self.state_store is not None and \
+                   current_node in self.state_store:
+                    self.__attach_state(current_node,
+                                        self.state_store[current_node])
+                    break
+                nodes_to_recompute.append(current_node)
+                current_node = current_node.parent
+                assert current_node is not None
+        
+            state = current_node._state
+            step_profile = step_iterator = None
+            for current_node in reversed(nodes_to_recompute):
+                if current_node.step_profile != step_profile:
+                    # We keep using the same step iterator for as long as the
+                    # step profile stays the same, (as it does along a block,)
+                    # which is cheaper than making one for every step.
+                    step_profile = current_node.step_profile
+                    simpack_grokker = \
+                        garlicsim.misc.SimpackGrokker.create_from_state(state)
+                    step_iterator = simpack_grokker.get_step_iterator(
+                        state,
+                        step_profile
+                    )
+                state = next(step_iterator)
+                self.__attach_state(current_node, state)
+        
+            return state
+    
+    
+    def __attach_state(self, node, state):
+        '''Put a loaded state back in its node.'''
+        node._state = state
+        self.state_loaded(node)
+
+
+class MaxStatesEvictionPolicy(BaseStateEvictionPolicy):
+    '''
+    Policy that keeps only a limited number of evictable states in memory.
+    
+    When there are more than `max_states` states that could be evicted, the
+    ones that were added or loaded back longest ago are evicted.
+    '''
+    
+    def __init__(self, max_states, state_store=None):
+        BaseStateEvictionPolicy.__init__(self, state_store=state_store)
+        
+        self.max_states = max_states
+        '''The maximal number of evictable states to keep in memory.'''
+        
+        self.kept_nodes = collections.OrderedDict()
+        '''
+        Nodes with evictable states in memory, from least to most recent.
+        '''
+    
+    
+    def node_added(self, node):
+        '''
+        Handle a node that was just added to the tree.
+        
+        The node is a leaf so it's not evictable, but its parent might have
+        just become evictable.
+        '''
+        parent = node.parent
+        with self.lock:
+            if parent is not None and self.can_evict(parent):
+                self.kept_nodes[parent] = None
+                self.__evict_extra_states()
+    
+    
+    def state_loaded(self, node):
+        '''Handle the evicted state of `node` being loaded back into memory.'''
+        self.kept_nodes[node] = None
+        self.kept_nodes.move_to_end(node)
+        self.__evict_extra_states()
+    
+    
+    def node_removed(self, node):
+        '''Forget about a node that was removed from the tree.'''
+        BaseStateEvictionPolicy.node_removed(self, node)
+        self.kept_nodes.pop(node, None)
+    
+    
+    def __evict_extra_states(self):
+        '''Evict least-recent states until there are at most `max_states`.'''
+        while len(self.kept_nodes) > self.max_states:
+            (node, _) = self.kept_nodes.popitem(last=False)
+            self.evict(node)
+
+
+class EveryNthStateEvictionPolicy(BaseStateEvictionPolicy):
+    '''
+    Policy that keeps only the state of every `n`th node on each timeline.
+    
+    This means that loading back a dropped state takes at most `n - 1` steps.
+    '''
+    
+    def __init__(self, n, state_store=None, n_reloaded_states=100):
+        BaseStateEvictionPolicy.__init__(self, state_store=state_store,
+                                         n_reloaded_states=n_reloaded_states)
+        
+        self.n = n
+        '''The distance between nodes whose states are kept.'''
+        
+        self.distances = {}
+        '''
+        Dict mapping from node to its distance from the last kept ancestor.
+        
+        A distance of 0 means the node's state is kept.
+        '''
+    
+    
+    def node_added(self, node):
+        '''
+        Handle a node that was just added to the tree.
+        
+        The node is a leaf so it's not evictable, but its parent may be
+        evicted now unless it's an `n`th node.
+        '''
+        parent = node.parent
+        if parent is None:
+            self.distances[node] = 0
+            return
+        
+        with self.lock:
+            parent_distance = self.distances.get(parent, 0)
+            if parent_distance != 0:
+                self.evict(parent)
+                if parent._state is not None:
+                    # The parent's state has to stay in memory, so we'll count
+                    # the distance from it.
+                    self.distances[parent] = parent_distance = 0
+            self.distances[node] = (parent_distance + 1) % self.n
+    
+    
+    def node_removed(self, node):
+        '''Forget about a node that was removed from the tree.'''
+        BaseStateEvictionPolicy.node_removed(self, node)
+        self.distances.pop(node, None)
+
+
+class CheckpointsEvictionPolicy(BaseStateEvictionPolicy):
+    '''
+    Policy that keeps only sparse checkpoints along deterministic blocks.
+    
+    On a block whose step profile is deterministic according to the simpack's
+    `DETERMINISM_FUNCTION`, only every `interval`th state is kept in memory.
+    The states in between are dropped, and are recomputed from the preceding
+    checkpoint when accessed, which takes at most `interval - 1` steps. All
+    other states are kept, so this cuts the memory taken by deterministic
+    simulations by a factor of `interval`.
+    
+    Unlike `EveryNthStateEvictionPolicy`, this policy uses the nodes' positions
+    in their blocks, so it doesn't need to keep any information per node.
+    '''
+    
+    def __init__(self, interval, n_reloaded_states=100):
+        BaseStateEvictionPolicy.__init__(self,
+                                         n_reloaded_states=n_reloaded_states)
+        
+        self.interval = interval
+        '''The distance between checkpoints on a block.'''
+        
+    
+    def node_added(self, node):
+        '''
+        Handle a node that was just added to the tree.
+        
+        The node is a leaf so it's not evictable, but its parent is dropped now
+        unless it's a checkpoint.
+        '''
+        parent = node.parent
+        if parent is None or parent.block is None:
+            return
+        with self.lock:
+            if parent._block_ordinal % self.interval != 0:
+                self.evict(parent)
+    
+    
+class ForkPointsEvictionPolicy(BaseStateEvictionPolicy):
+    '''
+    Policy that keeps only the states of roots, forks, leaves and touched nodes.
+    '''
+    
+    def node_added(self, node):
+        '''
+        Handle a node that was just added to the tree.
+        
+        The node's parent is evicted, unless this made it into a fork.
+        '''
+        parent = node.parent
+        if parent is None:
+            return
+        with self.lock:
+            if len(parent.children) == 1:
+                self.evict(parent)
+            else: # len(parent.children) >= 2
+                # The parent is a fork now, so we're keeping its state:
+                parent.state
+                self.reloaded_nodes.pop(parent, None)
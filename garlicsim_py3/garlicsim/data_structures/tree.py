@@ -20,6 +20,7 @@ from garlicsim.misc import GarlicSimException
 # `from .node import Node`
 # `from .block import Block`
 # `from .end import End`
+# `from .cycle import Cycle`
 
 
 __all__ = ['Tree', 'TreeError']
@@ -48,13 +49,29 @@ class Tree(object):
     Each node in the tree may have a parent, or may not, in which case it will
     also be called a root and be a member of `.roots`.
     '''
+    
+    add_states_chunk_size = 100
+    '''
+    The number of nodes that `.add_states` puts in a block in one go.
+    
+    The state eviction policy gets to evict the states of these nodes only
+    after they're put in the block, so this also limits how many extra states
+    might be kept in memory.
+    '''
+    
+    
     def __init__(self):
         
-        self.nodes = []
-        '''List of nodes that belong to the tree.'''
+        self.nodes = NodeStore()
+        '''
+        The nodes that belong to the tree, in the order they were added.
+        
+        This is a `NodeStore`, which is like a list, but can remove a node in
+        O(1) time.
+        '''
         
-        self.roots = []
-        '''List of roots (parentless nodes) of the tree.'''
+        self.roots = NodeStore()
+        '''The roots (parentless nodes) of the tree, in a `NodeStore`.'''
         
         self.lock = garlicsim.general_misc.read_write_lock.ReadWriteLock()
         '''
@@ -64,8 +81,83 @@ class Tree(object):
         require reading from the tree in the same time that `.sync_crunchers`
         could potentially be writing to it.
         '''
+        
+        self._structure_version = 0
+        '''
+        Number that gets increased every time the structure of the tree changes.
+        
+        Paths use this to know when the segments they have cached might no
+        longer be correct. Adding a node to a leaf doesn't count as a change in
+        structure, because paths know how to extend their cached segments when
+        that happens.
+        '''
+        
+        self.leaves = NodeStore()
+        '''
+        The leaves of the tree, i.e. the nodes that have no children.
+        
+        This is kept up to date when nodes are added and removed; Don't change
+        it yourself.
+        '''
+        
+        self._nodes_with_changed_ancestry = []
+        '''
+        Nodes whose ancestry changed, and whose descendants weren't indexed.
+        
+        When nodes become roots, the depths and jump pointers of all their
+        descendants change. There may be many of them, and nobody may need
+        them, so they're indexed only when a node looks up its ancestors. See
+        `._index_changed_ancestry`.
+        '''
+        
+        self.forks = {}
+        '''
+        Dict mapping every fork in the tree to its clock.
+        
+        A fork is a node with more than one child. The clock is kept here so
+        that searching the tree doesn't need to load the fork's state if it was
+        evicted. This is kept up to date when nodes are added and removed;
+        Don't change it yourself.
+        '''
+        
+        self._past_decisions = {}
+        '''
+        Cache of the decisions that lead from the roots to nodes.
+        
+        This maps the first node of a block, or a blockless node, to a tuple
+        `(root, decision_chain)`. `decision_chain` holds the decisions at the
+        forks between the root and the node, as a linked list of `(fork, kid,
+        rest_of_chain)` tuples ending with `None`. The chains of nodes share
+        their tails with the chains of their ancestors. The cache is cleared
+        when the structure of the tree changes. See `._get_past_decisions`.
+        '''
+        
+        self._past_decisions_version = 0
+        '''The `._structure_version` for which `._past_decisions` is valid.'''
+        
+        self.state_eviction_policy = None
+        '''
+        The policy for evicting states of nodes from memory, if any.
+        
+        Use `.set_state_eviction_policy` to set this. See documentation of
+        `garlicsim.data_structures.state_eviction` for more info.
+        '''
 
         
+    def set_state_eviction_policy(self, state_eviction_policy):
+        '''
+        Set the policy for evicting states of nodes from memory.
+        
+        `state_eviction_policy` may be `None` to keep all states in memory.
+        When replacing an existing policy, all the states that it evicted are
+        loaded back first.
+        '''
+        if self.state_eviction_policy is not None:
+            for node in self.nodes:
+                node.state
+        self.state_eviction_policy = state_eviction_policy
+        
+        
     def fork_to_edit(self, template_node):
         '''
         "Duplicate" the node, marking the new one as touched.
@@ -108,9 +200,162 @@ class Tree(object):
         )
         
         self.__add_node(my_node, parent, template_node)
+        if self.state_eviction_policy is not None:
+            self.state_eviction_policy.node_added(my_node)
         return my_node
 
 
+    def add_states(self, states, parent, step_profile):
+        '''
+        Wrap consecutive states in nodes and add them to the tree.
+        
+        `states` is an iterable of states that were crunched one after another
+        from the state of `parent`, using `step_profile`. This is like calling
+        `.add_state` for each of them, only faster: The nodes share one copy of
+        the step profile, and they're put in their block in bulk.
+        
+        `states` may be an iterator that crunches the states while it's being
+        consumed. If it raises an exception, the nodes that were added until
+        then stay in the tree.
+        
+        Returns the last node that was added, or `parent` if there were no
+        states.
+        '''
+        assert parent is not None
+        step_profile = copy.copy(step_profile)
+        state_eviction_policy = self.state_eviction_policy
+        
+        iterator = iter(states)
+        for first_state in iterator:
+            break
+        else:
+            return parent
+        
+        # The first node is added normally, because it might fork the tree or
+        # join its parent's block:
+        first_node = Node(self, first_state, step_profile=step_profile)
+        self.__add_node(first_node, parent)
+        if state_eviction_policy is not None:
+            state_eviction_policy.node_added(first_node)
+        
+        # The rest of the nodes are simply chained to it, and put in the block
+        # in chunks. (The state eviction policy is told about the nodes only
+        # after they're in the block, because it may look at their blocks.)
+        block = first_node.block
+        new_nodes = [] if block is not None else [first_node]
+        current_node = first_node
+        current_state = first_state
+        try:
+            for state in iterator:
+                if not hasattr(state, 'clock'):
+                    state.clock = current_state.clock + 1
+                node = Node(self, state, parent=current_node,
+                            step_profile=step_profile)
+                current_node.add_child(node)
+                self.nodes.append(node)
+                new_nodes.append(node)
+                current_node = node
+                current_state = state
+                if len(new_nodes) >= self.add_states_chunk_size:
+                    block = self.__add_to_block(block, new_nodes)
+                    new_nodes = []
+        finally:
+            self.__add_to_block(block, new_nodes)
+            if current_node is not first_node:
+                self.leaves.remove(first_node)
+                self.leaves.append(current_node)
+            
+        return current_node
+    
+    
+    def __add_to_block(self, block, new_nodes):
+        '''
+        Add nodes that were just created by `.add_states` to a block.
+        
+        If `block` is `None`, a new block is created. Returns the block.
+        '''
+        if block is None:
+            if len(new_nodes) < 2:
+                return None
+            block = Block([])
+            nodes_to_notify = new_nodes[1:]
+        else:
+            nodes_to_notify = new_nodes
+        block.add_node_list(new_nodes, validate=False)
+        if self.state_eviction_policy is not None:
+            for node in nodes_to_notify:
+                self.state_eviction_policy.node_added(node)
+        return block
+    
+    
+    def _get_past_decisions(self, node):
+        '''
+        Get the root of `node` and the decisions that lead to it from there.
+        
+        Returns `(root, decision_chain)`; See `._past_decisions` for what the
+        decision chain looks like. We go up from `node` only until we reach a
+        part of the tree whose decisions are cached, so the cost of this is
+        usually just the number of forks that we're returning.
+        '''
+        past_decisions = self._past_decisions
+        if self._past_decisions_version != self._structure_version:
+            past_decisions.clear()
+            self._past_decisions_version = self._structure_version
+        
+        heads_to_cache = []
+        current = node
+        while True:
+            if current.block is not None:
+                current = current.block[0]
+            if current in past_decisions:
+                (root, decision_chain) = past_decisions[current]
+                break
+            parent = current.parent
+            if parent is None:
+                (root, decision_chain) = past_decisions[current] = \
+                    (current, None)
+                break
+            heads_to_cache.append(current)
+            current = parent
+        
+        for head in reversed(heads_to_cache):
+            parent = head.parent
+            if len(parent.children) > 1:
+                decision_chain = (parent, head, decision_chain)
+            past_decisions[head] = (root, decision_chain)
+        
+        return (root, decision_chain)
+    
+    
+    def __index_ancestry(self, nodes):
+        '''
+        Index the depths and jump pointers of `nodes` and their descendents.
+        
+        This is needed when the nodes' ancestry changes, like when they become
+        roots. See `Node._index_ancestry`.
+        '''
+        nodes_to_index = list(nodes)
+        while nodes_to_index:
+            node = nodes_to_index.pop()
+            node._index_ancestry()
+            nodes_to_index.extend(node.children)
+    
+    
+    def _index_changed_ancestry(self):
+        '''
+        Index the nodes whose ancestry changed since they were last indexed.
+        
+        Nodes call this before they look up their ancestors. Until then, nodes
+        that are added under them may be indexed wrongly too, but they're
+        indexed again here with the rest.
+        '''
+        if self._nodes_with_changed_ancestry:
+            nodes = [node for node in self._nodes_with_changed_ancestry
+                     if node in self.nodes]
+            self._nodes_with_changed_ancestry = []
+            self.__index_ancestry(nodes)
+    
+    
     def __add_node(self, node, parent=None, template_node=None):
         '''
         Add a node to the tree.
@@ -127,7 +372,7 @@ class Tree(object):
             if not node.touched:
                 raise TreeError("You tried adding an untouched state to a "
                                 "tree while specifying a `template_node`.")
-            template_node.derived_nodes.append(node)
+            template_node.add_derived_node(node)
             
 
         self.nodes.append(node)
@@ -137,7 +382,18 @@ class Tree(object):
                 node.state.clock = parent.state.clock + 1
 
             node.parent = parent
-            parent.children.append(node)
+            node._index_ancestry()
+            parent.add_child(node)
+            
+            if len(parent.children) >= 2:
+                # We're forking the tree, not just growing it from a leaf.
+                # (Paths know how to handle growth from a leaf themselves.)
+                self._structure_version += 1
+                if parent not in self.forks:
+                    self.forks[parent] = parent.state.clock
+            else:
+                self.leaves.remove(parent)
+            self.leaves.append(node)
             
             if parent.block:
                 
@@ -168,6 +424,7 @@ class Tree(object):
             if not hasattr(node.state, "clock"):
                 node.state.clock = 0
             self.roots.append(node)
+            self.leaves.append(node)
             return node
 
     
@@ -178,15 +435,73 @@ class Tree(object):
         Must specify a step profile with which this end was reached.
         '''
         end = End(self, node, step_profile)
+        self._structure_version += 1
         return end
     
+    
+    def make_cycle(self, node, step_profile, period):
+        '''
+        Create a cycle after the specified node.
+        
+        This marks that the simulation, crunched with the given step profile,
+        repeats itself after `node`, with the given period in steps.
+        '''
+        cycle = Cycle(self, node, step_profile, period)
+        self._structure_version += 1
+        return cycle
+    
 
     def all_possible_paths(self):
         '''Return all the possible paths this tree may entertain.'''
-        result = []
+        return list(self.iterate_possible_paths())
+    
+    
+    def iterate_possible_paths(self):
+        '''Iterate over all the possible paths this tree may entertain.'''
         for root in self.roots:
-            result += root.all_possible_paths()
-        return result
+            for path in root.iterate_possible_paths():
+                yield path
+    
+    
+    def count_possible_paths(self):
+        '''
+        Get the number of possible paths this tree may entertain.
+        
+        There's one path for every leaf, so this is just the number of leaves.
+        '''
+        return len(self.leaves)
+    
+    
+    def get_leaves(self, node, max_clock=None):
+        '''
+        Get the leaves that are descendents of `node`, (or `node` itself.)
+        
+        If `max_clock` is specified, only leaves with a clock reading of at
+        most `max_clock` are returned.
+        
+        This goes over the tree blockwise, and skips over the parts of the tree
+        that are after a fork whose clock is bigger than `max_clock`, without
+        loading any evicted states.
+        '''
+        leaves = []
+        members_to_explore = [node]
+        while members_to_explore:
+            member = members_to_explore.pop()
+            while True:
+                if member.block is not None:
+                    member = member.block[-1]
+                children = member.children
+                if len(children) != 1:
+                    break
+                member = children[0]
+            
+            if not children:
+                if max_clock is None or member.state.clock <= max_clock:
+                    leaves.append(member)
+            elif max_clock is None or self.forks[member] <= max_clock:
+                members_to_explore.extend(reversed(children))
+                
+        return leaves
 
 
     def get_step_profiles(self):
@@ -212,7 +527,7 @@ class Tree(object):
         `include_blockful_nodes=False` to exclude them. (Their block will be
         included.)
         '''
-        members_to_explore = self.roots[:]
+        members_to_explore = list(self.roots)
         while members_to_explore:
             member = members_to_explore.pop()
             yield member
@@ -229,8 +544,9 @@ class Tree(object):
                 children = member.children
                 ends = member.ends
             
-            members_to_explore += [kid.soft_get_block() for kid in children]
-            members_to_explore += ends
+            for kid in children:
+                members_to_explore.append(kid.block or kid)
+            members_to_explore.extend(ends)
         
         
     
@@ -264,6 +580,8 @@ class Tree(object):
         # stitched to the new parent, but I'm currently forcing it to be
         # `False` because I haven't decided yet how I will handle stitching.
         
+        self._structure_version += 1
+        
         head_node = node_range.head if isinstance(node_range.head, Node) \
                      else node_range.head[0]
         
@@ -275,16 +593,30 @@ class Tree(object):
                         
         big_parent = head_node.parent
         if big_parent is not None:
-            big_parent.children.remove(head_node)
+            big_parent.remove_child(head_node)
         
         outside_children = node_range.get_outside_children()
+        
+        range_nodes = list(node_range)
             
-        for node in node_range:
+        for node in range_nodes:
             self.nodes.remove(node)
+            if self.state_eviction_policy is not None:
+                self.state_eviction_policy.node_removed(node)
+        
+        for node in range_nodes:
+            if node in self.leaves:
+                self.leaves.remove(node)
+            self.forks.pop(node, None)
+        if big_parent is not None:
+            if len(big_parent.children) <= 1:
+                self.forks.pop(big_parent, None)
+            if not big_parent.children:
+                self.leaves.append(big_parent)
 
         current_block = None
         last_block_change = None
-        for node in node_range:
+        for node in range_nodes:
             if node.block is not current_block:
                 if current_block is not None:
                     del current_block[current_block.index(last_block_change) :
@@ -298,9 +630,14 @@ class Tree(object):
                     
         parent_to_use = big_parent if (stitch is True) else None
         for node in outside_children:
+            if parent_to_use is None:
+                node.state
+                # The orphaned node's state must be in memory, since it can't
+                # be recomputed from its parent anymore.
             node.parent = parent_to_use
             if parent_to_use is None:
                 self.roots.append(node)
+        self._nodes_with_changed_ancestry.extend(outside_children)
         
     
     
@@ -326,7 +663,7 @@ class Tree(object):
                    address_tools.describe(type(self), shorten=True),
                    len(self.roots),
                    len(self.nodes),
-                   len(self.all_possible_paths()),
+                   self.count_possible_paths(),
                    hex(id(self))
                )
     
@@ -334,16 +671,35 @@ class Tree(object):
     def __getstate__(self):
         my_dict = dict(self.__dict__)
         del my_dict['lock']
+        del my_dict['state_eviction_policy']
+        del my_dict['_past_decisions'], my_dict['_past_decisions_version']
+        # Nodes pickle their states even if they were evicted, so the unpickled
+        # tree doesn't need the policy.
         return my_dict
     
     
     def __setstate__(self, pickled_tree_state):
         self.__init__()
         self.__dict__.update(pickled_tree_state)
+        # Trees that were pickled before `NodeStore` was used have lists:
+        for name in ('nodes', 'roots'):
+            if isinstance(getattr(self, name), list):
+                setattr(self, name, NodeStore(getattr(self, name)))
+        if 'leaves' not in pickled_tree_state:
+            # This tree was pickled before leaves and forks were indexed, and
+            # before nodes kept their depths.
+            self.__index_ancestry(self.roots)
+            for node in self.nodes:
+                if not node.children:
+                    self.leaves.append(node)
+                elif len(node.children) >= 2:
+                    self.forks[node] = node.state.clock
         
         
     
 from .node import Node
+from .node_store import NodeStore
 from .block import Block
 from .end import End
+from .cycle import Cycle
 
@@ -17,6 +17,8 @@ class TreeMember(object, metaclass=abc.ABCMeta):
     This is an abstract base class for all kinds of objects that are members of
     a tree.
     '''
+    
+    __slots__ = ()
   
     @abc.abstractmethod
     def __len__(self):
@@ -61,6 +63,15 @@ class TreeMember(object, metaclass=abc.ABCMeta):
         '''
     
     
+    @abc.abstractmethod
+    def iterate_possible_paths(self):
+        '''
+        Iterate over all possible paths that contain this tree member.
+        
+        This is the lazy version of `.all_possible_paths`.
+        '''
+    
+    
     @abc.abstractmethod
     def make_past_path(self):
         '''
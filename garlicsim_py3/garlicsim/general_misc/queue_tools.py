@@ -25,12 +25,15 @@ def dump(queue):
 
 
 def iterate(queue, block=False, limit_to_original_size=False,
-            _prefetch_if_no_qsize=False):
+            _prefetch_if_no_qsize=False, timeout=None):
     '''
     Iterate over the items in the queue.
     
     `limit_to_original_size=True` will limit the number of the items fetched to
     the original number of items in the queue in the beginning.
+    
+    If `block=True`, `timeout` is the number of seconds to wait for each item
+    before stopping. `None` means waiting forever.
     '''
     if limit_to_original_size:
         
@@ -50,13 +53,13 @@ def iterate(queue, block=False, limit_to_original_size=False,
             )
         for i in range(queue.qsize()):
             try:
-                yield queue.get(block=block)
+                yield queue.get(block=block, timeout=timeout)
             except queue_module.Empty:
                 raise StopIteration
     else: # not limit_to_original_size
         while True:
             try:
-                yield queue.get(block=block)
+                yield queue.get(block=block, timeout=timeout)
             except queue_module.Empty:
                 raise StopIteration
 
@@ -12,7 +12,8 @@ namespace.
 
 from . import state_deepcopy
 from .exceptions import (InvalidSimpack, SimpackError, GarlicSimWarning,
-                         GarlicSimException, WorldEnded)
+                         GarlicSimException, WorldEnded,
+                         OutOfHistoryWindowError)
 from .auto_clock_generator import AutoClockGenerator
 from .base_history_browser import BaseHistoryBrowser
 from .base_step_iterator import BaseStepIterator
@@ -22,4 +23,5 @@ from .nodes_added import NodesAdded
 from .simpack_grokker import SimpackGrokker
 from . import caching
 from . import settings_constants
+from .cycle_detector import CycleDetector, create_cycle_detector
 from . import simpack_tools
@@ -10,6 +10,8 @@ See its documentation for more info.
 import abc
 from garlicsim.general_misc import binary_search
 
+from .exceptions import OutOfHistoryWindowError
+
 
 __all__ = ['BaseHistoryBrowser']
 
@@ -28,6 +30,13 @@ class BaseHistoryBrowser(object, metaclass=abc.ABCMeta):
     subclass.
     '''
     
+    history_window = None
+    '''
+    The number of latest states that may be requested, or `None` for all.
+    
+    See documentation of the `HISTORY_WINDOW` simpack setting.
+    '''
+    
     @abc.abstractmethod
     def get_last_state(self):
         '''
@@ -71,3 +80,38 @@ class BaseHistoryBrowser(object, metaclass=abc.ABCMeta):
                (function=get_state_clock, value=clock, rounding=rounding)
     
     
+    def _check_index_in_window(self, index):
+        '''
+        Make sure that position `index` in the timeline is in the window.
+        
+        Raises `OutOfHistoryWindowError` if it isn't. Indices that are out of
+        the timeline's range altogether are left for the caller to handle.
+        '''
+        if self.history_window is None:
+            return
+        length = len(self)
+        positive_index = index if index >= 0 else index + length
+        if 0 <= positive_index < length - self.history_window:
+            raise OutOfHistoryWindowError(
+                'You asked for state number %s, but the history window allows '
+                'only the last %s states of the %s states in the timeline.' %
+                (index, self.history_window, length)
+            )
+    
+        
+    def _check_value_in_window(self, function, value):
+        '''
+        Make sure that searching for `value` won't go back beyond the window.
+        
+        Raises `OutOfHistoryWindowError` if `value` is lower than what
+        `function` gives for the first state in the window.
+        '''
+        if self.history_window is None or len(self) <= self.history_window:
+            return
+        first_state_in_window = self[-self.history_window]
+        if value < function(first_state_in_window):
+            raise OutOfHistoryWindowError(
+                'You searched for a state with value %s, which is before the '
+                'history window that starts at value %s.' %
+                (value, function(first_state_in_window))
+            )
@@ -0,0 +1,127 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''
+This module defines the `CycleDetector` class.
+
+See its documentation for more info.
+'''
+
+from . import settings_constants
+
+
+__all__ = ['CycleDetector', 'create_cycle_detector']
+
+
+def create_cycle_detector(simpack_grokker, step_profile):
+    '''
+    Create a cycle detector for crunching with `step_profile`.
+
+    Cycles can only be detected when the simpack is not history-dependent,
+    gives a `STATE_FINGERPRINT_FUNCTION`, and its `DETERMINISM_FUNCTION` says
+    that `step_profile` is `DETERMINISTIC`. If that's not the case, returns
+    `None`.
+    '''
+    fingerprint_function = simpack_grokker.settings.STATE_FINGERPRINT_FUNCTION
+    if simpack_grokker.history_dependent or fingerprint_function is None:
+        return None
+    determinism = simpack_grokker.settings.DETERMINISM_FUNCTION(step_profile)
+    if determinism is None or \
+       not issubclass(determinism, settings_constants.DETERMINISTIC):
+        return None
+    return CycleDetector(fingerprint_function)
+
+
+class CycleDetector(object):
+    '''
+    Device for detecting that a deterministic simulation repeats itself.
+    
+    Give it the states of the simulation one by one by calling `.check`. If the
+    simulation reaches a state that's identical, apart from the clock, to a
+    state it had before, then (since the simulation is deterministic) it will
+    just repeat the same cycle of states forever. `.check` will then return
+    `True` and the period of the cycle will be available as `.period`.
+    
+    States are compared by the fingerprints that `fingerprint_function` gives
+    for them; See the `STATE_FINGERPRINT_FUNCTION` simpack setting. If the
+    fingerprint function fails, the detector stops checking and never reports
+    a cycle.
+    
+    This uses Brent's algorithm: Each state is compared only to one checkpoint
+    state, which is moved forward after 1, 2, 4, ... steps, up to `max_period`
+    steps. This takes constant memory, and finds any cycle with a period of at
+    most `max_period` not long after the simulation enters it.
+    '''
+    
+    def __init__(self, fingerprint_function, max_period=256):
+        
+        self.fingerprint_function = fingerprint_function
+        '''
+        Function that takes a state and gives a fingerprint of it.
+        
+        This is set to `None` if it fails, and then we stop checking.
+        '''
+        
+        self.max_period = max_period
+        '''The longest period of a cycle that will be detected.'''
+        
+        self.power = 1
+        '''The number of steps after which the checkpoint will be moved.'''
+        
+        self.checkpoint_fingerprint = None
+        '''The fingerprint of the checkpoint state.'''
+        
+        self.checkpoint_clock = None
+        '''The clock reading of the checkpoint state.'''
+        
+        self.n_steps_since_checkpoint = 0
+        '''The number of states checked since the checkpoint state.'''
+        
+        self.period = None
+        '''
+        The period of the detected cycle, in steps.
+        
+        This is `None` until a cycle is detected.
+        '''
+        
+        self.clock_period = None
+        '''
+        The period of the detected cycle, in clock units.
+        
+        This is `None` until a cycle is detected.
+        '''
+    
+    
+    def check(self, state):
+        '''
+        Check the next state of the simulation.
+        
+        Returns whether the state completes a cycle.
+        '''
+        if self.fingerprint_function is None:
+            return False
+        
+        try:
+            fingerprint = self.fingerprint_function(state)
+            is_repeating = (self.checkpoint_clock is not None) and \
+                           bool(fingerprint == self.checkpoint_fingerprint)
+        except Exception:
+            # We can't tell whether states repeat, so we stop checking.
+            self.fingerprint_function = None
+            self.checkpoint_fingerprint = None
+            return False
+        
+        self.n_steps_since_checkpoint += 1
+        
+        if is_repeating:
+            self.period = self.n_steps_since_checkpoint
+            self.clock_period = state.clock - self.checkpoint_clock
+            return True
+        
+        if self.n_steps_since_checkpoint >= self.power:
+            self.checkpoint_fingerprint = fingerprint
+            self.checkpoint_clock = state.clock
+            self.n_steps_since_checkpoint = 0
+            self.power = min(2 * self.power, self.max_period)
+        
+        return False
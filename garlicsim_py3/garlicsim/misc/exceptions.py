@@ -22,5 +22,8 @@ class SimpackError(GarlicSimException):
 class WorldEnded(GarlicSimException):
     '''The simulation has ended.'''
 
+class OutOfHistoryWindowError(GarlicSimException, IndexError):
+    '''A state was requested from beyond the simpack's `HISTORY_WINDOW`.'''
+
     
 del CuteException
\ No newline at end of file
@@ -37,7 +37,9 @@ class Settings(object):
         
         This is useful because it allows `garlicsim` to detect if a simulation
         has reached a repititive state, so it can stop the crunching right
-        there and avoid wasting resources.
+        there and avoid wasting resources. This is done only if the simpack
+        also gives a `STATE_FINGERPRINT_FUNCTION`; See its documentation for
+        what's assumed about the step function.
 
         Note that this function does not return `True` or `False`: It returns a
         `DeterminismSetting` class. For details about those, see documentation
@@ -47,6 +49,26 @@ class Settings(object):
         profile is deterministic.
         '''
 
+        self.STATE_FINGERPRINT_FUNCTION = None
+        '''
+        Function that takes a state and gives a fingerprint of it, or `None`.
+        
+        Fingerprints are compared with `==`, and two states with equal
+        fingerprints are considered identical. The fingerprint must ignore the
+        clock, and the step function must not depend on the clock either, or
+        else repeating simulations would be detected where there are none.
+        
+        When this is given and the `DETERMINISM_FUNCTION` says the step
+        profile is deterministic, `garlicsim` checks whether the simulation
+        reached a state identical to an earlier one. If it did, the simulation
+        will just repeat itself, so crunching stops and the timeline is ended
+        with a `Cycle`. If it's `None`, which is the default, repeating
+        simulations aren't detected.
+        
+        If the fingerprint function raises an exception, we stop checking for
+        repeats in that simulation rather than crashing.
+        '''
+        
         self.SCALAR_STATE_FUNCTIONS = []
         '''
         List of scalar state functions given by the simpack.
@@ -63,4 +85,17 @@ class Settings(object):
         A scalar history function is a function from a history browser to a
         real number. These should be decorated by
         `garlicsim.misc.cached.history_cache`.
-        '''
\ No newline at end of file
+        '''
+        
+        self.HISTORY_WINDOW = None
+        '''
+        How many of the latest states a history step function may look at.
+        
+        This is relevant only to history-dependent simpacks. If it's `None`,
+        the step function may look at the entire timeline. If it's a number
+        `n`, the step function promises to look only at the last `n` states of
+        the timeline, which lets `simulate` and `iter_simulate` keep only those
+        states in memory rather than the whole timeline. History browsers will
+        raise `OutOfHistoryWindowError` if asked for a state from before the
+        window.
+        '''
@@ -12,5 +12,7 @@ from .simulate import simulate
 from .list_simulate import list_simulate
 from .iter_simulate import iter_simulate
 from .history_browser import HistoryBrowser
+from .window_history_browser import WindowHistoryBrowser
 
-__all__ = ['simulate', 'list_simulate', 'list_simulate', 'HistoryBrowser']
\ No newline at end of file
+__all__ = ['simulate', 'list_simulate', 'list_simulate', 'HistoryBrowser',
+           'WindowHistoryBrowser']
\ No newline at end of file
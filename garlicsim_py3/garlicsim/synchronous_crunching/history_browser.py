@@ -33,7 +33,7 @@ class HistoryBrowser(garlicsim.misc.BaseHistoryBrowser):
     constructor and it handles all state requests from that path.
     '''
     
-    def __init__(self, path, tail_node=None):
+    def __init__(self, path, tail_node=None, history_window=None):
         #todo: maybe not require path, just calculate from node?
         self.path = path
         '''
@@ -52,6 +52,13 @@ class HistoryBrowser(garlicsim.misc.BaseHistoryBrowser):
         because you've added a node to the tree, and that node should now be
         the `.tail_node`.)
         '''
+        
+        self.history_window = history_window
+        '''
+        The number of latest states that may be requested, or `None` for all.
+        
+        See documentation of the `HISTORY_WINDOW` simpack setting.
+        '''
      
         
     def get_last_state(self):
@@ -62,6 +69,7 @@ class HistoryBrowser(garlicsim.misc.BaseHistoryBrowser):
     def __getitem__(self, index):
         '''Get a state by its position in the timeline.'''
         assert isinstance(index, int)
+        self._check_index_in_window(index)
         return self.path.__getitem__(index, tail=self.tail_node).state
 
     
@@ -76,6 +84,7 @@ class HistoryBrowser(garlicsim.misc.BaseHistoryBrowser):
         rounding options.
         '''
         assert issubclass(rounding, binary_search.Rounding)
+        self._check_value_in_window(function, value)
         
         new_function = lambda node: function(node.state)
         result_in_nodes = self.path.get_node_by_monotonic_function(
@@ -14,6 +14,7 @@ from garlicsim.general_misc import cute_iter_tools
 import garlicsim
 import garlicsim.misc
 from . import history_browser as history_browser_module # Avoiding name clash
+from . import window_history_browser
 
 
 __all__ = ['iter_simulate']
@@ -45,6 +46,9 @@ def iter_simulate(state, iterations, *args, **kwargs):
         state.clock = 0
                       
     if simpack_grokker.history_dependent:
+        if simpack_grokker.settings.HISTORY_WINDOW is not None:
+            return _window_history_iter_simulate(simpack_grokker, state,
+                                                 iterations, step_profile)
         return _history_iter_simulate(simpack_grokker, state, iterations,
                                       step_profile)
     else: # It's a non-history-dependent simpack
@@ -88,6 +92,37 @@ def _history_iter_simulate(simpack_grokker, state, iterations, step_profile):
     raise StopIteration
     
 
+def _window_history_iter_simulate(simpack_grokker, state, iterations,
+                                  step_profile):
+    '''
+    Simulate from the given state for the given number of iterations.
+    
+    (Internal function for history-dependent simulations with a
+    `HISTORY_WINDOW` only.)
+
+    This returns a generator that yields all the states one-by-one, from the
+    initial state to the final one. Only the states in the history window are
+    kept in memory, so this takes constant memory regardless of `iterations`.
+    '''
+    
+    history_browser = window_history_browser.WindowHistoryBrowser(
+        simpack_grokker.settings.HISTORY_WINDOW,
+        state
+    )
+    
+    iterator = simpack_grokker.get_step_iterator(history_browser, step_profile)
+    finite_iterator = cute_iter_tools.shorten(iterator, iterations)
+    
+    yield state
+    
+    try:
+        for current_state in finite_iterator:
+            yield current_state
+            history_browser.add_state(current_state)
+    except garlicsim.misc.WorldEnded:
+        pass
+    
+
 def _non_history_iter_simulate(simpack_grokker, state, iterations,
                                step_profile):
     '''
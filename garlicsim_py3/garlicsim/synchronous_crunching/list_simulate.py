@@ -64,7 +64,10 @@ def _history_list_simulate(simpack_grokker, state, iterations,
     tree = garlicsim.data_structures.Tree()
     root = tree.add_state(state, parent=None)
     path = root.make_containing_path()
-    history_browser = history_browser_module.HistoryBrowser(path)
+    history_browser = history_browser_module.HistoryBrowser(
+        path,
+        history_window=simpack_grokker.settings.HISTORY_WINDOW
+    )
     
     iterator = simpack_grokker.get_step_iterator(history_browser, step_profile)
     finite_iterator = cute_iter_tools.shorten(iterator, iterations)
@@ -105,14 +108,39 @@ def _non_history_list_simulate(simpack_grokker, state, iterations,
     current_node = root
     current_state = current_node.state
     
+    cycle_detector = garlicsim.misc.create_cycle_detector(simpack_grokker,
+                                                          step_profile)
+    if cycle_detector:
+        cycle_detector.check(state)
+    
+    n_steps = 0
     world_ended = False
     try:
         for current_state in finite_iterator:
             current_node = tree.add_state(current_state, parent=current_node)
+            n_steps += 1
+            if cycle_detector and cycle_detector.check(current_state):
+                break
     except garlicsim.misc.WorldEnded:
         world_ended = True
 
     # Not doing anything with `world_ended` yet
     
-    return [node.state for node in path]
+    states = [node.state for node in path]
+    
+    if cycle_detector and cycle_detector.period is not None:
+        # The simulation repeats itself from here on, so instead of crunching
+        # the remaining states we copy them from the last cycle, advancing
+        # their clocks.
+        period = cycle_detector.period
+        cycle_states = states[-period:]
+        for i in range(iterations - n_steps):
+            (n_cycles, index) = divmod(i, period)
+            new_state = garlicsim.misc.state_deepcopy.state_deepcopy(
+                cycle_states[index]
+            )
+            new_state.clock += (n_cycles + 1) * cycle_detector.clock_period
+            states.append(new_state)
+    
+    return states
 
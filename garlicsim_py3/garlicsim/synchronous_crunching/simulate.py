@@ -15,6 +15,7 @@ from garlicsim.general_misc import cute_iter_tools
 import garlicsim
 import garlicsim.misc
 from . import history_browser as history_browser_module # Avoiding name clash
+from . import window_history_browser
 
 __all__ = ['simulate']
 
@@ -44,6 +45,9 @@ def simulate(state, iterations=1, *args, **kwargs):
         state.clock = 0
     
     if simpack_grokker.history_dependent:
+        if simpack_grokker.settings.HISTORY_WINDOW is not None:
+            return __window_history_simulate(simpack_grokker, state,
+                                             iterations, step_profile)
         return __history_simulate(simpack_grokker, state, iterations,
                                   step_profile)
     else: # It's a non-history-dependent simpack
@@ -83,6 +87,42 @@ def __history_simulate(simpack_grokker, state, iterations, step_profile):
     return final_state
 
 
+def __window_history_simulate(simpack_grokker, state, iterations,
+                              step_profile):
+    '''
+    Simulate from the given state for the given number of iterations.
+    
+    (Internal function, for history-dependent simulations with a
+    `HISTORY_WINDOW` only.)
+    
+    Only the states in the history window are kept in memory, so this takes
+    constant memory regardless of `iterations`.
+    
+    Returns the final state of the simulation.
+    '''
+    
+    history_browser = window_history_browser.WindowHistoryBrowser(
+        simpack_grokker.settings.HISTORY_WINDOW,
+        state
+    )
+    
+    iterator = simpack_grokker.get_step_iterator(history_browser, step_profile)
+    finite_iterator = cute_iter_tools.shorten(iterator, iterations)
+    
+    current_state = state
+    
+    try:
+        for current_state in finite_iterator:
+            history_browser.add_state(current_state)
+    except garlicsim.misc.WorldEnded:
+        pass
+        
+    final_state = current_state
+    # Which is still here as the last value from the `for` loop.
+    
+    return final_state
+
+
 def __non_history_simulate(simpack_grokker, state, iterations, step_profile):
     '''
     Simulate from the given state for the given number of iterations.
@@ -109,9 +149,25 @@ def __non_history_simulate(simpack_grokker, state, iterations, step_profile):
     finite_iterator = cute_iter_tools.shorten(iterator, iterations)
     current_state = state
     
+    cycle_detector = garlicsim.misc.create_cycle_detector(simpack_grokker,
+                                                          step_profile)
+    if cycle_detector:
+        cycle_detector.check(state)
+    
     try:
-        for current_state in finite_iterator:
-            pass
+        for (n_steps, current_state) in enumerate(finite_iterator, 1):
+            if cycle_detector and cycle_detector.check(current_state):
+                # From now on the simulation just repeats itself. So instead of
+                # crunching all the remaining cycles, we crunch only the steps
+                # that are left over after them, and advance the clock by the
+                # time that they would have taken.
+                (n_cycles, n_leftover_steps) = divmod(iterations - n_steps,
+                                                      cycle_detector.period)
+                for current_state in cute_iter_tools.shorten(finite_iterator,
+                                                             n_leftover_steps):
+                    pass
+                current_state.clock += n_cycles * cycle_detector.clock_period
+                break
     except garlicsim.misc.WorldEnded:
         pass    
     
@@ -0,0 +1,91 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''
+This module defines the `WindowHistoryBrowser` class.
+
+See its documentation for more info.
+'''
+
+import collections
+
+import garlicsim.general_misc.binary_search as binary_search
+import garlicsim.misc
+
+
+__all__ = ['WindowHistoryBrowser']
+
+
+class WindowHistoryBrowser(garlicsim.misc.BaseHistoryBrowser):
+    '''
+    A history browser that keeps only the latest states of the timeline.
+    
+    This is used for synchronously crunching history-dependent simpacks that
+    define a `HISTORY_WINDOW` setting. Instead of putting the states in a tree,
+    the states are put in a ring buffer that holds only the last
+    `history_window` states, so the simulation takes constant memory no matter
+    how long it runs.
+    
+    Positions in the timeline are still counted from the first state, but
+    asking for a state that fell out of the buffer raises
+    `OutOfHistoryWindowError`.
+    '''
+    
+    def __init__(self, history_window, initial_state):
+        
+        assert history_window >= 1
+        self.history_window = history_window
+        '''The number of latest states that are kept.'''
+        
+        self.states = collections.deque([initial_state],
+                                        maxlen=history_window)
+        '''The latest states of the timeline, in chronological order.'''
+        
+        self.n_states = 1
+        '''The number of states in the timeline, including forgotten ones.'''
+    
+    
+    def add_state(self, state):
+        '''Add a state to the end of the timeline.'''
+        self.states.append(state)
+        self.n_states += 1
+    
+    
+    def get_last_state(self):
+        '''Get the last state in the timeline. Identical to __getitem__(-1).'''
+        return self.states[-1]
+    
+    
+    def __getitem__(self, index):
+        '''Get a state by its position in the timeline.'''
+        assert isinstance(index, int)
+        self._check_index_in_window(index)
+        n_states = self.n_states
+        if not -n_states <= index < n_states:
+            raise IndexError('You asked for state number %s while the '
+                             'timeline has only %s states.' %
+                             (index, n_states))
+        if index >= 0:
+            index -= n_states
+        return self.states[index]
+    
+    
+    def get_state_by_monotonic_function(self, function, value,
+                                        rounding=binary_search.CLOSEST):
+        '''
+        Get a state by specifying a measure function and a desired value.
+        
+        The function must be a monotonic rising function on the timeline.
+        
+        See documentation of `binary_search.roundings` for details about
+        rounding options.
+        '''
+        assert issubclass(rounding, binary_search.Rounding)
+        self._check_value_in_window(function, value)
+        return binary_search.binary_search(self.states, function, value,
+                                           rounding)
+    
+    
+    def __len__(self):
+        '''Get the length of the timeline in nodes.'''
+        return self.n_states
@@ -0,0 +1,223 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+import os
+import time
+import pickle
+
+import nose.tools
+
+from garlicsim.general_misc.infinity import infinity
+
+import garlicsim
+from garlicsim.asynchronous_crunching.crunchers import ProcessCruncher
+from garlicsim.asynchronous_crunching.crunchers.process_cruncher.process \
+     import Process
+from garlicsim.asynchronous_crunching import misc, CrunchingProfile
+from garlicsim.asynchronous_crunching.misc import StateBatch
+from garlicsim_lib.simpacks import life
+
+
+class BatchingProcessCruncher(ProcessCruncher):
+    '''A `ProcessCruncher` that sends states only in full batches.'''
+    batch_size = 7
+    batch_max_bytes = None
+    batch_max_latency = None
+
+
+class Blob(object):
+    '''An object whose data may be pickled out-of-band.'''
+    def __init__(self, data):
+        self.data = data
+    def __reduce_ex__(self, protocol):
+        return (Blob, (pickle.PickleBuffer(self.data),))
+
+
+def _make_blob_state(clock, size):
+    '''Make a state with a blob of `size` bytes.'''
+    state = garlicsim.data_structures.State()
+    state.clock = clock
+    state.big_blob = Blob(bytearray(size))
+    return state
+
+
+def blob_step(state, size=5000):
+    '''A step function that makes states with big blobs.'''
+    return _make_blob_state(state.clock + 1, size)
+
+
+def get_blob_step_iterator(state, step_profile):
+    '''Get a step iterator that uses `blob_step` forever.'''
+    while True:
+        state = blob_step(state)
+        yield state
+
+
+def _get_shared_segments():
+    '''Get the names of the shared memory segments in the system.'''
+    return set(os.listdir('/dev/shm'))
+    
+
+def test_state_batch():
+    '''Test that a `StateBatch` gives back the states put in it.'''
+    states = garlicsim.list_simulate(life.State.create_messy_root(5, 5), 4)
+    batch = StateBatch()
+    for state in states:
+        batch.add_state(state)
+    assert len(batch) == 5
+    assert batch.n_bytes > 0
+    assert [state.board for state in batch] == \
+           [state.board for state in states]
+    
+    
+def test_shared_memory():
+    '''Test that a `StateBatch` can pass big buffers in shared memory.'''
+    if not misc.shared_memory_available:
+        raise nose.SkipTest("Shared memory requires Python 3.8 or above.")
+    states = []
+    for i in range(3):
+        state = garlicsim.data_structures.State()
+        state.clock = i
+        state.big_blob = Blob(bytearray([i]) * 5000)
+        state.small_blob = Blob(bytearray([i]) * 5)
+        states.append(state)
+        
+    batch = StateBatch(shared_memory_threshold=1000)
+    for state in states:
+        batch.add_state(state)
+    assert [len(segment_names) for segment_names in batch.segment_names] == \
+           [1, 1, 1]
+    assert len(pickle.dumps(batch)) < 5000
+    
+    new_batch = pickle.loads(pickle.dumps(batch))
+    new_states = list(new_batch)
+    for state, new_state in zip(states, new_states):
+        assert new_state.clock == state.clock
+        assert bytes(new_state.big_blob.data) == bytes(state.big_blob.data)
+        assert bytes(new_state.small_blob.data) == \
+               bytes(state.small_blob.data)
+    
+    # The segments are freed as soon as the states are unpacked:
+    for ((name, size),) in batch.segment_names:
+        nose.tools.assert_raises(FileNotFoundError,
+                                 misc.state_batch.shared_memory.SharedMemory,
+                                 name=name)
+    
+    # A batch that won't be unpacked can be released:
+    batch = StateBatch(shared_memory_threshold=1000)
+    batch.add_state(states[0])
+    ((name, size),) = batch.segment_names[0]
+    batch.release()
+    nose.tools.assert_raises(FileNotFoundError,
+                             misc.state_batch.shared_memory.SharedMemory,
+                             name=name)
+    
+    
+def test_retired_shared_memory():
+    '''Test that a retired process frees the shared memory of its work.'''
+    if not misc.shared_memory_available:
+        raise nose.SkipTest("Shared memory requires Python 3.8 or above.")
+    if not os.path.isdir('/dev/shm'):
+        raise nose.SkipTest("Can't list the shared memory segments.")
+    
+    step_profile = garlicsim.misc.StepProfile(blob_step)
+    initial_state = _make_blob_state(0, 0)
+    
+    # Retiring the process, and replacing it because of a step profile
+    # change, while its work queue is full and nobody reads it:
+    for order in ['retire',
+                  CrunchingProfile(infinity,
+                                   garlicsim.misc.StepProfile(blob_step,
+                                                              6000))]:
+        segments = _get_shared_segments()
+        process = Process(get_blob_step_iterator, initial_state,
+                          CrunchingProfile(infinity, step_profile),
+                          queue_size=3, batch_size=2,
+                          shared_memory_threshold=1000)
+        process.start()
+        states = list(process.work_queue.get(timeout=5))
+        assert [state.clock for state in states] == [1, 2]
+        assert bytes(states[0].big_blob.data) == bytes(5000)
+        time.sleep(0.5)
+        assert process.is_alive()
+        assert len(_get_shared_segments() - segments) >= 2 * 3
+        
+        process.order_queue.put(order)
+        process.join(5)
+        assert not process.is_alive()
+        assert _get_shared_segments() <= segments
+    
+    
+def test_many_shared_memory_states():
+    '''Test keeping many states that were received through shared memory.'''
+    if not misc.shared_memory_available:
+        raise nose.SkipTest("Shared memory requires Python 3.8 or above.")
+    import resource
+    
+    # With a low limit on open files, the states must not keep a file
+    # descriptor each:
+    (soft_limit, hard_limit) = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (256, hard_limit))
+    try:
+        states = []
+        for i in range(1500):
+            batch = StateBatch(shared_memory_threshold=1000)
+            batch.add_state(_make_blob_state(i, 2000))
+            states.extend(pickle.loads(pickle.dumps(batch)))
+    finally:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft_limit, hard_limit))
+    
+    assert [state.clock for state in states] == list(range(1500))
+    assert all(bytes(state.big_blob.data) == bytes(2000) for state in states)
+    
+    
+def test_batching():
+    '''Test crunching with a `ProcessCruncher` that sends states in batches.'''
+    project = garlicsim.Project(life)
+    project.crunching_manager.cruncher_type = BatchingProcessCruncher
+    root = project.root_this_state(life.State.create_diehard())
+    job = project.begin_crunching(root, 30)
+    
+    total_nodes_added = 0
+    while not job.is_done():
+        time.sleep(0.05)
+        nodes_added = project.sync_crunchers()
+        # Nodes arrive only in full batches, except for the last one:
+        assert nodes_added % 7 == 0 or job.is_done() or \
+               job.resulted_in_end
+        total_nodes_added += nodes_added
+        
+    path = root.make_containing_path()
+    leaf = path.get_last_node()
+    assert leaf.state.clock >= 30
+    assert len(path) == total_nodes_added + 1
+    assert [node.state.clock for node in path] == list(range(len(path)))
+    
+    project.sync_crunchers()
+    assert not project.crunching_manager.crunchers
+
+
+def test_terminated_job():
+    '''Test that all the work of a terminated job's cruncher is taken.'''
+    project = garlicsim.Project(life)
+    project.crunching_manager.cruncher_type = BatchingProcessCruncher
+    root = project.root_this_state(life.State.create_diehard())
+    job = project.begin_crunching(root, infinity)
+    project.sync_crunchers()
+    
+    # Letting the cruncher fill its work queue, and then terminating the job:
+    (cruncher,) = project.crunching_manager.crunchers.values()
+    deadline = time.time() + 30
+    while cruncher.work_queue.qsize() < 14:
+        assert time.time() < deadline
+        time.sleep(0.01)
+    project.crunching_manager.jobs.remove(job)
+    
+    while project.crunching_manager.crunchers:
+        assert time.time() < deadline
+        project.sync_crunchers()
+        time.sleep(0.01)
+    
+    path = root.make_containing_path()
+    assert [node.state.clock for node in path] == list(range(len(path)))
+    assert len(path) >= 1 + 14 * 7
@@ -0,0 +1,121 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+import time
+
+import garlicsim
+from garlicsim.asynchronous_crunching.crunchers import ProcessPoolCruncher
+from garlicsim.asynchronous_crunching.crunchers.process_pool_cruncher import \
+     process_pool_cruncher
+from garlicsim_lib.simpacks import life
+
+
+class FullBatchProcessPoolCruncher(ProcessPoolCruncher):
+    '''A `ProcessPoolCruncher` that sends states only in full batches.'''
+    batch_max_latency = None
+
+
+def _crunch(project, job):
+    '''Sync the crunchers until `job` is done.'''
+    while not job.is_done():
+        time.sleep(0.02)
+        project.sync_crunchers()
+    project.sync_crunchers()
+
+
+def test_worker_reuse():
+    '''Test that `ProcessPoolCruncher` reuses its workers between jobs.'''
+    project = garlicsim.Project(life)
+    project.crunching_manager.cruncher_type = ProcessPoolCruncher
+    root = project.root_this_state(life.State.create_diehard())
+    worker_pool = process_pool_cruncher.get_worker_pool(
+        project.simpack_grokker
+    )
+    
+    job = project.begin_crunching(root, 20)
+    _crunch(project, job)
+    assert len(worker_pool.workers) == 1
+    (worker,) = worker_pool.workers
+    
+    # Crunching from the same leaf, from another leaf, and with a different
+    # step profile, all with the same worker:
+    leaf = job.node
+    assert leaf.state.clock >= 20
+    other_step_profile = project.build_step_profile(birth=[3, 6])
+    for node, step_profile in [(leaf, None),
+                               (root.children[0], None),
+                               (leaf, other_step_profile)]:
+        job = project.begin_crunching(node, 10, step_profile=step_profile)
+        _crunch(project, job)
+        assert worker_pool.workers == [worker]
+        path = job.node.make_containing_path()
+        assert [node.state.clock for node in path] == \
+               list(range(len(path)))
+        assert job.node.state.clock >= node.state.clock + 10
+        
+    # Changing the step profile in the middle of a job, which makes the
+    # crunching manager retire the cruncher while it may still have states in
+    # the queue. Then making sure that these states don't get into the
+    # following jobs:
+    job = project.begin_crunching(leaf, 1000)
+    project.sync_crunchers()
+    time.sleep(0.1)
+    job.crunching_profile.step_profile = \
+        project.build_step_profile(birth=[3, 6])
+    project.sync_crunchers()
+    job.crunching_profile.clock_target = job.node.state.clock + 5
+    _crunch(project, job)
+    assert worker_pool.workers == [worker]
+    
+    # Changing the step profile again and again while taking only a few nodes
+    # at a time, so the work queues of the retired workers stay full:
+    job = project.begin_crunching(leaf, 10000)
+    for birth in [[3, 6], [3], [3, 6], [3], [3, 6]]:
+        job.crunching_profile.step_profile = \
+            project.build_step_profile(birth=birth)
+        project.sync_crunchers(max_nodes=5)
+        time.sleep(0.2)
+        project.sync_crunchers(max_nodes=5)
+        assert worker_pool.workers == [worker]
+    job.crunching_profile.clock_target = job.node.state.clock + 5
+    _crunch(project, job)
+    assert worker_pool.workers == [worker]
+    
+    for node in [root.children[0].children[0], leaf, job.node]:
+        job = project.begin_crunching(node, 30)
+        _crunch(project, job)
+        path = job.node.make_containing_path()
+        assert node in path
+        assert [node.state.clock for node in path] == list(range(len(path)))
+    assert worker_pool.workers == [worker]
+
+
+def test_overlapping_jobs():
+    '''Test that a worker isn't reused before its job's work was all taken.'''
+    project = garlicsim.Project(life)
+    project.crunching_manager.cruncher_type = FullBatchProcessPoolCruncher
+    root = project.root_this_state(life.State.create_diehard())
+    other_root = project.root_this_state(life.State.create_diehard())
+    
+    # Letting the worker finish the first job, but taking only some of its
+    # work before starting a second job:
+    first_job = project.begin_crunching(root, 60)
+    project.sync_crunchers()
+    cruncher = project.crunching_manager.crunchers[first_job]
+    deadline = time.time() + 30
+    while cruncher.worker.n_finished_jobs.value < cruncher.job_number:
+        assert time.time() < deadline
+        time.sleep(0.01)
+    project.sync_crunchers(max_nodes=10)
+    assert not first_job.is_done()
+    second_job = project.begin_crunching(other_root, 60)
+    
+    while not (first_job.is_done() and second_job.is_done()):
+        assert time.time() < deadline
+        project.sync_crunchers(max_nodes=10)
+        time.sleep(0.01)
+    
+    for job in (first_job, second_job):
+        path = job.node.make_containing_path()
+        assert [node.state.clock for node in path] == list(range(len(path)))
+        assert job.node.state.clock >= 60
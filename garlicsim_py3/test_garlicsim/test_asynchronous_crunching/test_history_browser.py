@@ -0,0 +1,190 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''Testing module for `garlicsim.asynchronous_crunching.HistoryBrowser`.'''
+
+import queue
+import time
+
+import garlicsim
+from garlicsim.asynchronous_crunching import (HistoryBrowser, Job,
+                                              CrunchingProfile)
+
+from .simpacks import history_dependent_simpack
+
+
+def recording_history_step(history_browser):
+    '''
+    A history step that records in the new state what it saw in the history.
+
+    The record is `(len(history_browser), clock of history_browser[-1], clock
+    of history_browser[-3])`.
+    '''
+    last_state = history_browser[-1]
+    n_states = len(history_browser)
+    new_state = garlicsim.misc.state_deepcopy.state_deepcopy(last_state)
+    new_state.clock += 1
+    new_state.record = (
+        n_states,
+        last_state.clock,
+        history_browser[-3].clock if n_states >= 3 else None
+    )
+    return new_state
+
+
+def other_recording_history_step(history_browser):
+    '''Like `recording_history_step`, but a different step function.'''
+    return recording_history_step(history_browser)
+
+
+def _get_past_nodes(node):
+    '''Get the nodes from the root of `node` to `node`.'''
+    nodes = []
+    while node is not None:
+        nodes.append(node)
+        node = node.parent
+    return nodes[::-1]
+
+
+def _check_records(node):
+    '''Check the records of the states of `node` and its ancestors.'''
+    for node in _get_past_nodes(node)[1:]:
+        clock = node.state.clock
+        assert node.state.record == \
+               (clock, clock - 1, clock - 3 if clock >= 3 else None)
+
+
+class FakeCruncher(object):
+    '''A stand-in for a cruncher whose work was all added to the tree.'''
+    def __init__(self, project):
+        self.project = project
+        self.work_queue = queue.Queue()
+
+
+def test_growing_timeline():
+    '''Test browsing the history while the timeline grows.'''
+    project = garlicsim.Project(history_dependent_simpack)
+    root = project.root_this_state(
+        history_dependent_simpack.State.create_root()
+    )
+    job = project.begin_crunching(root, 60, recording_history_step)
+
+    paths_by_cruncher = {}
+    while not job.is_done():
+        project.sync_crunchers(max_nodes=7)
+        for cruncher in project.crunching_manager.crunchers.values():
+            history_browser = getattr(cruncher, 'history_browser', None)
+            if history_browser is not None and \
+               history_browser.path is not None:
+                paths_by_cruncher.setdefault(cruncher, set()).add(
+                    id(history_browser.path)
+                )
+        time.sleep(0.01)
+
+    assert job.node.state.clock >= 60
+    _check_records(job.node)
+    # The history browser of each cruncher kept extending the same path:
+    assert paths_by_cruncher
+    for paths in paths_by_cruncher.values():
+        assert len(paths) == 1
+
+
+def test_path_rebuilt():
+    '''Test that the path is made again when our node isn't on it anymore.'''
+    project = garlicsim.Project(history_dependent_simpack)
+    root = project.root_this_state(
+        history_dependent_simpack.State.create_root()
+    )
+    first_leaf = project.simulate(root, 10)
+    first_nodes = _get_past_nodes(first_leaf)
+    fork_node = first_nodes[5]
+    second_leaf = project.simulate(fork_node, 3)
+
+    crunching_manager = project.crunching_manager
+    job = Job(first_leaf,
+              CrunchingProfile(100, project.build_step_profile()))
+    cruncher = FakeCruncher(project)
+    crunching_manager.jobs_by_cruncher[cruncher] = job
+    history_browser = HistoryBrowser(cruncher)
+
+    assert history_browser[-1] is first_leaf.state
+    assert history_browser[-3].clock == 8
+    assert len(history_browser) == 11
+    path = history_browser.path
+
+    # Growing the timeline keeps the same path:
+    job.node = project.simulate(first_leaf, 2)
+    assert history_browser[-1] is job.node.state
+    assert history_browser[-3] is first_leaf.state
+    assert len(history_browser) == 13
+    assert history_browser.path is path
+
+    # Moving to the other fork makes a new path:
+    job.node = second_leaf
+    assert history_browser[-1] is second_leaf.state
+    assert history_browser[-3] is second_leaf.parent.parent.state
+    assert history_browser[-4] is fork_node.state
+    assert len(history_browser) == 9
+    assert history_browser.path is not path
+    path = history_browser.path
+
+    # Deleting nodes in the middle of the first fork makes its end a new root:
+    job.node = first_leaf
+    assert history_browser[-1] is first_leaf.state
+    assert len(history_browser) == 11
+    path = history_browser.path
+    project.tree.delete_node_range(
+        garlicsim.data_structures.NodeRange(first_nodes[7], first_nodes[8])
+    )
+    assert history_browser[0] is first_nodes[9].state
+    assert history_browser[-1] is first_leaf.state
+    assert len(history_browser) == 2
+    assert history_browser.path is not path
+
+
+def test_jobs_by_cruncher():
+    '''Test that `jobs_by_cruncher` stays the reverse of `crunchers`.'''
+    project = garlicsim.Project(history_dependent_simpack)
+    crunching_manager = project.crunching_manager
+    root = project.root_this_state(
+        history_dependent_simpack.State.create_root()
+    )
+    first_job = project.begin_crunching(root, 30, recording_history_step)
+    second_job = project.begin_crunching(root, 500, recording_history_step)
+
+    def check():
+        assert crunching_manager.jobs_by_cruncher == dict(
+            (cruncher, job) for (job, cruncher) in
+            crunching_manager.crunchers.items()
+        )
+
+    project.sync_crunchers()
+    check()
+    assert len(crunching_manager.crunchers) == 2
+    first_cruncher = crunching_manager.crunchers[second_job]
+
+    # Changing the step profile replaces the cruncher:
+    second_job.crunching_profile.step_profile = \
+        project.build_step_profile(other_recording_history_step)
+    project.sync_crunchers()
+    check()
+    assert crunching_manager.crunchers[second_job] is not first_cruncher
+    assert first_cruncher not in crunching_manager.jobs_by_cruncher
+
+    # Finished jobs have their crunchers forgotten:
+    while not first_job.is_done():
+        project.sync_crunchers()
+        check()
+        time.sleep(0.01)
+    project.sync_crunchers()
+    check()
+    assert list(crunching_manager.jobs_by_cruncher.values()) == [second_job]
+
+    crunching_manager.jobs.remove(second_job)
+    while crunching_manager.crunchers:
+        project.sync_crunchers()
+        check()
+        time.sleep(0.01)
+    assert not crunching_manager.jobs_by_cruncher
+
+    _check_records(first_job.node)
@@ -0,0 +1,62 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''Tests for limiting the work taken by `sync_crunchers`.'''
+
+import time
+
+import garlicsim
+from garlicsim.asynchronous_crunching import crunchers
+from garlicsim_lib.simpacks import life
+
+
+def _check_path(path):
+    '''Check that the clocks along the path go one by one.'''
+    assert [node.state.clock for node in path] == list(range(len(path)))
+
+
+def test():
+    '''Test `sync_crunchers` with `max_nodes` and `max_seconds`.'''
+    for cruncher_type in [crunchers.ThreadCruncher, crunchers.ProcessCruncher]:
+        yield check, cruncher_type
+
+        
+def check(cruncher_type):
+    '''Check `sync_crunchers` limits with crunchers of `cruncher_type`.'''
+    project = garlicsim.Project(life)
+    project.crunching_manager.cruncher_type = cruncher_type
+    project.crunching_manager.max_nodes_per_chunk = 3
+    
+    root = project.root_this_state(life.State.create_diehard())
+    first_node = project.simulate(root, 5)
+    second_node = project.simulate(root, 3, birth=[3, 6])
+    first_job = project.begin_crunching(first_node, 40)
+    second_job = project.begin_crunching(second_node, 40)
+    
+    # Recruiting the crunchers and letting them do all their work:
+    assert project.sync_crunchers() == 0
+    time.sleep(0.5)
+    
+    assert project.sync_crunchers(max_seconds=0) == 0
+    
+    # The work is taken in turns, 3 nodes at a time:
+    assert project.sync_crunchers(max_nodes=8) == 8
+    assert first_job.node.state.clock == 5 + 3 + 2
+    assert second_job.node.state.clock == 3 + 3
+    
+    # The next call starts with the job that was served second:
+    assert project.sync_crunchers(max_nodes=2) == 2
+    assert first_job.node.state.clock == 5 + 3 + 2
+    assert second_job.node.state.clock == 3 + 3 + 2
+    assert project.sync_crunchers(max_nodes=4) == 4
+    assert first_job.node.state.clock == 5 + 3 + 2 + 3
+    assert second_job.node.state.clock == 3 + 3 + 2 + 1
+    
+    while not (first_job.is_done() and second_job.is_done()):
+        project.sync_crunchers(max_nodes=7)
+        
+    for job in (first_job, second_job):
+        path = job.node.make_containing_path()
+        _check_path(path)
+        assert path.get_last_node().state.clock >= 40
+    assert not project.crunching_manager.crunchers
@@ -0,0 +1,71 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''Tests for `Block`.'''
+
+import copy
+import pickle
+
+import nose.tools
+
+import garlicsim
+from garlicsim import data_structures as ds
+from garlicsim_lib.simpacks import life
+
+
+def _check_block_indices(tree):
+    '''Assert that `Block.index` agrees with the order of the block's nodes.'''
+    blocks = set(node.block for node in tree.nodes if node.block is not None)
+    for block in blocks:
+        assert block.alive
+        for (i, node) in enumerate(block):
+            assert block.index(node) == i
+            assert node.is_first_on_block() == (i == 0)
+            assert node.is_last_on_block() == (i == len(block) - 1)
+
+
+def test_index():
+    '''Test that `Block.index` stays correct while the tree changes.'''
+    project = garlicsim.Project(life)
+    tree = project.tree
+    root = project.create_root(4, 4)
+    leaf = project.simulate(root, 20)
+    block = leaf.block
+    assert len(block) == 20
+    _check_block_indices(tree)
+
+    # Forking in the middle splits the block:
+    middle_node = block[10]
+    project.simulate(middle_node, 5)
+    assert middle_node.block is not leaf.block
+    _check_block_indices(tree)
+
+    # Removing nodes from the edges of the block:
+    block = leaf.block
+    first_node, last_node = block[0], block[-1]
+    del block[0]
+    assert first_node.block is None
+    del block[-1]
+    assert last_node.block is None
+    _check_block_indices(tree)
+
+    # Prepending nodes to the block:
+    block.append_node(first_node)
+    assert block[0] is first_node
+    _check_block_indices(tree)
+
+    nose.tools.assert_raises(ValueError, block.index, last_node)
+    nose.tools.assert_raises(ValueError, block.index, root)
+
+
+def test_index_after_pickling():
+    '''Test that `Block.index` survives pickling the tree.'''
+    project = garlicsim.Project(life)
+    root = project.create_root(4, 4)
+    leaf = project.simulate(root, 10)
+    project.simulate(leaf.block[4], 5)
+
+    for new_tree in (copy.deepcopy(project.tree),
+                     pickle.loads(pickle.dumps(project.tree))):
+        assert len(new_tree.nodes) == 16
+        _check_block_indices(new_tree)
@@ -0,0 +1,98 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''Tests for `Path`.'''
+
+import nose.tools
+
+import garlicsim
+from garlicsim.general_misc import binary_search
+from garlicsim_lib.simpacks import life
+
+
+def _make_forked_project():
+    '''
+    Make a project whose tree has many forks, and so many short blocks.
+
+    Returns `(project, leaf)`, where `leaf` is the last node on a timeline that
+    passes through all the forks.
+    '''
+    project = garlicsim.Project(life)
+    root = project.create_root(4, 4)
+    node = project.simulate(root, 3)
+    for i in range(10):
+        # Forking off a side branch, and continuing on the main timeline.
+        project.simulate(node, 2)
+        node = project.simulate(node, 3)
+    return (project, node)
+
+
+def test_get_node_by_clock():
+    '''Test `Path.get_node_by_clock` on a path with many blocks.'''
+    project, leaf = _make_forked_project()
+    path = leaf.make_containing_path()
+    nodes = list(path)
+    assert nodes[-1] is leaf
+    assert len(nodes) == 34
+
+    for clock in [-1, 0, 0.5, 1, 3, 7.5, 16, 32.2, 33, 34, 100]:
+        lower_nodes = [node for node in nodes if node.state.clock <= clock]
+        higher_nodes = [node for node in nodes if node.state.clock >= clock]
+        expected_result = (lower_nodes[-1] if lower_nodes else None,
+                           higher_nodes[0] if higher_nodes else None)
+        assert path.get_node_by_clock(clock, binary_search.BOTH) == \
+               expected_result
+
+    # Changing the tree should make the path notice:
+    new_leaf = project.simulate(leaf, 5)
+    assert path.get_node_by_clock(100) is new_leaf
+    assert path.get_node_by_clock(36.2) is new_leaf.get_ancestor(2)
+
+    # And so should changing the path's decisions:
+    side_leaf = project.simulate(nodes[10], 1)
+    path.modify_to_include_node(side_leaf)
+    assert path.get_node_by_clock(100) is side_leaf
+
+
+def test_len_and_getitem():
+    '''Test `Path.__len__` and `Path.__getitem__` while the tree grows.'''
+    project, leaf = _make_forked_project()
+    path = leaf.make_containing_path()
+
+    for i in range(3):
+        nodes = list(path)
+        assert len(path) == len(nodes)
+        assert path.get_last_node() is nodes[-1]
+        for index in range(-len(nodes), len(nodes)):
+            assert path[index] is nodes[index]
+        nose.tools.assert_raises(garlicsim.data_structures.PathOutOfRangeError,
+                                 path.__getitem__, len(nodes))
+        nose.tools.assert_raises(garlicsim.data_structures.PathOutOfRangeError,
+                                 path.__getitem__, -len(nodes) - 1)
+
+        # Using a tail:
+        tail = nodes[20]
+        assert path.__len__(tail=tail) == 21
+        assert path.__len__(head=nodes[5], tail=tail) == 16
+        assert path.__len__(head=nodes[5].block, tail=tail) == \
+               16 + nodes[5].block.index(nodes[5])
+        assert path.__getitem__(-1, tail=tail) is tail
+        assert path.__getitem__(-21, tail=tail) is nodes[0]
+        assert path.__getitem__(20, tail=tail) is tail
+        nose.tools.assert_raises(garlicsim.data_structures.PathOutOfRangeError,
+                                 path.__getitem__, 21, tail=tail)
+        assert nodes[10] in path
+        assert path.__contains__(nodes[10], head=nodes[5], tail=tail)
+        assert not path.__contains__(nodes[4], head=nodes[5], tail=tail)
+
+        # Growing the tree from the end of the path, which the path should
+        # handle without recalculating everything:
+        project.simulate(path.get_last_node(), 4)
+
+    # Forking in the middle of the path:
+    nodes = list(path)
+    project.simulate(nodes[30], 2)
+    assert list(path) == nodes
+    assert len(path) == len(nodes)
+    assert path[-1] is nodes[-1]
+    assert path[31] is nodes[31]
@@ -0,0 +1,104 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''Tests for state eviction policies.'''
+
+import pickle
+
+import garlicsim
+from garlicsim import data_structures as ds
+from garlicsim_lib.simpacks import life
+
+
+def _make_project(state_eviction_policy):
+    '''
+    Make a forked `life` project whose tree uses `state_eviction_policy`.
+    
+    Returns `(project, expected_states)`, where `expected_states` is a list of
+    states that the nodes of the project's tree should have.
+    '''
+    root_state = life.State.create_messy_root(8, 8)
+    expected_project = garlicsim.Project(life)
+    project = garlicsim.Project(life)
+    project.tree.set_state_eviction_policy(state_eviction_policy)
+    
+    for current_project in (expected_project, project):
+        root = current_project.root_this_state(root_state)
+        leaf = current_project.simulate(root, 40)
+        current_project.simulate(leaf.get_ancestor(20), 10)
+        
+    expected_states = [node.state for node in expected_project.tree.nodes]
+    return (project, expected_states)
+
+
+def _check_states(tree, expected_states):
+    '''Assert that the tree's nodes have the expected states.'''
+    assert len(tree.nodes) == len(expected_states)
+    for (node, expected_state) in zip(tree.nodes, expected_states):
+        assert node.state.clock == expected_state.clock
+        assert node.state.board == expected_state.board
+
+        
+def test_policies():
+    '''Test that evicted states are loaded back correctly.'''
+    policies = (
+        ds.EveryNthStateEvictionPolicy(5),
+        ds.CheckpointsEvictionPolicy(5),
+        ds.ForkPointsEvictionPolicy(n_reloaded_states=5),
+        ds.MaxStatesEvictionPolicy(10),
+        ds.MaxStatesEvictionPolicy(10, state_store=ds.DiskStateStore()),
+    )
+    for policy in policies:
+        project, expected_states = _make_project(policy)
+        tree = project.tree
+        assert len(tree.nodes) == 51
+        n_states_in_memory = \
+            len([node for node in tree.nodes if node._state is not None])
+        assert n_states_in_memory <= 25
+        
+        for node in tree.nodes:
+            if node._state is None:
+                assert node.children
+            
+        _check_states(tree, expected_states)
+        # Going backwards too:
+        for node in reversed(tree.nodes):
+            assert node.state.clock == \
+                   expected_states[tree.nodes.index(node)].clock
+        
+        new_tree = pickle.loads(pickle.dumps(tree))
+        assert new_tree.state_eviction_policy is None
+        _check_states(new_tree, expected_states)
+
+        
+def test_checkpoints():
+    '''Test that checkpoints are kept only every `interval` states.'''
+    project = garlicsim.Project(life)
+    project.tree.set_state_eviction_policy(ds.CheckpointsEvictionPolicy(10))
+    root = project.create_messy_root(8, 8)
+    leaf = project.simulate(root, 100)
+    nodes_in_memory = \
+        [node for node in project.tree.nodes if node._state is not None]
+    assert len(nodes_in_memory) == 12
+    assert nodes_in_memory[0] is root and nodes_in_memory[-1] is leaf
+    
+    path = leaf.make_containing_path()
+    assert path.get_node_by_clock(55).state.clock == 55
+    assert [node.state.clock for node in path] == list(range(101))
+    
+    
+def test_undeterministic():
+    '''Test that states that can't be recomputed aren't dropped.'''
+    project = garlicsim.Project(life)
+    project.tree.set_state_eviction_policy(ds.EveryNthStateEvictionPolicy(5))
+    root = project.create_root(8, 8)
+    project.simulate(root, 20, randomness=0.1)
+    assert all(node._state is not None for node in project.tree.nodes)
+    
+    
+def test_replacing_policy():
+    '''Test that replacing a policy loads back the states it evicted.'''
+    project, expected_states = _make_project(ds.ForkPointsEvictionPolicy())
+    project.tree.set_state_eviction_policy(None)
+    assert all(node._state is not None for node in project.tree.nodes)
+    _check_states(project.tree, expected_states)
@@ -0,0 +1,417 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''Tests for `Tree`.'''
+
+import pickle
+
+import nose.tools
+
+import garlicsim
+from garlicsim_lib.simpacks import life
+
+
+def _crunch_states(project, state, step_profile, n):
+    '''Crunch `n` states from `state`.'''
+    iterator = project.simpack_grokker.get_step_iterator(state, step_profile)
+    return [next(iterator) for i in range(n)]
+
+
+def test_add_states():
+    '''Test that `Tree.add_states` builds the same tree as `.add_state`.'''
+    project = garlicsim.Project(life)
+    tree = project.tree
+    root = project.create_root(6, 6)
+    step_profile = project.build_step_profile()
+
+    # Adding no states does nothing:
+    assert tree.add_states([], root, step_profile) is root
+    assert len(tree.nodes) == 1
+
+    leaf = tree.add_states(
+        iter(_crunch_states(project, root.state, step_profile, 10)),
+        parent=root,
+        step_profile=step_profile
+    )
+    assert len(tree.nodes) == 11
+    assert leaf.state.clock == 10
+    assert leaf.block is root.children[0].block
+    assert len(leaf.block) == 10
+    for (i, node) in enumerate(leaf.block):
+        assert node.state.clock == i + 1
+        assert node.step_profile == step_profile
+        assert leaf.block.index(node) == i
+
+    # Growing the leaf extends its block:
+    new_leaf = tree.add_states(
+        _crunch_states(project, leaf.state, step_profile, 5),
+        parent=leaf,
+        step_profile=step_profile
+    )
+    assert new_leaf.state.clock == 15
+    assert new_leaf.block is leaf.block
+    assert len(leaf.block) == 15
+    assert leaf.block.index(new_leaf) == 14
+
+    # Forking from the middle splits the block and starts a new one:
+    middle_node = leaf.block[4]
+    fork_leaf = tree.add_states(
+        _crunch_states(project, middle_node.state, step_profile, 3),
+        parent=middle_node,
+        step_profile=step_profile
+    )
+    assert len(tree.nodes) == 19
+    assert fork_leaf.state.clock == middle_node.state.clock + 3
+    assert fork_leaf.parent.parent.parent is middle_node
+    assert len(fork_leaf.block) == 3
+    assert len(middle_node.children) == 2
+    assert middle_node.block is not new_leaf.block
+
+    for node in tree.nodes:
+        if node.block is not None:
+            assert node.block.index(node) == node.block[:].index(node)
+
+
+def test_add_states_matches_simulate():
+    '''Test that the crunched tree looks like one built by `.add_state`.'''
+    project = garlicsim.Project(life)
+    root = project.create_root(6, 6)
+    step_profile = project.build_step_profile()
+    leaf = project.simulate(root, 10)
+
+    tree = garlicsim.data_structures.Tree()
+    other_root = tree.add_state(root.state)
+    current_node = other_root
+    for state in _crunch_states(project, root.state, step_profile, 10):
+        current_node = tree.add_state(state, parent=current_node,
+                                      step_profile=step_profile)
+
+    assert len(project.tree.nodes) == len(tree.nodes) == 11
+    assert len(leaf.block) == len(current_node.block) == 10
+    assert leaf.state.clock == current_node.state.clock == 10
+    assert leaf.state.board == current_node.state.board
+
+
+def test_node_store():
+    '''Test that `NodeStore` behaves like a list of unique nodes.'''
+    project = garlicsim.Project(life)
+    root = project.create_root(6, 6)
+    leaf = project.simulate(root, 5)
+    nodes = list(project.tree.nodes)
+
+    node_store = garlicsim.data_structures.NodeStore(nodes)
+    assert list(node_store) == nodes
+    assert list(reversed(node_store)) == nodes[::-1]
+    assert len(node_store) == 6
+    assert node_store[0] is root and node_store[-1] is leaf
+    assert node_store[1:3] == nodes[1:3]
+    assert node_store.index(leaf) == 5
+    nose.tools.assert_raises(ValueError, node_store.append, leaf)
+    nose.tools.assert_raises(IndexError, node_store.__getitem__, 6)
+
+    node_store.remove(nodes[2])
+    assert nodes[2] not in node_store
+    assert list(node_store) == nodes[:2] + nodes[3:]
+    nose.tools.assert_raises(ValueError, node_store.remove, nodes[2])
+    nose.tools.assert_raises(ValueError, node_store.index, nodes[2])
+
+    for new_node_store in (pickle.loads(pickle.dumps(node_store)),
+                           pickle.loads(pickle.dumps(
+                               garlicsim.data_structures.NodeStore()))):
+        assert len(new_node_store) in (0, 5)
+        for node in new_node_store:
+            assert node in new_node_store
+
+
+def test_delete_branch():
+    '''Test deleting a big branch from the middle of the tree.'''
+    project = garlicsim.Project(life)
+    tree = project.tree
+    root = project.create_root(6, 6)
+    leaf = project.simulate(root, 300)
+    middle_node = leaf.get_ancestor(150)
+    fork_leaf = project.simulate(middle_node, 20)
+
+    node_range = garlicsim.data_structures.NodeRange(
+        middle_node.children[0],
+        leaf.get_ancestor(1)
+    )
+    tree.delete_node_range(node_range)
+
+    assert len(tree.nodes) == 301 + 20 - 149
+    assert len(tree.roots) == 2
+    assert tree.roots[-1] is leaf
+    assert leaf.parent is None
+    assert middle_node.children == [fork_leaf.get_ancestor(19)]
+    for node in node_range:
+        assert node not in tree.nodes
+
+    # Deleting short ranges from long blocks leaves the long parts in their
+    # blocks, keeping their ordinals:
+    middle_block = middle_node.block
+    fork_block = fork_leaf.block
+    cases = (
+        (middle_node.get_ancestor(5), middle_node.get_ancestor(3),
+         middle_block[:middle_block.index(middle_node.get_ancestor(5))]),
+        (fork_leaf.get_ancestor(18), fork_leaf.get_ancestor(17),
+         fork_block[fork_block.index(fork_leaf.get_ancestor(16)):]),
+    )
+    for (start, end, long_part) in cases:
+        block = long_part[0].block
+        ordinals = [node._block_ordinal for node in long_part]
+        tree.delete_node_range(garlicsim.data_structures.NodeRange(start, end))
+        assert all(node.block is block for node in long_part)
+        assert [node._block_ordinal for node in long_part] == ordinals
+        assert block[:] == long_part
+    for node in tree.nodes:
+        if node.block is not None:
+            assert node.block.index(node) == node.block[:].index(node)
+    assert len(tree.nodes) == 301 + 20 - 149 - 3 - 2
+    assert len(middle_node.block) == 3
+
+
+def test_compact_nodes():
+    '''Test that nodes share empty lists until they need their own.'''
+    project = garlicsim.Project(life)
+    tree = project.tree
+    root = project.create_root(6, 6)
+    leaf = project.simulate(root, 5)
+    middle_node = leaf.get_ancestor(2)
+    assert not hasattr(leaf, '__dict__')
+
+    assert leaf.children == leaf.ends == leaf.derived_nodes == []
+    assert leaf.children is root.ends
+    assert root.ends == []
+
+    fork_leaf = project.simulate(middle_node, 1)
+    assert len(middle_node.children) == 2
+    assert middle_node.children[-1] is fork_leaf
+
+    # The lists can't be changed directly, whether they're empty or not:
+    for node_list in (leaf.children, middle_node.children, root.children):
+        nose.tools.assert_raises(TypeError, node_list.append, root)
+        nose.tools.assert_raises(TypeError, node_list.remove, fork_leaf)
+    assert leaf.children == []
+    assert len(middle_node.children) == 2
+
+    tree.make_end(leaf, project.build_step_profile())
+    assert len(leaf.ends) == 1
+    assert root.ends == []
+
+    new_tree = pickle.loads(pickle.dumps(tree))
+    new_leaf = new_tree.nodes[5]
+    assert new_leaf.state.clock == 5
+    assert len(new_leaf.ends) == 1
+    assert new_leaf.children == []
+    assert len(new_leaf.parent.parent.children) == 2
+
+
+def test_possible_paths():
+    '''Test that the possible paths are found lazily and counted.'''
+    project = garlicsim.Project(life)
+    tree = project.tree
+    root = project.create_root(6, 6)
+    leaf = project.simulate(root, 30)
+    assert tree.count_possible_paths() == 1
+
+    fork_leaf = project.simulate(leaf.get_ancestor(10), 5)
+    second_fork_leaf = project.simulate(leaf.get_ancestor(10), 3)
+    deep_fork_leaf = project.simulate(fork_leaf.get_ancestor(2), 7)
+    other_root = project.create_root(6, 6)
+    other_leaf = project.simulate(other_root, 4)
+    assert tree.count_possible_paths() == 5
+
+    paths = tree.iterate_possible_paths()
+    assert not isinstance(paths, list)
+    paths = list(paths)
+    assert len(paths) == 5
+    assert [path[-1] for path in paths] == \
+           [leaf, fork_leaf, deep_fork_leaf, second_fork_leaf, other_leaf]
+    for path in paths:
+        assert path.root is path[-1].get_root()
+    assert len(fork_leaf.get_ancestor(4).all_possible_paths()) == 2
+    assert repr(tree).startswith(
+        '<garlicsim.data_structures.Tree with 2 roots, 51 nodes and 5 '
+        'possible paths'
+    )
+
+    tree.delete_node_range(
+        garlicsim.data_structures.NodeRange(fork_leaf.get_ancestor(4),
+                                            fork_leaf)
+    )
+    assert tree.count_possible_paths() == len(tree.all_possible_paths()) == 4
+    assert len(tree.roots) == 3
+
+    tree.delete_node_range(
+        garlicsim.data_structures.NodeRange(second_fork_leaf.get_ancestor(2),
+                                            second_fork_leaf)
+    )
+    assert tree.count_possible_paths() == len(tree.all_possible_paths()) == 3
+
+
+def _check_leaves_and_forks(tree):
+    '''Assert that the tree's leaf and fork indices are correct.'''
+    assert set(tree.leaves) == \
+           set(node for node in tree.nodes if not node.children)
+    assert tree.forks == dict(
+        (node, node.state.clock) for node in tree.nodes
+        if len(node.children) >= 2
+    )
+
+
+def test_leaves_and_forks():
+    '''Test that the tree keeps track of its leaves and forks.'''
+    project = garlicsim.Project(life)
+    tree = project.tree
+    root = project.create_root(6, 6)
+    leaf = project.simulate(root, 30)
+    _check_leaves_and_forks(tree)
+    assert list(tree.leaves) == [leaf]
+
+    fork = leaf.get_ancestor(10)
+    fork_leaf = project.simulate(fork, 5)
+    second_fork_leaf = project.simulate(fork, 15)
+    edited_node = project.fork_to_edit(leaf.get_ancestor(2))
+    edited_node.finalize()
+    _check_leaves_and_forks(tree)
+    assert tree.forks[fork] == 20
+
+    assert tree.get_leaves(root) == \
+           [leaf, edited_node, fork_leaf, second_fork_leaf]
+    assert tree.get_leaves(fork_leaf) == [fork_leaf]
+    assert tree.get_leaves(root, max_clock=30) == \
+           [leaf, edited_node, fork_leaf]
+    assert tree.get_leaves(root, max_clock=19) == []
+    assert tree.get_leaves(fork.children[2], max_clock=35) == \
+           [second_fork_leaf]
+
+    tree.delete_node_range(
+        garlicsim.data_structures.NodeRange(fork.children[0], leaf)
+    )
+    _check_leaves_and_forks(tree)
+    tree.delete_node_range(
+        garlicsim.data_structures.NodeRange(fork.children[0], fork_leaf)
+    )
+    _check_leaves_and_forks(tree)
+    assert fork not in tree.forks
+    assert tree.get_leaves(root) == [second_fork_leaf]
+
+    # Trees pickled before the leaves and forks were indexed:
+    tree_state = tree.__getstate__()
+    del tree_state['leaves'], tree_state['forks']
+    new_tree = garlicsim.data_structures.Tree()
+    new_tree.__setstate__(tree_state)
+    _check_leaves_and_forks(new_tree)
+
+
+def test_ancestors():
+    '''Test finding ancestors on a long chain of blockless nodes.'''
+    project = garlicsim.Project(life)
+    tree = project.tree
+    root = project.create_root(4, 4)
+    step_profiles = (project.build_step_profile(),
+                     project.build_step_profile(life.State.step))
+    # Alternating the step profiles keeps the nodes out of blocks:
+    nodes = [root]
+    for i in range(3000):
+        nodes.append(tree.add_state(nodes[-1].state.step(),
+                                    parent=nodes[-1],
+                                    step_profile=step_profiles[i % 2]))
+    leaf = nodes[-1]
+    assert leaf.block is None
+
+    for generations in (0, 1, 2, 3, 100, 1234, 2999, 3000):
+        assert leaf.get_ancestor(generations) is nodes[-1 - generations]
+    assert nodes[1500].get_ancestor(700) is nodes[800]
+    assert leaf.get_root() is root
+    assert leaf.get_ancestor(3001, round=True) is root
+    nose.tools.assert_raises(garlicsim.data_structures.NodeError,
+                             leaf.get_ancestor, 3001)
+    nose.tools.assert_raises(garlicsim.data_structures.NodeError,
+                             root.get_ancestor, 1)
+    assert root.get_ancestor(1, round=True) is root
+
+    # After deleting from the middle, the rest of the chain has a new root:
+    tree.delete_node_range(
+        garlicsim.data_structures.NodeRange(nodes[1000], nodes[1999])
+    )
+    assert leaf.get_root() is nodes[2000]
+    assert leaf.get_ancestor(1000) is nodes[2000]
+    assert leaf.get_ancestor(1234, round=True) is nodes[2000]
+    assert nodes[999].get_root() is root
+    assert nodes[999].get_ancestor(998) is nodes[1]
+
+    # Nodes are indexed only when they look up ancestors, so deleting a range
+    # doesn't go over all the nodes below it. Nodes that were added and ranges
+    # that were deleted in the meantime are taken into account:
+    tree.delete_node_range(
+        garlicsim.data_structures.NodeRange(nodes[2500], nodes[2599])
+    )
+    assert leaf._depth == 1000
+    for i in range(5):
+        nodes.append(tree.add_state(nodes[-1].state.step(),
+                                    parent=nodes[-1],
+                                    step_profile=step_profiles[i % 2]))
+    tree.delete_node_range(
+        garlicsim.data_structures.NodeRange(nodes[2900], nodes[2909])
+    )
+    assert nodes[-1].get_root() is nodes[2910]
+    assert nodes[-1].get_ancestor(95) is nodes[2910]
+    assert nodes[2899].get_ancestor(299) is nodes[2600]
+    assert nodes[2499].get_ancestor(499, round=True) is nodes[2000]
+    assert nodes[2499].get_root() is nodes[2000]
+    assert leaf._depth == 90
+
+
+def test_past_decisions():
+    '''Test that past paths are made from cached decisions.'''
+    project = garlicsim.Project(life)
+    tree = project.tree
+    root = project.create_root(6, 6)
+    leaf = project.simulate(root, 30)
+    fork = leaf.get_ancestor(20)
+    fork_leaf = project.simulate(fork, 15)
+    second_fork = fork_leaf.get_ancestor(5)
+    second_fork_leaf = project.simulate(second_fork, 3)
+
+    path = second_fork_leaf.make_past_path()
+    assert path.root is root
+    assert path.decisions == {fork: fork.children[1],
+                              second_fork: second_fork.children[1]}
+    assert path[-1] is second_fork_leaf
+    assert leaf.make_past_path().decisions == {fork: fork.children[0]}
+    head = second_fork_leaf.block[0]
+    cached_decisions = tree._past_decisions[head]
+    assert second_fork_leaf.block[1].make_past_path().decisions == \
+           path.decisions
+    assert tree._past_decisions[head] is cached_decisions
+
+    # Forking again makes the cached decisions stale:
+    third_fork_leaf = project.simulate(leaf.get_ancestor(2), 2)
+    assert second_fork_leaf.make_past_path()[-1] is second_fork_leaf
+    assert tree._past_decisions[head] is not cached_decisions
+    path = third_fork_leaf.make_past_path()
+    assert len(path.decisions) == 2
+    assert path[-1] is third_fork_leaf
+
+    tree.delete_node_range(
+        garlicsim.data_structures.NodeRange(fork.children[1],
+                                            second_fork)
+    )
+    assert second_fork_leaf.make_past_path().root is \
+           second_fork_leaf.get_root()
+    assert second_fork_leaf.make_past_path().decisions == {}
+
+    # Copies of a path share its decisions until one of them changes them:
+    path = third_fork_leaf.make_past_path()
+    path_copy = path.copy()
+    assert path_copy._decisions is path._decisions
+    assert path_copy[-1] is third_fork_leaf
+    path_copy.decisions.clear()
+    assert path_copy._decisions is not path._decisions
+    assert path_copy[-1] is leaf
+    assert len(path.decisions) == 1
+    assert path[-1] is third_fork_leaf
+
+    new_path = pickle.loads(pickle.dumps(path))
+    assert len(new_path.decisions) == 1
@@ -0,0 +1,99 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''Tests for detecting cycles in deterministic simulations.'''
+
+import garlicsim
+from garlicsim_lib.simpacks import life
+from garlicsim_lib.simpacks import _endable_life_test
+
+
+def _make_blinker_state():
+    '''Make a life state with a blinker, which repeats every two steps.'''
+    state = life.State.create_root(6, 6)
+    for x in range(1, 4):
+        state.board.set(x, 2, True)
+    state.clock = 0
+    return state
+
+
+def test_cycle_detector():
+    '''Test `CycleDetector` on a blinker.'''
+    state = _make_blinker_state()
+    simpack_grokker = garlicsim.misc.SimpackGrokker(life)
+    step_profile = simpack_grokker.build_step_profile()
+    iterator = simpack_grokker.get_step_iterator(state, step_profile)
+    cycle_detector = garlicsim.misc.CycleDetector(
+        simpack_grokker.settings.STATE_FINGERPRINT_FUNCTION
+    )
+    assert not cycle_detector.check(state)
+    for i in range(10):
+        state = next(iterator)
+        if cycle_detector.check(state):
+            break
+    else:
+        raise Exception("The cycle wasn't detected.")
+    assert cycle_detector.period == 2
+    assert cycle_detector.clock_period == 2
+
+
+def test_synchronous():
+    '''Test that synchronous crunching gives the same results with cycles.'''
+    state = _make_blinker_state()
+    simpack_grokker = garlicsim.misc.SimpackGrokker(life)
+    assert garlicsim.misc.create_cycle_detector(simpack_grokker,
+                                                simpack_grokker.
+                                                build_step_profile())
+    assert garlicsim.misc.create_cycle_detector(
+        simpack_grokker, simpack_grokker.build_step_profile(randomness=0.1)
+    ) is None
+    
+    states = garlicsim.list_simulate(state, 9)
+    assert len(states) == 10
+    assert [s.clock for s in states] == list(range(10))
+    for i, s in enumerate(states):
+        assert s.board == states[i % 2].board
+    
+    new_state = garlicsim.simulate(state, 1001)
+    assert new_state.clock == 1001
+    assert new_state.board == states[1].board
+
+
+def test_asynchronous():
+    '''Test that a cruncher stops crunching when the simulation cycles.'''
+    project = garlicsim.Project(life)
+    root = project.root_this_state(_make_blinker_state())
+    job = project.begin_crunching(root, 1000)
+    while job.crunching_profile.clock_target > \
+          job.node.state.clock and not job.resulted_in_end:
+        project.sync_crunchers()
+    assert job.resulted_in_end
+    (cycle,) = job.node.ends
+    assert isinstance(cycle, garlicsim.data_structures.Cycle)
+    assert cycle.period == 2
+    assert job.node.state.clock < 1000
+
+
+def test_no_fingerprint_function():
+    '''Test that cycles aren't detected without a fingerprint function.'''
+    simpack_grokker = garlicsim.misc.SimpackGrokker(_endable_life_test)
+    step_profile = simpack_grokker.build_step_profile()
+    assert issubclass(
+        simpack_grokker.settings.DETERMINISM_FUNCTION(step_profile),
+        garlicsim.misc.settings_constants.DETERMINISTIC
+    )
+    assert simpack_grokker.settings.STATE_FINGERPRINT_FUNCTION is None
+    assert garlicsim.misc.create_cycle_detector(simpack_grokker,
+                                                step_profile) is None
+
+
+def test_failing_fingerprint_function():
+    '''Test that a failing fingerprint function turns off the detection.'''
+    def fingerprint_function(state):
+        raise TypeError
+    cycle_detector = garlicsim.misc.CycleDetector(fingerprint_function)
+    state = _make_blinker_state()
+    for i in range(10):
+        assert not cycle_detector.check(state)
+    assert cycle_detector.fingerprint_function is None
+    assert cycle_detector.period is None
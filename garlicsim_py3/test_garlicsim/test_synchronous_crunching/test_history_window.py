@@ -0,0 +1,55 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''Tests for simulating simpacks that define a `HISTORY_WINDOW`.'''
+
+import nose.tools
+
+import garlicsim
+
+from . import windowed_history_simpack
+
+
+def test_simulate():
+    '''Test that the ring buffer gives the same results as the whole tree.'''
+    root = windowed_history_simpack.State.create_root()
+    
+    states = garlicsim.list_simulate(root, 30)
+    assert [state.value for state in states[:7]] == [1, 1, 2, 4, 7, 13, 24]
+    
+    assert [state.value for state in garlicsim.iter_simulate(root, 30)] == \
+           [state.value for state in states]
+    assert garlicsim.simulate(root, 30).value == states[-1].value
+    
+    project = garlicsim.Project(windowed_history_simpack)
+    node = project.simulate(project.root_this_state(root), 30)
+    assert node.state.value == states[-1].value
+
+    
+def test_out_of_window():
+    '''Test that reaching back beyond the window raises an error.'''
+    root = windowed_history_simpack.State.create_root()
+    greedy_history_step = windowed_history_simpack.State.greedy_history_step
+    
+    # While the timeline is shorter than the window, there's no problem:
+    assert garlicsim.simulate(root, 2, greedy_history_step).value == 2
+    
+    for simulate in (garlicsim.simulate, garlicsim.list_simulate,
+                     lambda *args: list(garlicsim.iter_simulate(*args))):
+        nose.tools.assert_raises(garlicsim.misc.OutOfHistoryWindowError,
+                                 simulate, root, 5, greedy_history_step)
+        
+    root.clock = 0
+    browser = garlicsim.synchronous_crunching.WindowHistoryBrowser(3, root)
+    for i in range(10):
+        state = windowed_history_simpack.State.history_step(browser)
+        state.clock = i + 1
+        browser.add_state(state)
+    assert len(browser) == 11
+    assert browser[10] is browser[-1] is browser.get_last_state()
+    assert browser[8] is browser[-3]
+    nose.tools.assert_raises(garlicsim.misc.OutOfHistoryWindowError,
+                             browser.__getitem__, 7)
+    nose.tools.assert_raises(garlicsim.misc.OutOfHistoryWindowError,
+                             browser.__getitem__, -4)
+    nose.tools.assert_raises(IndexError, browser.__getitem__, 11)
@@ -0,0 +1,6 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''A history-dependent simpack that defines a `HISTORY_WINDOW`.'''
+
+from .state import State
@@ -0,0 +1,6 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+'''Settings module for the `windowed_history_simpack` simpack.'''
+
+HISTORY_WINDOW = 3
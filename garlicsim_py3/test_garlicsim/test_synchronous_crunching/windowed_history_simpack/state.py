@@ -0,0 +1,41 @@
+# Copyright 2009-2011 Ram Rachum.
+# This program is distributed under the LGPL2.1 license.
+
+from garlicsim.general_misc import binary_search
+
+import garlicsim.data_structures
+
+
+class State(garlicsim.data_structures.State):
+    '''A state whose value is the sum of the values of the last 3 states.'''
+    
+    def __init__(self, value):
+        self.value = value
+    
+    @staticmethod
+    def history_step(history_browser):
+        n_states = len(history_browser)
+        last_state = history_browser.get_last_state()
+        
+        # Looking back 2 states, once by position and once by clock:
+        oldest_state = history_browser[max(n_states - 3, 0)]
+        assert oldest_state is history_browser.get_state_by_clock(
+            last_state.clock - 2,
+            binary_search.HIGH_OTHERWISE_LOW
+        )
+        
+        middle_state = history_browser[-2] if n_states >= 2 else None
+        
+        value = last_state.value + \
+                (middle_state.value if middle_state else 0) + \
+                (oldest_state.value if n_states >= 3 else 0)
+        return State(value)
+    
+    @staticmethod
+    def greedy_history_step(history_browser):
+        '''A step function that looks at more history than it should.'''
+        return State(history_browser[0].value + 1)
+    
+    @staticmethod
+    def create_root():
+        return State(1)